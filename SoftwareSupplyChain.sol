@@ -13,6 +13,7 @@ contract SoftwareSupplyChain {
         uint256 last_update;
         uint256 report_num;
         uint256 interaction_points;
+        mapping(string => uint256) interactions_seen;
         uint256 reliability_bought;
         uint256 last_reliability_buy;
         string[] groups;
@@ -33,12 +34,15 @@ contract SoftwareSupplyChain {
         address[] to_be_approved;
         mapping(address => uint256) to_be_approved_map;
         string[] group_projects;
+        uint256 reliability_sum;
+        uint256 interactions;
     }
 
     struct Project {
         string name;
         address admin;
         string[] library_versions;
+        string[] version_names;
         mapping(string => string) library_versions_map;
         string last_version;
         string group;
@@ -49,7 +53,6 @@ contract SoftwareSupplyChain {
         string version;
         string project;
         uint256 reliability;
-        address[] developed_by;
         string[] dependencies;
     }
 
@@ -64,24 +67,36 @@ contract SoftwareSupplyChain {
     uint256 private total_developers_reliability;
     uint256 private total_libraries_reliability;
     uint256 private max_reliability;
+    uint256 private total_deposits;
 
     mapping(address => Developer) private developers;
     mapping(string => DeveloperGroup) private dev_groups;
     mapping(string => Project) private projects;
     mapping(string => Library) private libraries;
     mapping(string => address) private emails;
-
-    event LibraryInfo(
-        string version,
-        string project,
-        string[] dependencies,
-        uint256 reliability,
-        string level,
-        uint256 mean
-    );
+    mapping(address => uint256) private deposits;
 
     event Bought(uint256 amount);
     event Sold(uint256 amount);
+    event DeveloperAdded(address indexed developer, string email);
+    event GroupCreated(string group_name, address indexed admin);
+    event ProjectCreated(
+        string group_name,
+        string project_name,
+        address indexed admin
+    );
+    event GroupAccessRequested(string group_name, address indexed developer);
+    event GroupMemberAdded(string group_name, address indexed developer);
+    event GroupMemberRemoved(string group_name, address indexed developer);
+    event AdminChanged(string group_name, address indexed new_admin);
+    event LibraryAdded(
+        string project_name,
+        string CID,
+        string version,
+        string[] dependencies
+    );
+    event DeveloperVoted(address indexed voter, address indexed developer);
+    event DeveloperReported(address indexed reporter, address indexed developer);
 
     SupplyChainToken private sctContract;
 
@@ -103,7 +118,7 @@ contract SoftwareSupplyChain {
         );
         require(bytes(_email).length != 0, "Insert a valid email");
         require(
-            sctContract.balanceOf(msg.sender) >= 3000,
+            canPayFee(msg.sender, 3000),
             "You need 3000 SCT to register as a developer"
         );
         Developer storage dev = developers[msg.sender];
@@ -113,8 +128,8 @@ contract SoftwareSupplyChain {
         dev.registration_date = block.timestamp;
         dev.last_update = block.timestamp;
         devs_num++;
-        sctContract.transferFrom(msg.sender, address(this), 3000);
-        fees_paid += 3000;
+        payFee(3000);
+        emit DeveloperAdded(msg.sender, _email);
     }
 
     function createGroup(string memory group_name) public {
@@ -128,23 +143,28 @@ contract SoftwareSupplyChain {
             "A group with the same name aready exists"
         );
         require(
-            sctContract.balanceOf(msg.sender) >= 2000,
+            canPayFee(msg.sender, 2000),
             "You need 2000 SCT to create a group"
         );
         DeveloperGroup storage dev_group = dev_groups[group_name];
         developers[msg.sender].groups.push(group_name);
-        developers[msg.sender].groups_map[group_name] = block.timestamp;
+        developers[msg.sender].groups_map[group_name] = developers[msg.sender]
+            .groups
+            .length;
         developers[msg.sender].groups_adm.push(group_name);
-        developers[msg.sender].groups_adm_map[group_name] = block.timestamp;
+        developers[msg.sender].groups_adm_map[group_name] = developers[
+            msg.sender
+        ].groups_adm.length;
         dev_group.name = group_name;
         dev_group.admin = msg.sender;
         dev_group.group_developers.push(msg.sender);
         dev_group.group_developers_map[msg.sender] = dev_group
             .group_developers
             .length;
+        dev_group.reliability_sum = 2 * developers[msg.sender].reliability;
         groups_num++;
-        sctContract.transferFrom(msg.sender, address(this), 2000);
-        fees_paid += 2000;
+        payFee(2000);
+        emit GroupCreated(group_name, msg.sender);
     }
 
     function createProject(
@@ -168,7 +188,7 @@ contract SoftwareSupplyChain {
             "A project with the same name already exists"
         );
         require(
-            sctContract.balanceOf(msg.sender) >= 2000,
+            canPayFee(msg.sender, 2000),
             "You need 2000 SCT to create a project"
         );
         Project storage project = projects[project_name];
@@ -177,8 +197,8 @@ contract SoftwareSupplyChain {
         project.group = group_name;
         project.admin = msg.sender;
         projects_num++;
-        sctContract.transferFrom(msg.sender, address(this), 2000);
-        fees_paid += 2000;
+        payFee(2000);
+        emit ProjectCreated(group_name, project_name, msg.sender);
     }
 
     function requestGroupAccess(string memory group_name) public {
@@ -206,6 +226,7 @@ contract SoftwareSupplyChain {
         developers[msg.sender].group_access_requests_map[
             group_name
         ] = developers[msg.sender].group_access_requests.length;
+        emit GroupAccessRequested(group_name, msg.sender);
     }
 
     function acceptGroupRequest(string memory group_name, address addr) public {
@@ -225,6 +246,9 @@ contract SoftwareSupplyChain {
         developers[addr].groups_map[group_name] = developers[addr]
             .groups
             .length;
+        developers[addr].interactions_seen[group_name] = dev_groups[group_name]
+            .interactions;
+        dev_groups[group_name].reliability_sum += developers[addr].reliability;
         uint256 adminCoeff;
         for (
             uint256 i = 0;
@@ -273,15 +297,25 @@ contract SoftwareSupplyChain {
             group_name
         ].group_developers.length;
         removeAddrFromArray(
-            dev_groups[group_name].to_be_approved_map[addr] - 1,
-            dev_groups[group_name].to_be_approved
+            addr,
+            dev_groups[group_name].to_be_approved,
+            dev_groups[group_name].to_be_approved_map
         );
         removeStringFromArray(
-            developers[addr].group_access_requests_map[group_name] - 1,
-            developers[addr].group_access_requests
+            group_name,
+            developers[addr].group_access_requests,
+            developers[addr].group_access_requests_map
         );
-        dev_groups[group_name].to_be_approved_map[addr] = 0;
-        developers[addr].group_access_requests_map[group_name] = 0;
+        emit GroupMemberAdded(group_name, addr);
+    }
+
+    function acceptGroupRequests(
+        string memory group_name,
+        address[] memory addrs
+    ) public {
+        for (uint256 i = 0; i < addrs.length; i++) {
+            acceptGroupRequest(group_name, addrs[i]);
+        }
     }
 
     function removeDeveloperFromGroup(
@@ -301,17 +335,31 @@ contract SoftwareSupplyChain {
             "You must be the admin of the group to remove a developer from it"
         );
 
-        Developer storage dev = developers[addr];
+        settleInteractions(addr, group_name);
+        dev_groups[group_name].reliability_sum -= groupReliability(
+            addr,
+            group_name
+        );
         removeStringFromArray(
-            developers[addr].groups_map[group_name] - 1,
-            developers[addr].groups
+            group_name,
+            developers[addr].groups,
+            developers[addr].groups_map
         );
         removeAddrFromArray(
-            dev_groups[group_name].group_developers_map[addr] - 1,
-            dev_groups[group_name].group_developers
+            addr,
+            dev_groups[group_name].group_developers,
+            dev_groups[group_name].group_developers_map
         );
-        dev.groups_map[group_name] = 0;
-        dev_groups[group_name].group_developers_map[addr] = 0;
+        emit GroupMemberRemoved(group_name, addr);
+    }
+
+    function removeDevelopersFromGroup(
+        string memory group_name,
+        address[] memory addrs
+    ) public {
+        for (uint256 i = 0; i < addrs.length; i++) {
+            removeDeveloperFromGroup(group_name, addrs[i]);
+        }
     }
 
     function addLibrary(
@@ -346,7 +394,7 @@ contract SoftwareSupplyChain {
             "The same version already exists"
         );
         require(
-            sctContract.balanceOf(msg.sender) >= 1000,
+            canPayFee(msg.sender, 1000),
             "You need 1000 SCT to add a library version to a project"
         );
         Library storage lib = libraries[CID];
@@ -355,13 +403,6 @@ contract SoftwareSupplyChain {
         lib.dependencies = dependencies;
         lib.project = project_name;
 
-        address[] memory devs = dev_groups[projects[project_name].group]
-            .group_developers;
-        uint256 len = devs.length;
-        for (uint256 i = 0; i < len; i++) {
-            lib.developed_by.push(developers[devs[i]].id);
-        }
-
         uint256 rel = computeReliability(CID);
         lib.reliability = rel;
         total_libraries_reliability += rel;
@@ -369,8 +410,9 @@ contract SoftwareSupplyChain {
         projects[project_name].library_versions.push(CID);
         projects[project_name].last_version = CID;
         projects[project_name].library_versions_map[version] = CID;
-        sctContract.transferFrom(msg.sender, address(this), 1000);
-        fees_paid += 1000;
+        projects[project_name].version_names.push(version);
+        payFee(1000);
+        emit LibraryAdded(project_name, CID, version, dependencies);
     }
 
     function voteDeveloper(address developer) public {
@@ -389,6 +431,7 @@ contract SoftwareSupplyChain {
         );
         addReliabilityAndTokens(developer, 10);
         developers[msg.sender].voted[developer] = block.timestamp;
+        emit DeveloperVoted(msg.sender, developer);
     }
 
     function reportDeveloper(address developer) public {
@@ -407,8 +450,10 @@ contract SoftwareSupplyChain {
         );
         developers[developer].reliability -= 10;
         total_developers_reliability -= 10;
+        updateGroupsReliability(developer, 10, false);
         developers[developer].report_num++;
         developers[msg.sender].reported[developer] = block.timestamp;
+        emit DeveloperReported(msg.sender, developer);
     }
 
     function updateReliability() public {
@@ -416,12 +461,20 @@ contract SoftwareSupplyChain {
             block.timestamp - developers[msg.sender].last_update >= 432000,
             "Too little time has passed since the last update"
         );
+        claimInteractionRewards();
         uint256 time = block.timestamp - developers[msg.sender].last_update;
         uint256 rel = time / 432000;
         addReliabilityAndTokens(msg.sender, rel);
         developers[msg.sender].last_update += rel * 432000;
     }
 
+    function claimInteractionRewards() public {
+        string[] storage groups = developers[msg.sender].groups;
+        for (uint256 i = 0; i < groups.length; i++) {
+            settleInteractions(msg.sender, groups[i]);
+        }
+    }
+
     function changeAdmin(address new_admin, string memory group_name) public {
         require(
             dev_groups[group_name].admin == msg.sender,
@@ -431,7 +484,14 @@ contract SoftwareSupplyChain {
             developers[new_admin].id == new_admin,
             "The new admin must be a registered developer"
         );
-        dev_groups[group_name].admin = new_admin;
+        DeveloperGroup storage dev_group = dev_groups[group_name];
+        if (developers[msg.sender].groups_map[group_name] != 0) {
+            dev_group.reliability_sum -= developers[msg.sender].reliability;
+        }
+        if (developers[new_admin].groups_map[group_name] != 0) {
+            dev_group.reliability_sum += developers[new_admin].reliability;
+        }
+        dev_group.admin = new_admin;
         for (
             uint256 i = 0;
             i < dev_groups[group_name].group_projects.length;
@@ -440,19 +500,54 @@ contract SoftwareSupplyChain {
             projects[dev_groups[group_name].group_projects[i]]
                 .admin = new_admin;
         }
+        emit AdminChanged(group_name, new_admin);
     }
 
     function buyTokens() public payable {
         uint256 tokens = msg.value * 1;
         require(tokens > 0, "You need to send some ether");
         require(
-            tokens <= sctContract.balanceOf(address(this)),
+            tokens <= sctContract.balanceOf(address(this)) - total_deposits,
             "Not enough tokens in the reserve"
         );
         sctContract.transfer(msg.sender, tokens);
         emit Bought(tokens);
     }
 
+    function buyDeposit() public payable {
+        uint256 tokens = msg.value * 1;
+        require(tokens > 0, "You need to send some ether");
+        require(
+            tokens <= sctContract.balanceOf(address(this)) - total_deposits,
+            "Not enough tokens in the reserve"
+        );
+        deposits[msg.sender] += tokens;
+        total_deposits += tokens;
+        emit Bought(tokens);
+    }
+
+    function depositTokens(uint256 amount) public {
+        require(amount > 0, "You need to deposit at least some tokens");
+        require(
+            sctContract.allowance(msg.sender, address(this)) >= amount,
+            "Check the token allowance"
+        );
+        sctContract.transferFrom(msg.sender, address(this), amount);
+        deposits[msg.sender] += amount;
+        total_deposits += amount;
+    }
+
+    function withdrawTokens(uint256 amount) public {
+        require(amount > 0, "You need to withdraw at least some tokens");
+        require(
+            deposits[msg.sender] >= amount,
+            "You don't have enough deposited SCT"
+        );
+        deposits[msg.sender] -= amount;
+        total_deposits -= amount;
+        sctContract.transfer(msg.sender, amount);
+    }
+
     function sellTokens(uint256 amount) public {
         require(amount > 0, "You need to sell at least some tokens");
         uint256 allowance = sctContract.allowance(msg.sender, address(this));
@@ -468,7 +563,7 @@ contract SoftwareSupplyChain {
             "You must register as a developer before you buy reliability"
         );
         require(
-            balanceOf(msg.sender) >= reliability * reliability_cost,
+            canPayFee(msg.sender, reliability * reliability_cost),
             "You don't have enough SCT"
         );
         Developer storage dev = developers[msg.sender];
@@ -482,21 +577,21 @@ contract SoftwareSupplyChain {
         if (dev.reliability_bought == 0) {
             dev.last_reliability_buy = block.timestamp;
         }
-        sctContract.transferFrom(
-            msg.sender,
-            address(this),
-            reliability * reliability_cost
-        );
+        payFee(reliability * reliability_cost);
         dev.reliability_bought += reliability;
         dev.reliability += reliability;
         total_developers_reliability += reliability;
-        fees_paid += reliability * reliability_cost;
+        updateGroupsReliability(msg.sender, reliability, true);
     }
 
     function balanceOf(address token_owner) public view returns (uint256) {
         return sctContract.balanceOf(token_owner);
     }
 
+    function getDeposit(address addr) public view returns (uint256) {
+        return deposits[addr];
+    }
+
     function getDeveloperInformation(
         address addr
     ) public view returns (string memory, uint256, uint256) {
@@ -541,6 +636,19 @@ contract SoftwareSupplyChain {
         return projects[project_name].library_versions;
     }
 
+    function getProjectVersionNames(
+        string memory project_name
+    ) public view returns (string[] memory) {
+        return projects[project_name].version_names;
+    }
+
+    function getProjectVersionCID(
+        string memory project_name,
+        string memory version
+    ) public view returns (string memory) {
+        return projects[project_name].library_versions_map[version];
+    }
+
     function getProjectLastVersion(
         string memory project_name
     ) public view returns (string memory) {
@@ -559,6 +667,7 @@ contract SoftwareSupplyChain {
             uint256 reliability
         )
     {
+        require(bytes(libraries[CID].CID).length != 0, "Insert a valid CID");
         return (
             libraries[CID].version,
             libraries[CID].project,
@@ -567,51 +676,164 @@ contract SoftwareSupplyChain {
         );
     }
 
-    function getLibraryInformationWithLevel(string memory CID) public {
-        uint256 rel = computeReliability(CID);
-        uint256 rel_diff = rel - libraries[CID].reliability;
-        libraries[CID].reliability = rel;
-        total_libraries_reliability += rel_diff;
-        for (
-            uint256 i = 0;
-            i <
-            dev_groups[projects[libraries[CID].project].group]
-                .group_developers
-                .length;
-            i++
-        ) {
-            Developer storage curr_dev = developers[
-                dev_groups[projects[libraries[CID].project].group]
-                    .group_developers[i]
-            ];
-            curr_dev.interaction_points++;
-            if (curr_dev.interaction_points % 1000 == 0) {
-                addReliabilityAndTokens(curr_dev.id, 1);
-            }
-        }
-        string memory level;
-        uint256 reliability_mean = total_libraries_reliability / libraries_num;
-        if (rel <= (reliability_mean * 1) / 3) {
-            level = "Very Low";
-        } else if (rel <= (reliability_mean * 2) / 3) {
-            level = "Low";
-        } else if (rel <= (reliability_mean * 3) / 2) {
-            level = "Medium";
-        } else if (rel <= (reliability_mean * 2)) {
-            level = "High";
-        } else {
-            level = "Very High";
-        }
-        emit LibraryInfo(
+    function getLibraryInformationWithLevel(
+        string memory CID
+    )
+        public
+        view
+        returns (
+            string memory,
+            string memory,
+            string[] memory,
+            uint256 reliability,
+            string memory level,
+            uint256 mean
+        )
+    {
+        require(bytes(libraries[CID].CID).length != 0, "Insert a valid CID");
+        reliability = computeReliability(CID);
+        mean =
+            (total_libraries_reliability -
+                libraries[CID].reliability +
+                reliability) /
+            libraries_num;
+        level = reliabilityLevel(reliability, mean);
+        return (
             libraries[CID].version,
             libraries[CID].project,
             libraries[CID].dependencies,
-            rel,
+            reliability,
             level,
-            reliability_mean
+            mean
         );
     }
 
+    function getLibrariesInformation(
+        string[] memory CIDs
+    )
+        public
+        view
+        returns (
+            string[] memory versions,
+            string[] memory library_projects,
+            string[][] memory dependencies,
+            uint256[] memory reliabilities
+        )
+    {
+        versions = new string[](CIDs.length);
+        library_projects = new string[](CIDs.length);
+        dependencies = new string[][](CIDs.length);
+        reliabilities = new uint256[](CIDs.length);
+        for (uint256 i = 0; i < CIDs.length; i++) {
+            if (bytes(libraries[CIDs[i]].CID).length == 0) {
+                continue;
+            }
+            versions[i] = libraries[CIDs[i]].version;
+            library_projects[i] = libraries[CIDs[i]].project;
+            dependencies[i] = libraries[CIDs[i]].dependencies;
+            reliabilities[i] = computeReliability(CIDs[i]);
+        }
+    }
+
+    function getLibrariesInformationWithLevel(
+        string[] memory CIDs
+    )
+        public
+        view
+        returns (
+            string[] memory versions,
+            string[] memory library_projects,
+            string[][] memory dependencies,
+            uint256[] memory reliabilities,
+            string[] memory levels
+        )
+    {
+        (
+            versions,
+            library_projects,
+            dependencies,
+            reliabilities
+        ) = getLibrariesInformation(CIDs);
+        levels = new string[](CIDs.length);
+        for (uint256 i = 0; i < CIDs.length; i++) {
+            if (bytes(library_projects[i]).length == 0) {
+                continue;
+            }
+            levels[i] = reliabilityLevel(
+                reliabilities[i],
+                (total_libraries_reliability -
+                    libraries[CIDs[i]].reliability +
+                    reliabilities[i]) / libraries_num
+            );
+        }
+    }
+
+    function getProjectsVersions(
+        string[] memory project_names
+    )
+        public
+        view
+        returns (string[][] memory versions, string[] memory last_versions)
+    {
+        versions = new string[][](project_names.length);
+        last_versions = new string[](project_names.length);
+        for (uint256 i = 0; i < project_names.length; i++) {
+            versions[i] = projects[project_names[i]].library_versions;
+            last_versions[i] = projects[project_names[i]].last_version;
+        }
+    }
+
+    function getProjectsVersionNames(
+        string[] memory project_names
+    ) public view returns (string[][] memory version_names) {
+        version_names = new string[][](project_names.length);
+        for (uint256 i = 0; i < project_names.length; i++) {
+            version_names[i] = projects[project_names[i]].version_names;
+        }
+    }
+
+    function getProjectsVersionCIDs(
+        string[] memory project_names,
+        string[] memory versions
+    ) public view returns (string[] memory CIDs) {
+        require(
+            project_names.length == versions.length,
+            "Every project needs a version"
+        );
+        CIDs = new string[](project_names.length);
+        for (uint256 i = 0; i < project_names.length; i++) {
+            CIDs[i] = projects[project_names[i]].library_versions_map[
+                versions[i]
+            ];
+        }
+    }
+
+    function recordInteractions(string[] memory CIDs) public {
+        // A CID counts once per call, so every interaction with a library
+        // still takes a transaction
+        bytes32[] memory hashes = new bytes32[](CIDs.length);
+        for (uint256 i = 0; i < CIDs.length; i++) {
+            require(
+                bytes(libraries[CIDs[i]].CID).length != 0,
+                "One of the CIDs is wrong"
+            );
+            hashes[i] = keccak256(bytes(CIDs[i]));
+            for (uint256 j = 0; j < i; j++) {
+                require(hashes[j] != hashes[i], "One of the CIDs is repeated");
+            }
+            uint256 rel = computeReliability(CIDs[i]);
+            total_libraries_reliability =
+                total_libraries_reliability -
+                libraries[CIDs[i]].reliability +
+                rel;
+            libraries[CIDs[i]].reliability = rel;
+            // The members collect their points when they claim the rewards
+            // or leave the group
+            dev_groups[projects[libraries[CIDs[i]].project].group]
+                .interactions++;
+        }
+    }
+
     function getDeveloperAddressFromEmail(
         string memory email
     ) public view returns (address) {
@@ -621,52 +843,139 @@ contract SoftwareSupplyChain {
     function computeReliability(
         string memory CID
     ) private view returns (uint256) {
-        address[] memory devs = libraries[CID].developed_by;
-        uint256 len = devs.length;
-        uint256 sum = 0;
-        for (uint256 i = 0; i < len; i++) {
-            if (developers[devs[i]].reliability < 0) {
-                return 0;
-            }
-            if (
-                developers[devs[i]].id == projects[libraries[CID].project].admin
-            ) {
-                sum += 2 * developers[devs[i]].reliability;
+        DeveloperGroup storage dev_group = dev_groups[
+            projects[libraries[CID].project].group
+        ];
+        uint256 len = dev_group.group_developers.length;
+        if (len == 0) {
+            return 0;
+        }
+        return dev_group.reliability_sum / len;
+    }
+
+    // reliability_sum of a group holds the reliability of its members, the
+    // admin's counted twice, so every change of reliability is applied to
+    // the groups of the developer
+    function groupReliability(
+        address addr,
+        string memory group_name
+    ) private view returns (uint256) {
+        if (dev_groups[group_name].admin == addr) {
+            return 2 * developers[addr].reliability;
+        }
+        return developers[addr].reliability;
+    }
+
+    function updateGroupsReliability(
+        address addr,
+        uint256 reliability,
+        bool increase
+    ) private {
+        string[] storage groups = developers[addr].groups;
+        for (uint256 i = 0; i < groups.length; i++) {
+            DeveloperGroup storage dev_group = dev_groups[groups[i]];
+            uint256 weighted = dev_group.admin == addr
+                ? 2 * reliability
+                : reliability;
+            if (increase) {
+                dev_group.reliability_sum += weighted;
             } else {
-                sum += developers[devs[i]].reliability;
+                dev_group.reliability_sum -= weighted;
             }
         }
+    }
 
-        return sum / len;
+    function settleInteractions(
+        address addr,
+        string memory group_name
+    ) private {
+        Developer storage dev = developers[addr];
+        uint256 interactions = dev_groups[group_name].interactions;
+        uint256 points = interactions - dev.interactions_seen[group_name];
+        if (points == 0) {
+            return;
+        }
+        uint256 rewards = (dev.interaction_points + points) /
+            1000 -
+            dev.interaction_points /
+            1000;
+        dev.interaction_points += points;
+        dev.interactions_seen[group_name] = interactions;
+        if (rewards != 0) {
+            addReliabilityAndTokens(addr, rewards);
+        }
     }
 
+    function reliabilityLevel(
+        uint256 rel,
+        uint256 reliability_mean
+    ) private pure returns (string memory) {
+        if (rel <= (reliability_mean * 1) / 3) {
+            return "Very Low";
+        } else if (rel <= (reliability_mean * 2) / 3) {
+            return "Low";
+        } else if (rel <= (reliability_mean * 3) / 2) {
+            return "Medium";
+        } else if (rel <= (reliability_mean * 2)) {
+            return "High";
+        }
+        return "Very High";
+    }
+
+    // The maps hold the position of each element plus one, the last element
+    // takes the place of the removed one so the removal costs O(1)
     function removeStringFromArray(
-        uint256 index,
-        string[] storage array
+        string memory value,
+        string[] storage array,
+        mapping(string => uint256) storage index_map
     ) private {
-        if (index >= array.length) return;
+        uint256 index = index_map[value];
+        if (index == 0 || index > array.length) return;
 
-        for (uint256 i = index; i < array.length - 1; i++) {
-            array[i] = array[i + 1];
+        if (index != array.length) {
+            string memory last = array[array.length - 1];
+            array[index - 1] = last;
+            index_map[last] = index;
         }
         array.pop();
+        index_map[value] = 0;
     }
 
     function removeAddrFromArray(
-        uint256 index,
-        address[] storage array
+        address value,
+        address[] storage array,
+        mapping(address => uint256) storage index_map
     ) private {
-        if (index >= array.length) return;
+        uint256 index = index_map[value];
+        if (index == 0 || index > array.length) return;
 
-        for (uint256 i = index; i < array.length - 1; i++) {
-            array[i] = array[i + 1];
+        if (index != array.length) {
+            address last = array[array.length - 1];
+            array[index - 1] = last;
+            index_map[last] = index;
         }
         array.pop();
+        index_map[value] = 0;
+    }
+
+    function canPayFee(address addr, uint256 fee) private view returns (bool) {
+        return deposits[addr] >= fee || sctContract.balanceOf(addr) >= fee;
+    }
+
+    function payFee(uint256 fee) private {
+        if (deposits[msg.sender] >= fee) {
+            deposits[msg.sender] -= fee;
+            total_deposits -= fee;
+        } else {
+            sctContract.transferFrom(msg.sender, address(this), fee);
+        }
+        fees_paid += fee;
     }
 
     function addReliabilityAndTokens(address dev, uint256 reliability) private {
         developers[dev].reliability += reliability;
         total_developers_reliability += reliability;
+        updateGroupsReliability(dev, reliability, true);
         if (fees_paid >= reliability) {
             sctContract.transfer(dev, reliability);
             fees_paid -= reliability;
@@ -6,10 +6,14 @@ from eth_account import Account
 from web3 import Web3
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.rpc_batch import BatchCaller
+from utils.providers import createWeb3
+
 load_dotenv()
 
 
-w3: Web3 = Web3(Web3.HTTPProvider(os.getenv("BLOCKCHAIN_ADDRESS")))
+w3: Web3 = createWeb3(os.getenv("BLOCKCHAIN_ADDRESS"))
 chain_id = int(os.getenv("CHAIN_ID"))
 
 
@@ -41,13 +45,20 @@ if __name__ == "__main__":
                 f.write(f"({i}) {private_keys[i]}\n")
         print(f"{n_accounts} accounts created")
     elif len(sys.argv) == 2 and "--balances" in sys.argv:
+        accounts = []
         with open("accounts/accounts.txt", "r") as f:
             for line in f.readlines():
                 if line[0] == "(":
-                    account = line.strip().split()[1]
-                    print(f"{account}: {w3.eth.getBalance(account)}")
+                    accounts.append(line.strip().split()[1])
                 if line == "Private Keys\n":
                     break
+        batch_caller = BatchCaller(w3)
+        for account, balance in zip(accounts, batch_caller.getBalances(accounts)):
+            print(f"{account}: {balance}")
+        stats = batch_caller.stats()
+        print(
+            f"{stats['rpc_calls']} balances read in {stats['http_requests']} HTTP requests"
+        )
 
     else:
         print("Invalid command")
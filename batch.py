@@ -0,0 +1,206 @@
+import argparse
+import csv
+import inspect
+import json
+import sys
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import asdict, is_dataclass
+from dotenv import load_dotenv
+from web3 import exceptions
+from utils.client import (
+    PublishedLibrary,
+    SupplyChainClient,
+    TransactionResult,
+    createClientFromEnv,
+)
+
+load_dotenv()
+
+TRANSACTIONS = (
+    "addDeveloper",
+    "createGroup",
+    "createProject",
+    "requestGroupAccess",
+    "acceptGroupRequest",
+    "removeDeveloperFromGroup",
+    "acceptGroupRequests",
+    "removeDevelopersFromGroup",
+    "addLibrary",
+    "publishLibrary",
+    "voteDeveloper",
+    "reportDeveloper",
+    "updateReliability",
+    "claimInteractionRewards",
+    "changeAdmin",
+    "recordInteractions",
+    "buyTokens",
+    "buyDeposit",
+    "depositTokens",
+    "withdrawTokens",
+    "buyReliability",
+)
+READS = (
+    "getDeveloperInformation",
+    "getDeveloperAddressFromEmail",
+    "getDevelopersNumber",
+    "getGroupsNumber",
+    "getProjectsNumber",
+    "getGroups",
+    "getAdminGroups",
+    "getGroupProjects",
+    "getGroupAccessRequests",
+    "getToBeApproved",
+    "getProjectVersions",
+    "getProjectLastVersion",
+    "getLibraryInformation",
+    "balanceOf",
+    "getDeposit",
+    "checkDependencies",
+    "downloadLibrary",
+)
+
+
+def read_operations(path: str) -> list:
+    # JSON: a list of {"operation": name, "args": [...] or {...}}
+    # CSV: one operation per row, the name followed by its arguments, lists
+    # separated by ";"
+    with open(path, "r", newline="") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        return [
+            {"operation": row[0].strip(), "args": [arg.strip() for arg in row[1:]]}
+            for row in csv.reader(f)
+            if row and not row[0].startswith("#")
+        ]
+
+
+def bind_arguments(fun, args) -> tuple:
+    parameters = [
+        parameter
+        for parameter in inspect.signature(fun).parameters.values()
+        if parameter.name != "wait"
+    ]
+    if isinstance(args, dict):
+        named = args
+        args = []
+        for parameter in parameters:
+            if parameter.name not in named:
+                break
+            args.append(named[parameter.name])
+    bound = []
+    for parameter, arg in zip(parameters, args):
+        if parameter.annotation is int:
+            arg = int(arg)
+        elif parameter.annotation is list and isinstance(arg, str):
+            arg = [item for item in arg.split(";") if item != ""]
+        bound.append(arg)
+    return tuple(bound)
+
+
+def to_result(value):
+    if is_dataclass(value):
+        return asdict(value)
+    return value
+
+
+class BatchRunner:
+    def __init__(self, client: SupplyChainClient, window: int = 32, output=sys.stdout):
+        self.client = client
+        self.window = window
+        self.output = output
+        self.in_flight = deque()
+        self.failures = 0
+
+    def run(self, operations: list, stop_on_error: bool = False):
+        for index, operation in enumerate(operations):
+            name = operation.get("operation")
+            try:
+                if name in TRANSACTIONS:
+                    self.submit(index, name, operation.get("args", []))
+                elif name in READS:
+                    # Reads see the effects of the operations before them
+                    self.drain()
+                    fun = getattr(self.client, name)
+                    result = fun(*bind_arguments(fun, operation.get("args", [])))
+                    self.report(index, name, result=to_result(result))
+                else:
+                    raise ValueError(f"Unknown operation {name}")
+            except Exception as error:
+                self.report(index, name, error=error)
+            if stop_on_error and self.failures:
+                break
+        self.drain()
+
+    def submit(self, index: int, name: str, args):
+        fun = getattr(self.client, name)
+        parameters = bind_arguments(fun, args)
+        try:
+            pending = fun(*parameters, wait=False)
+        except exceptions.SolidityError:
+            if not self.in_flight:
+                raise
+            # The simulation may depend on transactions still pending, it is
+            # repeated once they are mined
+            self.drain()
+            pending = fun(*parameters, wait=False)
+        self.in_flight.append((index, name, pending))
+        while len(self.in_flight) > self.window:
+            self.complete(*self.in_flight.popleft())
+
+    def drain(self):
+        while self.in_flight:
+            self.complete(*self.in_flight.popleft())
+
+    def complete(self, index: int, name: str, pending):
+        try:
+            if isinstance(pending, PublishedLibrary):
+                receipt = self.client.waitForReceipt(pending.transaction)
+                pending.transaction = TransactionResult.fromReceipt(receipt)
+                result = asdict(pending)
+            elif isinstance(pending, Future):
+                receipt = self.client.waitForReceipt(pending)
+                result = asdict(TransactionResult.fromReceipt(receipt))
+            else:
+                result = to_result(pending)
+            self.report(index, name, result=result)
+        except Exception as error:
+            self.report(index, name, error=error)
+
+    def report(self, index: int, name: str, result=None, error: Exception = None):
+        line = {"index": index, "operation": name}
+        if error is None:
+            line.update(status="ok", result=result)
+        else:
+            self.failures += 1
+            message = str(error)
+            if isinstance(error, exceptions.SolidityError):
+                message = message[70:]
+            line.update(status="error", error=message)
+        self.output.write(json.dumps(line) + "\n")
+        self.output.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a JSON or CSV file of operations without prompts"
+    )
+    parser.add_argument("file", help="JSON or CSV file of operations")
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=32,
+        help="maximum number of transactions waiting for their receipt",
+    )
+    parser.add_argument("--output", help="file for the JSON lines of the results")
+    parser.add_argument("--stop-on-error", action="store_true")
+    args = parser.parse_args()
+
+    client: SupplyChainClient = createClientFromEnv()
+    output = open(args.output, "w") if args.output else sys.stdout
+    runner = BatchRunner(client, window=args.window, output=output)
+    runner.run(read_operations(args.file), stop_on_error=args.stop_on_error)
+    if args.output:
+        output.close()
+    print(f"{runner.failures} operations failed", file=sys.stderr)
+    sys.exit(1 if runner.failures else 0)
@@ -1,213 +1,210 @@
-import os
-
 from datetime import datetime
-from web3 import Web3
 from dotenv import load_dotenv
+from utils.client import SupplyChainClient, createClientFromEnv
 from utils.transactions import Transactions
-from utils.ipfs import IPFS
 
 load_dotenv()
 
+
+def plural(n: int, name: str) -> str:
+    if n == 1:
+        return f"There is {n} {name}\n"
+    return f"There are {n} {name}s\n"
+
+
+def developer_information(client: SupplyChainClient):
+    a = input("Insert the address of the developer: ")
+    try:
+        info = client.getDeveloperInformation(a)
+        print(
+            f"{a} information:\nEmail: {info.email}\nReliability: {info.reliability}\nRegistration date: {datetime.utcfromtimestamp(info.registration_date).strftime('%Y-%m-%d %H:%M:%S')}\n"
+        )
+    except:
+        print("Insert a valid address\n")
+
+
+def developer_address(client: SupplyChainClient):
+    e = input("Insert the email of the developer: ")
+    try:
+        a = client.getDeveloperAddressFromEmail(e)
+        print(f"The address of the developers is {a}\n")
+    except:
+        print("Insert a valid email\n")
+
+
+def developer_groups(client: SupplyChainClient):
+    a = input("Insert the address of the developer: ")
+    try:
+        g = client.getGroups(a)
+        print(f"{a} is part of the following groups: {g}")
+    except:
+        print("Insert a valid address\n")
+
+
+def admin_groups(client: SupplyChainClient):
+    a = input("Insert the address of the developer: ")
+    try:
+        g = client.getAdminGroups(a)
+        print(f"{a} is admin of the following groups: {g}")
+    except:
+        print("Insert a valid address\n")
+
+
+def group_projects(client: SupplyChainClient):
+    g = input("Insert the name of the group: ")
+    try:
+        p = client.getGroupProjects(g)
+        print(f"In the group {g} there are the following projects: {p}")
+    except:
+        print("Insert a valid group name\n")
+
+
+def group_access_requests(client: SupplyChainClient):
+    a = input("Insert the address of the developer: ")
+    try:
+        g = client.getGroupAccessRequests(a)
+        print(f"The developer {a} requested to join the following groups: {g}")
+    except:
+        print("Insert a valid address\n")
+
+
+def to_be_approved(client: SupplyChainClient):
+    g = input("Insert the name of the group: ")
+    try:
+        d = client.getToBeApproved(g)
+        print(f"The following developers asked to join the group {g}: {d}\n")
+    except:
+        print("Insert a valid group name\n")
+
+
+def project_versions(client: SupplyChainClient):
+    p = input("Insert the name of the project: ")
+    try:
+        v = client.getProjectVersions(p)
+        print(
+            f"The following versions of the library are present in the project {p}: {v}\n"
+        )
+    except:
+        print("Insert a valid project name\n")
+
+
+def project_last_version(client: SupplyChainClient):
+    p = input("Insert the name of the project: ")
+    try:
+        v = client.getProjectLastVersion(p)
+        print(f"The CID of the last version of the library of project {p} is {v}\n")
+    except:
+        print("Insert a valid project name\n")
+
+
+def library_information(client: SupplyChainClient):
+    CID = input("Insert the CID of the library: ")
+    try:
+        info = client.getLibraryInformation(CID)
+        print(f"{info.project}\nVersion: {info.version}\nReliability: {info.reliability}\nDependencies: {info.dependencies}\n")
+    except:
+        print("Insert a valid CID\n")
+
+
+def download_library(client: SupplyChainClient):
+    CID = input("Insert the CID of the library: ")
+    try:
+        client.downloadLibrary(CID)
+    except Exception as e:
+        print(e, end="\n\n")
+
+
+def balance(client: SupplyChainClient):
+    addr = input("Insert the address of the developer: ")
+    try:
+        print(client.balanceOf(addr))
+    except:
+        print("Insert a valid address\n")
+
+
+def deposit(client: SupplyChainClient):
+    a = input("Insert the address of the developer: ")
+    try:
+        d = client.getDeposit(a)
+        print(f"{a} has deposited {d} tokens to pay the fees\n")
+    except:
+        print("Insert a valid address\n")
+
+
+def print_stats(client: SupplyChainClient):
+    stats = client.reader.batch_caller.stats()
+    print(
+        f"{stats['rpc_calls']} read calls sent in {stats['http_requests']} HTTP requests"
+    )
+    stats = client.reader.cache.stats()
+    print(
+        f"View cache: {stats['hits']} hits, {stats['misses']} misses, "
+        + f"{stats['immutable_hits']} hits on immutable data, {stats['invalidations']} invalidations"
+    )
+
+
 if __name__ == "__main__":
-    with open("abi.json", "r") as file:
-        abi = file.read()
-
-    with open("token_abi.json", "r") as file:
-        token_abi = file.read()
-
-    w3: Web3 = Web3(Web3.HTTPProvider(os.getenv("BLOCKCHAIN_ADDRESS")))
-    chain_id: int = int(os.getenv("CHAIN_ID"))
-    addr: str = os.getenv("ADDRESS")
-    private_key: str = os.getenv("PRIVATE_KEY")
-    contract = w3.eth.contract(address=os.getenv("CONTRACT_ADDRESS"), abi=abi)
-    token_contract = w3.eth.contract(address=os.getenv("TOKEN_CONTRACT_ADDRESS"), abi=token_abi)
-    ipfs_auth_token: str = os.getenv("IPFS_AUTH_TOKEN")
-    ipfs: IPFS = IPFS(contract=contract, ipfs_auth_token=ipfs_auth_token)
+    client: SupplyChainClient = createClientFromEnv()
     transactions: Transactions = Transactions(
-        w3=w3,
-        chain_id=chain_id,
-        addr=addr,
-        private_key=private_key,
-        contract=contract,
-        token_contract=token_contract,
-        ipfs=ipfs,
+        w3=client.w3,
+        chain_id=client.chain_id,
+        addr=client.addr,
+        private_key=client.private_key,
+        contract=client.contract,
+        token_contract=client.token_contract,
+        ipfs=client.ipfs,
+        client=client,
     )
+    commands: dict = {
+        "1": ("Register as a developer", transactions.addDeveloper),
+        "2": ("Create a group", transactions.createGroup),
+        "3": ("Create a project", transactions.createProject),
+        "4": ("Add a version of a library to a project", transactions.addLibrary),
+        "5": ("Get information about a developer", lambda: developer_information(client)),
+        "6": ("Get the address of a developer from the email", lambda: developer_address(client)),
+        "7": ("Get the number of developers", lambda: print(plural(client.getDevelopersNumber(), "developer"))),
+        "8": ("Get the number of groups", lambda: print(plural(client.getGroupsNumber(), "group"))),
+        "9": ("Get the number of projects", lambda: print(plural(client.getProjectsNumber(), "project"))),
+        "10": ("Get groups that a developer is a member of", lambda: developer_groups(client)),
+        "11": ("Get groups that a developer is an admin of", lambda: admin_groups(client)),
+        "12": ("Get the projects of a group", lambda: group_projects(client)),
+        "13": ("Get the group requests of a developer", lambda: group_access_requests(client)),
+        "14": ("Get the developers that requested to join a group", lambda: to_be_approved(client)),
+        "15": ("Get the versions of a library in a project", lambda: project_versions(client)),
+        "16": ("Get the last version of a library in a project", lambda: project_last_version(client)),
+        "17": ("Get information about a library", lambda: library_information(client)),
+        "18": ("Download a library", lambda: download_library(client)),
+        "19": ("Request to join a group", transactions.requestGroupAccess),
+        "20": ("Accept the join request of a developer", transactions.acceptGroupRequest),
+        "21": ("Remove a developer from a group", transactions.removeDeveloperFromGroup),
+        "22": ("Vote a developer", transactions.voteDeveloper),
+        "23": ("Report a developer", transactions.reportDeveloper),
+        "24": ("Check the dependencies of a library and their reliability", transactions.getDependenciesInformation),
+        "25": ("Update your reliability", transactions.updateReliability),
+        "26": ("Appoint another developer as admin", transactions.changeAdmin),
+        "27": ("Buy tokens", transactions.buyTokens),
+        "28": ("Buy reliability", transactions.buyReliability),
+        "29": ("Get the number of tokens of a developer", lambda: balance(client)),
+        "30": ("Buy tokens to pay the fees", transactions.buyDeposit),
+        "31": ("Deposit tokens to pay the fees", transactions.depositTokens),
+        "32": ("Withdraw deposited tokens", transactions.withdrawTokens),
+        "33": ("Get the number of tokens deposited by a developer", lambda: deposit(client)),
+        "34": ("Accept the join requests of several developers", transactions.acceptGroupRequests),
+        "35": ("Remove several developers from a group", transactions.removeDevelopersFromGroup),
+        "36": ("Claim the reliability earned by the interactions with your libraries", transactions.claimInteractionRewards),
+    }
+    menu: str = "Select one of the following:\n" + "".join(
+        f"                {cmd} - {label}\n" for cmd, (label, _) in commands.items()
+    ) + "                q - Exit\n"
     while True:
-        cmd: str = input(
-            """Select one of the following:
-                1 - Register as a developer
-                2 - Create a group
-                3 - Create a project
-                4 - Add a version of a library to a project
-                5 - Get information about a developer
-                6 - Get the address of a developer from the email
-                7 - Get the number of developers
-                8 - Get the number of groups
-                9 - Get the number of projects
-                10 - Get groups that a developer is a member of 
-                11 - Get groups that a developer is an admin of 
-                12 - Get the projects of a group
-                13 - Get the group requests of a developer
-                14 - Get the developers that requested to join a group
-                15 - Get the versions of a library in a project
-                16 - Get the last version of a library in a project
-                17 - Get information about a library
-                18 - Download a library
-                19 - Request to join a group
-                20 - Accept the join request of a developer
-                21 - Remove a developer from a group
-                22 - Vote a developer
-                23 - Report a developer
-                24 - Check the dependencies of a library and their reliability
-                25 - Update your reliability
-                26 - Appoint another developer as admin
-                27 - Buy tokens
-                28 - Buy reliability
-                29 - Get the number of tokens of a developer
-                q - Exit\n"""
-        )
-        if cmd == "1":
-            transactions.addDeveloper()
-        elif cmd == "2":
-            transactions.createGroup()
-        elif cmd == "3":
-            transactions.createProject()
-        elif cmd == "4":
-            transactions.addLibrary()
-        elif cmd == "5":
-            a = input("Insert the address of the developer: ")
-            try:
-                info = contract.functions.getDeveloperInformation(a).call()
-                print(
-                    f"{a} information:\nEmail: {info[0]}\nReliability: {info[1]}\nRegistration date: {datetime.utcfromtimestamp(info[2]).strftime('%Y-%m-%d %H:%M:%S')}\n"
-                )
-            except:
-                print("Insert a valid address\n")
-        elif cmd == "6":
-            e = input("Insert the email of the developer: ")
-            try:
-                a = contract.functions.getDeveloperAddressFromEmail(e).call()
-                print(f"The address of the developers is {a}\n")
-            except:
-                print("Insert a valid email\n")
-        elif cmd == "7":
-            n = contract.functions.devs_num().call()
-            if n == 1:
-                print(f"There is {n} developer\n")
-            else:
-                print(f"There are {n} developers\n")
-        elif cmd == "8":
-            n = contract.functions.groups_num().call()
-            if n == 1:
-                print(f"There is {n} group\n")
-            else:
-                print(f"There are {n} groups\n")
-        elif cmd == "9":
-            n = contract.functions.projects_num().call()
-            if n == 1:
-                print(f"There is {n} project\n")
-            else:
-                print(f"There are {n} projects\n")
-        elif cmd == "10":
-            a = input("Insert the address of the developer: ")
-            try:
-                g = contract.functions.getGroups(a).call()
-                print(f"{a} is part of the following groups: {g}")
-            except:
-                print("Insert a valid address\n")
-        elif cmd == "11":
-            a = input("Insert the address of the developer: ")
-            try:
-                g = contract.functions.getAdminGroups(a).call()
-                print(f"{a} is admin of the following groups: {g}")
-            except:
-                print("Insert a valid address\n")
-        elif cmd == "12":
-            g = input("Insert the name of the group: ")
-            try:
-                p = contract.functions.getGroupProjects(g).call()
-                print(f"In the group {g} there are the following projects: {p}")
-            except:
-                print("Insert a valid group name\n")
-        elif cmd == "13":
-            a = input("Insert the address of the developer: ")
-            try:
-                g = contract.functions.getGroupAccessRequests(a).call()
-                print(f"The developer {a} requested to join the following groups: {g}")
-            except:
-                print("Insert a valid address\n")
-        elif cmd == "14":
-            g = input("Insert the name of the group: ")
-            try:
-                d = contract.functions.getToBeApproved(g).call()
-                print(f"The following developers asked to join the group {g}: {d}\n")
-            except:
-                print("Insert a valid group name\n")
-        elif cmd == "15":
-            p = input("Insert the name of the project: ")
-            try:
-                v = contract.functions.getProjectVersions(p).call()
-                print(
-                    f"The following versions of the library are present in the project {p}: {v}\n"
-                )
-            except:
-                print("Insert a valid project name\n")
-        elif cmd == "16":
-            p = input("Insert the name of the project: ")
-            try:
-                v = contract.functions.getProjectLastVersion(p).call()
-                print(
-                    f"The CID of the last version of the library of project {p} is {v}\n"
-                )
-            except:
-                print("Insert a valid project name\n")
-        elif cmd == "17":
-            CID = input("Insert the CID of the library: ")
-            try:
-                info = contract.functions.getLibraryInformation(CID).call()
-                print(f"{info[1]}\nVersion: {info[0]}\nReliability: {info[3]}\nDependencies: {info[2]}\n")
-            except:
-                print("Insert a valid CID\n")
-        elif cmd == "18":
-            CID = input("Insert the CID of the library: ")
-            try:
-                ipfs.downloadFileWithAllDependencies(CID=CID)
-            except Exception as e:
-                print(e, end="\n\n")
-        elif cmd == "19":
-            transactions.requestGroupAccess()
-        elif cmd == "20":
-            transactions.acceptGroupRequest()
-        elif cmd == "21":
-            transactions.removeDeveloperFromGroup()
-        elif cmd == "22":
-            try:
-                transactions.voteDeveloper()
-            except:
-                print("Insert a valid address\n")
-        elif cmd == "23":
-            try:
-                transactions.reportDeveloper()
-            except:
-                print("Insert a valid address\n")
-        elif cmd == "24":
-            transactions.getDependenciesInformation()
-        elif cmd == "25":
-            transactions.updateReliability()
-        elif cmd == "26":
-            transactions.changeAdmin()
-        elif cmd == "27":
-            transactions.buyTokens()
-        elif cmd == "28":
-            transactions.buyReliability()
-        elif cmd == "29":
-            addr = input("Insert the address of the developer: ")
+        cmd: str = input(menu)
+        if cmd in commands:
             try:
-                balance = contract.functions.balanceOf(addr).call()
-                print(balance)
-            except:
-                print("Insert a valid address\n")
+                commands[cmd][1]()
+            except ValueError:
+                print("Insert a valid value\n")
         elif cmd == "q" or cmd == "Q":
+            print_stats(client)
             break
         else:
             print("Insert a valid command\n")
@@ -4,51 +4,24 @@ from solcx import install_solc, compile_source
 from web3 import Web3
 from dotenv import load_dotenv, find_dotenv, set_key
 from os.path import exists
+from utils.providers import createWeb3
 
-if not exists(".env"):
-    dotenv_file = ".env"
-    open(dotenv_file, "w")
-    private_key = input("Insert the private key: ")
-    set_key(dotenv_file, "PRIVATE_KEY", private_key)
+SOLC_VERSION = "0.8.0"
+INITIAL_TOKENS = 10000000000
+MAX_RELIABILITY = 20
+RELIABILITY_COST = 50
 
-    address = input("Insert the wallet address: ")
-    set_key(dotenv_file, "ADDRESS", address)
 
-    blockchain_address = input("Insert the blockchain address: ")
-    set_key(dotenv_file, "BLOCKCHAIN_ADDRESS", blockchain_address)
-
-    chain_id = input("Insert the chain id: ")
-    set_key(dotenv_file, "CHAIN_ID", chain_id)
-
-    ipfs_token = input("Insert the IPFS auth token: ")
-    set_key(dotenv_file, "IPFS_AUTH_TOKEN", ipfs_token)
-else:
-    dotenv_file = find_dotenv()
-
-load_dotenv()
-
-with open("./ERC20/SupplyChainToken.sol", "r") as file:
-    sol_file = file.read()
-
-install_solc("0.8.0")
-
-w3 = Web3(Web3.HTTPProvider(os.getenv("BLOCKCHAIN_ADDRESS")))
-chain_id = int(os.getenv("CHAIN_ID"))
-addr = os.getenv("ADDRESS")
-private_key = os.getenv("PRIVATE_KEY")
-initial_tokens = 10000000000
-max_reliability = 20
-reliability_cost = 50
-
-
-def deploy_contract(name: str, path: str, *params):
+def deploy_contract(
+    w3: Web3, chain_id: int, addr: str, private_key: str, name: str, path: str, *params
+):
     with open(f".{path}/{name}.sol", "r") as file:
         sol_file = file.read()
 
     compiled_sol = compile_source(
         sol_file,
         output_values=["abi", "bin"],
-        solc_version="0.8.0",
+        solc_version=SOLC_VERSION,
         optimize=True,
     )
     bytecode = compiled_sol[f"<stdin>:{name}"]["bin"]
@@ -74,32 +47,91 @@ def deploy_contract(name: str, path: str, *params):
     return abi, tx_receipt.contractAddress
 
 
-"""Deploy the SupplyChainToken contract"""
-token_abi, token_address = deploy_contract("SupplyChainToken", "/ERC20", initial_tokens)
-print(f"SupplyChainToken contract address: {token_address}")
-set_key(dotenv_file, "TOKEN_CONTRACT_ADDRESS", token_address)
-
-with open("token_abi.json", "w") as file:
-    json.dump(token_abi, file)
-
-"""Deploy the SoftwareSupplyChain contract"""
-abi, address = deploy_contract(
-    "SoftwareSupplyChain", "", token_address, max_reliability, reliability_cost
-)
-print(f"SoftwareSupplyChain contract address: {address}")
-set_key(dotenv_file, "CONTRACT_ADDRESS", address)
-
-with open("abi.json", "w") as file:
-    json.dump(abi, file)
-
-"""Transfer tokens from the deployer to the SoftwareSupplyChain contract"""
-nonce: int = w3.eth.getTransactionCount(addr)
-contract = w3.eth.contract(address=token_address, abi=token_abi)
-transaction = contract.functions.transfer(address, initial_tokens).buildTransaction(
-    {"chainId": chain_id, "from": addr, "gasPrice": w3.eth.gas_price, "nonce": nonce}
-)
-signed_transaction = w3.eth.account.sign_transaction(
-    transaction, private_key=private_key
-)
-transaction_hash = w3.eth.send_raw_transaction(signed_transaction.rawTransaction)
-tx_receipt = w3.eth.wait_for_transaction_receipt(transaction_hash)
+def deploy_contracts(
+    w3: Web3,
+    chain_id: int,
+    addr: str,
+    private_key: str,
+    initial_tokens: int = INITIAL_TOKENS,
+    max_reliability: int = MAX_RELIABILITY,
+    reliability_cost: int = RELIABILITY_COST,
+) -> tuple:
+    """Deploy the SupplyChainToken contract"""
+    token_abi, token_address = deploy_contract(
+        w3, chain_id, addr, private_key, "SupplyChainToken", "/ERC20", initial_tokens
+    )
+    print(f"SupplyChainToken contract address: {token_address}")
+
+    """Deploy the SoftwareSupplyChain contract"""
+    abi, address = deploy_contract(
+        w3,
+        chain_id,
+        addr,
+        private_key,
+        "SoftwareSupplyChain",
+        "",
+        token_address,
+        max_reliability,
+        reliability_cost,
+    )
+    print(f"SoftwareSupplyChain contract address: {address}")
+
+    """Transfer tokens from the deployer to the SoftwareSupplyChain contract"""
+    nonce: int = w3.eth.getTransactionCount(addr)
+    contract = w3.eth.contract(address=token_address, abi=token_abi)
+    transaction = contract.functions.transfer(address, initial_tokens).buildTransaction(
+        {
+            "chainId": chain_id,
+            "from": addr,
+            "gasPrice": w3.eth.gas_price,
+            "nonce": nonce,
+        }
+    )
+    signed_transaction = w3.eth.account.sign_transaction(
+        transaction, private_key=private_key
+    )
+    transaction_hash = w3.eth.send_raw_transaction(signed_transaction.rawTransaction)
+    w3.eth.wait_for_transaction_receipt(transaction_hash)
+    return token_abi, token_address, abi, address
+
+
+if __name__ == "__main__":
+    if not exists(".env"):
+        dotenv_file = ".env"
+        open(dotenv_file, "w")
+        private_key = input("Insert the private key: ")
+        set_key(dotenv_file, "PRIVATE_KEY", private_key)
+
+        address = input("Insert the wallet address: ")
+        set_key(dotenv_file, "ADDRESS", address)
+
+        blockchain_address = input("Insert the blockchain address: ")
+        set_key(dotenv_file, "BLOCKCHAIN_ADDRESS", blockchain_address)
+
+        chain_id = input("Insert the chain id: ")
+        set_key(dotenv_file, "CHAIN_ID", chain_id)
+
+        ipfs_token = input("Insert the IPFS auth token: ")
+        set_key(dotenv_file, "IPFS_AUTH_TOKEN", ipfs_token)
+    else:
+        dotenv_file = find_dotenv()
+
+    load_dotenv()
+
+    install_solc(SOLC_VERSION)
+
+    w3 = createWeb3(os.getenv("BLOCKCHAIN_ADDRESS"))
+    token_abi, token_address, abi, address = deploy_contracts(
+        w3,
+        int(os.getenv("CHAIN_ID")),
+        os.getenv("ADDRESS"),
+        os.getenv("PRIVATE_KEY"),
+    )
+    set_key(dotenv_file, "TOKEN_CONTRACT_ADDRESS", token_address)
+    set_key(dotenv_file, "CONTRACT_ADDRESS", address)
+
+    with open("token_abi.json", "w") as file:
+        json.dump(token_abi, file)
+
+    with open("abi.json", "w") as file:
+        json.dump(abi, file)
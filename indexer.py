@@ -0,0 +1,32 @@
+import os
+import sys
+from web3 import Web3
+from dotenv import load_dotenv
+from utils.indexer import Indexer, INDEXER_DB
+from utils.providers import createWeb3
+
+load_dotenv()
+
+if __name__ == "__main__":
+    with open("abi.json", "r") as file:
+        abi = file.read()
+
+    w3: Web3 = createWeb3(os.getenv("BLOCKCHAIN_ADDRESS"))
+    contract = w3.eth.contract(address=os.getenv("CONTRACT_ADDRESS"), abi=abi)
+    indexer: Indexer = Indexer(
+        w3=w3,
+        contract=contract,
+        path=os.getenv("INDEXER_DB", INDEXER_DB),
+        start_block=int(os.getenv("INDEXER_START_BLOCK", 0)),
+        confirmations=int(os.getenv("INDEXER_CONFIRMATIONS", 0)),
+    )
+    if "--rebuild" in sys.argv:
+        print("Rebuilding the tables from the stored events...")
+        indexer.rebuild()
+    print(
+        f"Indexing the events of {contract.address} from block {indexer.lastBlock() + 1}"
+    )
+    try:
+        indexer.follow()
+    except KeyboardInterrupt:
+        print(f"Indexed up to block {indexer.lastBlock()}")
@@ -0,0 +1,356 @@
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from solcx import install_solc
+from deploy import SOLC_VERSION, deploy_contracts
+from utils.client import SupplyChainClient, TransactionResult
+from utils.receipt_poller import ReceiptPoller
+from performance_test.harness import Node
+
+DIMENSIONS = {
+    "members": [1, 10, 25, 50],
+    "dependencies": [0, 1, 10, 25],
+    "versions": [1, 10, 50],
+    "groups": [1, 5, 10, 25],
+}
+STORAGE_OPCODES = ("SLOAD", "SSTORE")
+DEPOSIT = 10000000
+COLUMNS = [
+    "function",
+    "dimension",
+    "sizes",
+    "gas",
+    "intercept",
+    "slope",
+    "r2",
+    "growth",
+    "sload",
+    "sstore",
+    "storage_share",
+]
+
+
+def fit(sizes: list, values: list) -> tuple:
+    # Least squares line values = intercept + slope * size, with its R^2
+    n = len(sizes)
+    mean_x = sum(sizes) / n
+    mean_y = sum(values) / n
+    sxx = sum((x - mean_x) ** 2 for x in sizes)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(sizes, values))
+    slope = sxy / sxx if sxx else 0
+    intercept = mean_y - slope * mean_x
+    ss_tot = sum((y - mean_y) ** 2 for y in values)
+    ss_res = sum((y - intercept - slope * x) ** 2 for x, y in zip(sizes, values))
+    r2 = 1 - ss_res / ss_tot if ss_tot else 1
+    return intercept, slope, r2
+
+
+def growth(sizes: list, values: list, intercept: float, slope: float, r2: float) -> str:
+    if abs(slope) * max(sizes) < 0.02 * max(values):
+        return "constant"
+    if r2 >= 0.99:
+        return "linear"
+    # A line through the ends that underestimates the middle is convex
+    middle = len(sizes) // 2
+    line = values[0] + (values[-1] - values[0]) * (sizes[middle] - sizes[0]) / (
+        sizes[-1] - sizes[0]
+    )
+    return "superlinear" if values[middle] < line else "sublinear"
+
+
+class Profiler:
+    def __init__(self, node: Node):
+        self.node = node
+        w3 = node.w3
+        addr, private_key = node.funder
+        token_abi, token_address, abi, address = deploy_contracts(
+            w3, node.chain_id, addr, private_key
+        )
+        self.contract = w3.eth.contract(address=address, abi=abi)
+        self.token_contract = w3.eth.contract(address=token_address, abi=token_abi)
+        self.receipt_poller = ReceiptPoller(w3, 0.05)
+        self.developers = 0
+        self.libraries = 0
+        self.traces = True
+        # function -> dimension -> [(size, gas, opcodes)]
+        self.samples = {}
+
+    def createDevelopers(self, n: int) -> list:
+        clients = []
+        for addr, private_key in self.node.createAccounts(n):
+            client = SupplyChainClient(
+                w3=self.node.w3,
+                chain_id=self.node.chain_id,
+                addr=addr,
+                private_key=private_key,
+                contract=self.contract,
+                token_contract=self.token_contract,
+                ipfs=None,
+                receipt_poller=self.receipt_poller,
+            )
+            client.buyDeposit(DEPOSIT)
+            client.addDeveloper(f"dev{self.developers}@profiler.test")
+            self.developers += 1
+            clients.append(client)
+        return clients
+
+    def newCID(self) -> str:
+        self.libraries += 1
+        return f"profiler-cid-{self.libraries}"
+
+    def trace(self, transaction_hash: str) -> Counter:
+        # Gas by opcode from debug_traceTransaction, which ganache supports
+        # and eth-tester doesn't
+        if not self.traces:
+            return None
+        try:
+            trace = self.node.w3.manager.request_blocking(
+                "debug_traceTransaction",
+                [
+                    transaction_hash,
+                    {
+                        "disableStorage": True,
+                        "disableMemory": True,
+                        "disableStack": True,
+                    },
+                ],
+            )
+        except Exception:
+            self.traces = False
+            return None
+        opcodes = Counter()
+        for step in trace["structLogs"]:
+            opcodes[(step["op"], "count")] += 1
+            opcodes[(step["op"], "gas")] += step["gasCost"]
+        return opcodes
+
+    def record(self, function: str, dimension: str, size: int, result):
+        if isinstance(result, TransactionResult):
+            gas, opcodes = result.gas_used, self.trace(result.transaction_hash)
+        else:
+            # The gas estimate of a view
+            gas, opcodes = result, None
+        self.samples.setdefault(function, {}).setdefault(dimension, []).append(
+            (size, gas, opcodes)
+        )
+
+    def profileMembers(self, sizes: list):
+        admin, voter = self.createDevelopers(2)
+        admin.createGroup("members")
+        members = []
+        for size in sorted(set(sizes)):
+            # The group has size developers, admin included, after the accept
+            result = None
+            while len(members) + 1 < size:
+                (member,) = self.createDevelopers(1)
+                member.requestGroupAccess("members")
+                result = admin.acceptGroupRequest("members", member.addr)
+                members.append(member)
+            if result is not None:
+                self.record("acceptGroupRequest", "members", size, result)
+            project = f"members{size}"
+            admin.createProject("members", project)
+            CID = self.newCID()
+            self.record(
+                "addLibrary",
+                "members",
+                size,
+                admin.publishLibrary(project, CID, "1.0.0"),
+            )
+            self.record(
+                "recordInteractions",
+                "members",
+                size,
+                voter.recordInteractions([CID], wait=True),
+            )
+            self.record(
+                "getLibraryInformationWithLevel",
+                "members",
+                size,
+                self.contract.functions.getLibraryInformationWithLevel(
+                    CID
+                ).estimateGas(),
+            )
+            if members:
+                member = members[-1]
+                self.record(
+                    "removeDeveloperFromGroup",
+                    "members",
+                    size,
+                    admin.removeDeveloperFromGroup("members", member.addr),
+                )
+                member.requestGroupAccess("members")
+                admin.acceptGroupRequest("members", member.addr)
+
+    def profileDependencies(self, sizes: list):
+        (admin,) = self.createDevelopers(1)
+        admin.createGroup("dependencies")
+        admin.createProject("dependencies", "dependency")
+        dependencies = []
+        for i in range(max(sizes)):
+            CID = self.newCID()
+            admin.publishLibrary("dependency", CID, f"0.0.{i}")
+            dependencies.append(CID)
+        for size in sorted(set(sizes)):
+            project = f"dependent{size}"
+            admin.createProject("dependencies", project)
+            self.record(
+                "addLibrary",
+                "dependencies",
+                size,
+                admin.publishLibrary(
+                    project, self.newCID(), "1.0.0", dependencies[:size]
+                ),
+            )
+
+    def profileVersions(self, sizes: list):
+        (admin,) = self.createDevelopers(1)
+        admin.createGroup("versions")
+        admin.createProject("versions", "versions")
+        versions = 0
+        for size in sorted(set(sizes)):
+            # The project has size versions after the publication
+            result = None
+            while versions < size:
+                result = admin.publishLibrary(
+                    "versions", self.newCID(), f"1.0.{versions}"
+                )
+                versions += 1
+            if result is not None:
+                self.record("addLibrary", "versions", size, result)
+            self.record(
+                "getProjectVersions",
+                "versions",
+                size,
+                self.contract.functions.getProjectVersions("versions").estimateGas(),
+            )
+            self.record(
+                "getProjectsVersionNames",
+                "versions",
+                size,
+                self.contract.functions.getProjectsVersionNames(
+                    ["versions"]
+                ).estimateGas(),
+            )
+
+    def profileGroups(self, sizes: list):
+        admin, developer = self.createDevelopers(2)
+        groups = 0
+        for size in sorted(set(sizes)):
+            # The developer is a member of size groups
+            while groups < size:
+                group_name = f"groups{groups}"
+                admin.createGroup(group_name)
+                developer.requestGroupAccess(group_name)
+                admin.acceptGroupRequest(group_name, developer.addr)
+                groups += 1
+            # Votes and reports are once per pair of developers
+            voter, reporter = self.createDevelopers(2)
+            self.record(
+                "voteDeveloper", "groups", size, voter.voteDeveloper(developer.addr)
+            )
+            self.record(
+                "reportDeveloper",
+                "groups",
+                size,
+                reporter.reportDeveloper(developer.addr),
+            )
+            self.record(
+                "claimInteractionRewards",
+                "groups",
+                size,
+                developer.claimInteractionRewards(),
+            )
+            admin.createGroup(f"request{size}")
+            self.record(
+                "requestGroupAccess",
+                "groups",
+                size,
+                developer.requestGroupAccess(f"request{size}"),
+            )
+
+    def report(self) -> list:
+        rows = []
+        for function, dimensions in self.samples.items():
+            for dimension, samples in dimensions.items():
+                sizes = [size for size, _, _ in samples]
+                gas = [value for _, value, _ in samples]
+                if len(set(sizes)) > 1:
+                    intercept, slope, r2 = fit(sizes, gas)
+                    kind = growth(sizes, gas, intercept, slope, r2)
+                else:
+                    intercept, slope, r2, kind = gas[0], 0, 1, "-"
+                row = {
+                    "function": function,
+                    "dimension": dimension,
+                    "sizes": " ".join(map(str, sizes)),
+                    "gas": " ".join(map(str, gas)),
+                    "intercept": round(intercept),
+                    "slope": round(slope, 1),
+                    "r2": round(r2, 4),
+                    "growth": kind,
+                    "sload": "",
+                    "sstore": "",
+                    "storage_share": "",
+                }
+                # The storage operations of the largest input
+                opcodes = samples[-1][2]
+                if opcodes is not None:
+                    row["sload"] = opcodes[("SLOAD", "count")]
+                    row["sstore"] = opcodes[("SSTORE", "count")]
+                    storage_gas = sum(opcodes[(op, "gas")] for op in STORAGE_OPCODES)
+                    row["storage_share"] = round(storage_gas / gas[-1], 3)
+                rows.append(row)
+        return rows
+
+
+def print_report(rows: list):
+    print(
+        f"{'function':<31} {'dimension':<12} {'intercept':>9} {'slope':>9} {'r2':>6} {'growth':<11} {'sload':>6} {'sstore':>6} {'storage':>7}"
+    )
+    for row in rows:
+        print(
+            f"{row['function']:<31} {row['dimension']:<12} {row['intercept']:>9} {row['slope']:>9} {row['r2']:>6} {row['growth']:<11} {row['sload']:>6} {row['sstore']:>6} {row['storage_share']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gas of the contract functions across input sizes"
+    )
+    parser.add_argument(
+        "--node",
+        choices=("eth-tester", "ganache"),
+        default="ganache",
+        help="ganache also reports the storage reads and writes",
+    )
+    for dimension, sizes in DIMENSIONS.items():
+        parser.add_argument(f"--{dimension}", type=int, nargs="+", default=sizes)
+    parser.add_argument("--output", default="gas_profile.csv")
+    args = parser.parse_args()
+
+    install_solc(SOLC_VERSION)
+    node = Node(args.node)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            profiler = Profiler(node)
+        profiler.profileMembers(args.members)
+        profiler.profileDependencies(args.dependencies)
+        profiler.profileVersions(args.versions)
+        profiler.profileGroups(args.groups)
+    finally:
+        node.stop()
+    rows = profiler.report()
+    print_report(rows)
+    if not profiler.traces:
+        print("The node doesn't support debug_traceTransaction, no storage counts")
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,347 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from eth_account import Account
+from solcx import install_solc
+from web3 import Web3
+from deploy import SOLC_VERSION, deploy_contracts
+from utils.client import SupplyChainClient
+from utils.ipfs import IPFS
+from utils.ipfs_backends import FilesystemBackend
+from utils.ipfs_cache import IPFSCache
+from utils.providers import createWeb3
+from utils.receipt_poller import ReceiptPoller
+from performance_test.metrics import Histogram
+
+# Each stage runs once per account and depends on the previous ones
+STAGES = (
+    "register",
+    "create_group",
+    "create_project",
+    "add_library",
+    "check_dependencies",
+    "download",
+)
+SIZES = (1, 10)
+ACCOUNT_BALANCE = Web3.toWei(10, "ether")
+DEPOSIT = 100000
+LIBRARY_SIZE = 65536
+BASELINE = "performance_test/baseline.json"
+LATENCY_THRESHOLD = 0.25
+GAS_THRESHOLD = 0.02
+
+
+class Node:
+    # The chain the harness deploys on: eth-tester in this process or a
+    # ganache started for the run
+    def __init__(self, kind: str, port: int = 8555):
+        self.kind = kind
+        self.process = None
+        self.tester = None
+        self.directory = tempfile.mkdtemp(prefix="harness-node-")
+        if kind == "eth-tester":
+            from web3.providers.eth_tester import EthereumTesterProvider
+
+            provider = EthereumTesterProvider()
+            self.tester = provider.ethereum_tester
+            self.w3 = Web3(provider)
+            self.funder = (
+                self.w3.eth.accounts[0],
+                provider.ethereum_tester.backend.account_keys[0].to_hex(),
+            )
+        elif kind == "ganache":
+            keys_path = os.path.join(self.directory, "keys.json")
+            self.process = subprocess.Popen(
+                [
+                    "ganache",
+                    f"--server.port={port}",
+                    "--wallet.totalAccounts=1",
+                    f"--wallet.accountKeysPath={keys_path}",
+                    "--logging.quiet",
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            self.w3 = createWeb3(f"http://127.0.0.1:{port}")
+            self.waitReady(keys_path)
+            with open(keys_path, "r") as f:
+                addr, private_key = next(iter(json.load(f)["private_keys"].items()))
+            self.funder = (Web3.toChecksumAddress(addr), private_key)
+        else:
+            raise ValueError(f"Unknown node {kind}")
+        self.chain_id = self.w3.eth.chain_id
+
+    def waitReady(self, keys_path: str, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.path.exists(keys_path) and self.w3.isConnected():
+                return
+            if self.process.poll() is not None:
+                raise RuntimeError("ganache exited before it was ready")
+            time.sleep(0.5)
+        raise TimeoutError("ganache is not ready")
+
+    def createAccounts(self, n: int) -> list:
+        addr, private_key = self.funder
+        nonce = self.w3.eth.getTransactionCount(addr)
+        accounts = [Account.create() for _ in range(n)]
+        for account in accounts:
+            if self.tester is not None:
+                # eth-tester only runs calls from the accounts it knows
+                self.tester.add_account(account.key.hex())
+            signed_transaction = self.w3.eth.account.sign_transaction(
+                {
+                    "chainId": self.chain_id,
+                    "to": account.address,
+                    "value": ACCOUNT_BALANCE,
+                    "gas": 21000,
+                    "gasPrice": self.w3.eth.gas_price,
+                    "nonce": nonce,
+                },
+                private_key=private_key,
+            )
+            transaction_hash = self.w3.eth.send_raw_transaction(
+                signed_transaction.rawTransaction
+            )
+            nonce += 1
+        self.w3.eth.wait_for_transaction_receipt(transaction_hash)
+        return [(account.address, account.key.hex()) for account in accounts]
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Harness:
+    def __init__(self, node: Node, size: int, poll_interval: float):
+        self.node = node
+        self.size = size
+        self.directory = node.directory
+        w3 = node.w3
+        addr, private_key = node.funder
+        token_abi, token_address, abi, address = deploy_contracts(
+            w3, node.chain_id, addr, private_key
+        )
+        contract = w3.eth.contract(address=address, abi=abi)
+        token_contract = w3.eth.contract(address=token_address, abi=token_abi)
+        ipfs = IPFS(
+            contract=contract,
+            ipfs_auth_token=None,
+            cache=IPFSCache(path=os.path.join(self.directory, "ipfs_cache")),
+            backend=FilesystemBackend(os.path.join(self.directory, "ipfs")),
+        )
+        receipt_poller = ReceiptPoller(w3, poll_interval)
+        self.clients = [
+            SupplyChainClient(
+                w3=w3,
+                chain_id=node.chain_id,
+                addr=addr,
+                private_key=private_key,
+                contract=contract,
+                token_contract=token_contract,
+                ipfs=ipfs,
+                receipt_poller=receipt_poller,
+            )
+            for addr, private_key in node.createAccounts(size)
+        ]
+        self.published = {}
+
+    def libraryFile(self, name: str, size: int) -> str:
+        path = os.path.join(self.directory, f"{name}.js")
+        with open(path, "wb") as f:
+            f.write(f"// {name} {self.node.chain_id} {time.time()}\n".encode())
+            f.write(os.urandom(size))
+        return path
+
+    def run(self, stage: str, i: int, client: SupplyChainClient, library_size: int):
+        # Returns the gas of the transactions of the stage, None for reads
+        if stage == "register":
+            return (
+                client.buyDeposit(DEPOSIT).gas_used
+                + client.addDeveloper(f"dev{i}@harness.test").gas_used
+            )
+        if stage == "create_group":
+            return client.createGroup(f"group{i}").gas_used
+        if stage == "create_project":
+            return (
+                client.createProject(f"group{i}", f"lib{i}").gas_used
+                + client.createProject(f"group{i}", f"app{i}").gas_used
+            )
+        if stage == "add_library":
+            lib = client.addLibrary(
+                f"lib{i}", self.libraryFile(f"lib{i}", library_size), "1.0.0"
+            )
+            app = client.addLibrary(
+                f"app{i}",
+                self.libraryFile(f"app{i}", library_size),
+                "1.0.0",
+                [lib.CID],
+            )
+            self.published[i] = app.CID
+            return lib.transaction.gas_used + app.transaction.gas_used
+        if stage == "check_dependencies":
+            report = client.checkDependencies(f"app{i}", record_interactions=False)
+            return client.recordInteractions(
+                [report.library.CID] + [lib.CID for lib in report.dependencies],
+                wait=True,
+            ).gas_used
+        if stage == "download":
+            downloaded = client.downloadLibrary(self.published[i])
+            if not all(downloaded.values()):
+                raise RuntimeError(f"The download of app{i} failed")
+            return None
+        raise ValueError(f"Unknown stage {stage}")
+
+    def runAll(self, library_size: int, verbose: bool = False) -> dict:
+        results = {}
+        workdir = os.getcwd()
+        os.chdir(self.directory)
+        try:
+            for stage in STAGES:
+                latency = Histogram()
+                gas = Histogram(unit=1)
+                for i, client in enumerate(self.clients):
+                    output = io.StringIO()
+                    with contextlib.redirect_stdout(sys.stdout if verbose else output):
+                        start = time.perf_counter()
+                        gas_used = self.run(stage, i, client, library_size)
+                        latency.record(time.perf_counter() - start)
+                    if gas_used is not None:
+                        gas.record(gas_used)
+                results[f"{stage}/{self.size}"] = {
+                    "latency": latency.toDict(),
+                    "gas": gas.toDict(),
+                }
+        finally:
+            os.chdir(workdir)
+        return results
+
+
+def write_registry(registry: str, size: int):
+    # Every account i publishes lib<i> and app<i>, which depends on it. The
+    # dependency resolver is shared by the whole process, so one registry
+    # serves all the sizes
+    os.makedirs(registry, exist_ok=True)
+    for i in range(size):
+        for name, dependencies in ((f"lib{i}", {}), (f"app{i}", {f"lib{i}": "^1.0.0"})):
+            with open(os.path.join(registry, f"{name}.json"), "w") as f:
+                json.dump(
+                    {
+                        "name": name,
+                        "dist-tags": {"latest": "1.0.0"},
+                        "versions": {"1.0.0": {"dependencies": dependencies}},
+                    },
+                    f,
+                )
+    os.environ["NPM_REGISTRY"] = registry
+
+
+def compare(
+    results: dict, baseline: dict, latency_threshold: float, gas_threshold: float
+) -> list:
+    # Latency is compared on the median, which is steadier than the tail
+    # on a chain sharing the process with the harness
+    regressions = []
+    for key, expected in baseline.items():
+        if key not in results:
+            print(f"{key} is in the baseline but was not run")
+            continue
+        measured = results[key]
+        checks = (
+            ("latency p50", "latency", "p50", latency_threshold),
+            ("mean gas", "gas", "mean", gas_threshold),
+        )
+        for label, histogram, field, threshold in checks:
+            before = expected[histogram].get(field)
+            after = measured[histogram].get(field)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            if change > threshold:
+                regressions.append(
+                    f"{key}: {label} {before:.6g} -> {after:.6g} (+{change:.1%}, threshold {threshold:.0%})"
+                )
+    return regressions
+
+
+def print_results(results: dict):
+    print(f"{'scenario':<24} {'p50 ms':>9} {'p99 ms':>9} {'mean gas':>10}")
+    for key, values in results.items():
+        latency, gas = values["latency"], values["gas"]
+        print(
+            f"{key:<24} {latency['p50'] * 1000:>9.1f} {latency['p99'] * 1000:>9.1f} "
+            + (f"{gas['mean']:>10.0f}" if gas["count"] else f"{'-':>10}")
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the scenario matrix on a local chain and check it against a baseline"
+    )
+    parser.add_argument(
+        "--node", choices=("eth-tester", "ganache"), default="eth-tester"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(SIZES), help="numbers of accounts"
+    )
+    parser.add_argument("--library-size", type=int, default=LIBRARY_SIZE, help="bytes")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--output", default="harness_results.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the results as the new baseline",
+    )
+    parser.add_argument("--latency-threshold", type=float, default=LATENCY_THRESHOLD)
+    parser.add_argument("--gas-threshold", type=float, default=GAS_THRESHOLD)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    install_solc(SOLC_VERSION)
+    registry = tempfile.mkdtemp(prefix="harness-registry-")
+    write_registry(registry, max(args.sizes))
+    results = {}
+    for size in args.sizes:
+        node = Node(args.node)
+        try:
+            with contextlib.redirect_stdout(
+                sys.stdout if args.verbose else io.StringIO()
+            ):
+                harness = Harness(node, size, args.poll_interval)
+            results.update(harness.runAll(args.library_size, args.verbose))
+        finally:
+            node.stop()
+    shutil.rmtree(registry, ignore_errors=True)
+    print_results(results)
+    with open(args.output, "w") as f:
+        json.dump({"parameters": vars(args), "results": results}, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved in {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(
+            results, baseline, args.latency_threshold, args.gas_threshold
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+    else:
+        print(f"No baseline in {args.baseline}, run with --save-baseline to create it")
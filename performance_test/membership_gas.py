@@ -0,0 +1,159 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from eth_account import Account
+from solcx import compile_source, install_solc
+from web3 import Web3
+
+INITIAL_TOKENS = 10000000000
+MAX_RELIABILITY = 20
+RELIABILITY_COST = 50
+MEMBER_BALANCE = Web3.toWei(1, "ether")
+
+
+def compile_contract(path: str, name: str) -> tuple:
+    # Run from the root of the repository, the import of the token contract
+    # is resolved from there
+    with open(path, "r") as file:
+        sol_file = file.read()
+    compiled_sol = compile_source(
+        sol_file,
+        output_values=["abi", "bin"],
+        solc_version="0.8.0",
+        optimize=True,
+    )
+    return (
+        compiled_sol[f"<stdin>:{name}"]["abi"],
+        compiled_sol[f"<stdin>:{name}"]["bin"],
+    )
+
+
+def transact(w3: Web3, fun, sender: str, value: int = 0) -> int:
+    transaction_hash = fun.transact({"from": sender, "value": value})
+    receipt = w3.eth.wait_for_transaction_receipt(transaction_hash)
+    if receipt["status"] == 0:
+        raise RuntimeError(f"{fun.fn_name} reverted")
+    return receipt["gasUsed"]
+
+
+def deploy(w3: Web3, path: str):
+    owner = w3.eth.accounts[0]
+    token_abi, token_bin = compile_contract(
+        "./ERC20/SupplyChainToken.sol", "SupplyChainToken"
+    )
+    abi, bytecode = compile_contract(path, "SoftwareSupplyChain")
+    receipt = w3.eth.wait_for_transaction_receipt(
+        w3.eth.contract(abi=token_abi, bytecode=token_bin)
+        .constructor(INITIAL_TOKENS)
+        .transact({"from": owner})
+    )
+    token_contract = w3.eth.contract(address=receipt.contractAddress, abi=token_abi)
+    receipt = w3.eth.wait_for_transaction_receipt(
+        w3.eth.contract(abi=abi, bytecode=bytecode)
+        .constructor(token_contract.address, MAX_RELIABILITY, RELIABILITY_COST)
+        .transact({"from": owner})
+    )
+    contract = w3.eth.contract(address=receipt.contractAddress, abi=abi)
+    transact(
+        w3, token_contract.functions.transfer(contract.address, INITIAL_TOKENS), owner
+    )
+    return contract
+
+
+def create_developers(w3: Web3, contract, n: int, tester) -> list:
+    addrs = []
+    for i in range(n):
+        account = Account.create()
+        addr = tester.add_account(account.key.hex())
+        w3.eth.send_transaction(
+            {"from": w3.eth.accounts[0], "to": addr, "value": MEMBER_BALANCE}
+        )
+        transact(w3, contract.functions.buyDeposit(), addr, value=100000)
+        transact(w3, contract.functions.addDeveloper(f"member{i}@test.it"), addr)
+        addrs.append(addr)
+    return addrs
+
+
+def measure(
+    w3: Web3, contract, admin: str, members: list, group_name: str, batch: bool
+) -> dict:
+    transact(w3, contract.functions.createGroup(group_name), admin)
+    for member in members:
+        transact(w3, contract.functions.requestGroupAccess(group_name), member)
+    if batch:
+        accept = transact(
+            w3, contract.functions.acceptGroupRequests(group_name, members), admin
+        )
+        remove = transact(
+            w3, contract.functions.removeDevelopersFromGroup(group_name, members), admin
+        )
+    else:
+        accept = sum(
+            transact(
+                w3, contract.functions.acceptGroupRequest(group_name, member), admin
+            )
+            for member in members
+        )
+        # Removing from the head of the list is the worst case of a removal
+        # that shifts the following elements
+        remove = sum(
+            transact(
+                w3,
+                contract.functions.removeDeveloperFromGroup(group_name, member),
+                admin,
+            )
+            for member in members
+        )
+    return {"accept": accept / len(members), "remove": remove / len(members)}
+
+
+def benchmark(path: str, n_members: int) -> dict:
+    from web3.providers.eth_tester import EthereumTesterProvider
+
+    provider = EthereumTesterProvider()
+    w3 = Web3(provider)
+    contract = deploy(w3, path)
+    admin, *members = create_developers(
+        w3, contract, n_members + 1, provider.ethereum_tester
+    )
+    results = {"single": measure(w3, contract, admin, members, "single", False)}
+    if any(item.get("name") == "acceptGroupRequests" for item in contract.abi):
+        results["batch"] = measure(w3, contract, admin, members, "batch", True)
+    return results
+
+
+def print_results(label: str, results: dict, n_members: int):
+    for mode, gas in results.items():
+        print(
+            f"{label:<10} {mode:<7} {n_members:>7} {gas['accept']:>14.0f} {gas['remove']:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gas per member of accepting and removing group members"
+    )
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--contract", default="./SoftwareSupplyChain.sol")
+    parser.add_argument(
+        "--baseline",
+        help="an older SoftwareSupplyChain.sol to compare, e.g. from git show",
+    )
+    args = parser.parse_args()
+
+    install_solc("0.8.0")
+    print(
+        f"{'contract':<10} {'mode':<7} {'members':>7} {'accept gas':>14} {'remove gas':>14}"
+    )
+    if args.baseline:
+        baseline = benchmark(args.baseline, args.members)
+        print_results("baseline", baseline, args.members)
+    current = benchmark(args.contract, args.members)
+    print_results("current", current, args.members)
+    if args.baseline:
+        for mode, gas in current.items():
+            print(
+                f"{mode}: accept {gas['accept'] / baseline['single']['accept']:.2f}x, remove {gas['remove'] / baseline['single']['remove']:.2f}x of the baseline"
+            )
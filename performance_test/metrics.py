@@ -0,0 +1,269 @@
+import asyncio
+import csv
+import json
+import math
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, fields
+from web3 import exceptions
+from utils.receipt_poller import TransactionReverted
+
+PERCENTILES = (50, 90, 99, 99.9)
+# Values are recorded in microseconds with a relative error below 2^-7
+PRECISION = 7
+UNIT = 1e-6
+
+
+class Histogram:
+    # Log-linear buckets as in HdrHistogram: each value is grouped by its
+    # highest bit and the group is split in 2^PRECISION linear sub-buckets,
+    # so the memory grows with the range of the values and not their number
+    def __init__(self, precision: int = PRECISION, unit: float = UNIT):
+        self.precision = precision
+        self.unit = unit
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def bucket(self, value: int) -> tuple:
+        shift = max(0, value.bit_length() - self.precision - 1)
+        return shift, value >> shift
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds / self.unit))
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram"):
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for shift, sub_bucket in sorted(self.counts):
+            seen += self.counts[(shift, sub_bucket)]
+            if seen >= rank:
+                # The highest value of the bucket, as HdrHistogram reports
+                value = min(((sub_bucket + 1) << shift) - 1, self.max)
+                return value * self.unit
+        return self.max * self.unit
+
+    def toDict(self) -> dict:
+        if self.count == 0:
+            return {"count": 0}
+        summary = {
+            "count": self.count,
+            "min": self.min * self.unit,
+            "mean": self.total / self.count * self.unit,
+            "max": self.max * self.unit,
+        }
+        for p in PERCENTILES:
+            summary[f"p{p:g}"] = self.percentile(p)
+        return summary
+
+
+class Throughput:
+    # Completed operations per endpoint in intervals since the start
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.bins = defaultdict(Counter)
+
+    def record(self, endpoint: str, elapsed: float):
+        self.bins[endpoint][int(elapsed // self.interval)] += 1
+
+    def series(self, endpoint: str) -> list:
+        bins = self.bins[endpoint]
+        if not bins:
+            return []
+        return [bins[i] / self.interval for i in range(max(bins) + 1)]
+
+
+@dataclass
+class Sample:
+    # Times are time.monotonic() values, included is when the block with
+    # the transaction was first seen by the receipt poller
+    account: int
+    endpoint: str
+    operation: str
+    scheduled: float
+    finished: float
+    status: str
+    submitted: float = None
+    included: float = None
+    received: float = None
+    cause: str = None
+    error: str = None
+    gas_used: int = None
+
+    @property
+    def latency(self) -> float:
+        return self.finished - self.scheduled
+
+
+def failureCause(error: Exception) -> str:
+    if isinstance(error, TransactionReverted):
+        return "reverted"
+    if isinstance(error, exceptions.SolidityError):
+        return "rejected by the simulation"
+    if isinstance(error, (asyncio.TimeoutError, exceptions.TimeExhausted)):
+        return "receipt timeout"
+    if isinstance(error, (ConnectionError, OSError)):
+        return "connection"
+    if isinstance(error, ValueError) and error.args and isinstance(error.args[0], dict):
+        # JSON-RPC errors of the node
+        return f"rpc: {error.args[0].get('message', '')}"
+    return type(error).__name__
+
+
+class Metrics:
+    def __init__(self, start: float, interval: float = 1.0):
+        self.start = start
+        self.latency = defaultdict(Histogram)
+        self.submit_included = defaultdict(Histogram)
+        self.included_receipt = defaultdict(Histogram)
+        # Gas is recorded in units instead of microseconds
+        self.gas = defaultdict(lambda: Histogram(unit=1))
+        self.throughput = Throughput(interval)
+        self.failures = Counter()
+        self.retries = Counter()
+        # Requests and latency of each RPC endpoint, from the provider
+        self.rpc = {}
+        self.samples = []
+        self.dropped = 0
+
+    def record(self, sample: Sample):
+        self.samples.append(sample)
+        if sample.status != "ok":
+            self.failures[sample.cause] += 1
+            return
+        self.latency[sample.operation].record(sample.latency)
+        if sample.submitted is not None and sample.included is not None:
+            self.submit_included[sample.operation].record(
+                sample.included - sample.submitted
+            )
+        if sample.included is not None and sample.received is not None:
+            self.included_receipt[sample.operation].record(
+                sample.received - sample.included
+            )
+        if sample.gas_used is not None:
+            self.gas[sample.operation].record(sample.gas_used)
+        self.throughput.record(sample.endpoint, sample.finished - self.start)
+
+    def summary(self, elapsed: float) -> dict:
+        completed = sum(1 for sample in self.samples if sample.status == "ok")
+        return {
+            "elapsed": elapsed,
+            "completed": completed,
+            "failed": len(self.samples) - completed,
+            "dropped": self.dropped,
+            "throughput": completed / elapsed if elapsed else 0,
+            "operations": {
+                operation: {
+                    "latency": self.latency[operation].toDict(),
+                    "submit_included": self.submit_included[operation].toDict(),
+                    "included_receipt": self.included_receipt[operation].toDict(),
+                    "gas": self.gas[operation].toDict(),
+                }
+                for operation in list(self.latency)
+            },
+            "endpoints": {
+                endpoint: {
+                    "throughput": (
+                        sum(self.throughput.bins[endpoint].values()) / elapsed
+                        if elapsed
+                        else 0
+                    ),
+                    "tps": self.throughput.series(endpoint),
+                }
+                for endpoint in list(self.throughput.bins)
+            },
+            "failures": dict(self.failures),
+            "retries": dict(self.retries),
+            "rpc": self.rpc,
+        }
+
+    def writeJSON(self, path: str, elapsed: float, parameters: dict = None):
+        with open(path, "w") as f:
+            json.dump(
+                {"parameters": parameters or {}, **self.summary(elapsed)}, f, indent=2
+            )
+
+    def writeCSV(self, path: str):
+        # One row per operation, times relative to the start of the run
+        columns = [field.name for field in fields(Sample)]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for sample in self.samples:
+                row = asdict(sample)
+                for column in (
+                    "scheduled",
+                    "finished",
+                    "submitted",
+                    "included",
+                    "received",
+                ):
+                    if row[column] is not None:
+                        row[column] = round(row[column] - self.start, 6)
+                writer.writerow(row)
+
+    def printSummary(self, elapsed: float):
+        summary = self.summary(elapsed)
+        print(
+            f"Completed: {summary['completed']}, failed: {summary['failed']}, dropped: {summary['dropped']}"
+        )
+        print(
+            f"Throughput: {summary['throughput']:.2f} operations/s over {elapsed:.1f}s"
+        )
+        for operation, histograms in summary["operations"].items():
+            print(f"{operation}:")
+            for name in ("latency", "submit_included", "included_receipt"):
+                histogram = histograms[name]
+                if histogram["count"] == 0:
+                    continue
+                print(
+                    f"  {name:<17}"
+                    + " ".join(
+                        f"p{p:g}: {histogram[f'p{p:g}']:.3f}s" for p in PERCENTILES
+                    )
+                    + f" max: {histogram['max']:.3f}s"
+                )
+            if histograms["gas"]["count"]:
+                print(f"  gas mean: {histograms['gas']['mean']:.0f}")
+        for endpoint, values in summary["endpoints"].items():
+            tps = values["tps"]
+            print(
+                f"{endpoint}: {values['throughput']:.2f} operations/s"
+                + (f", peak {max(tps):.0f}/s" if tps else "")
+            )
+        for endpoint, values in summary["rpc"].items():
+            if values["requests"] == 0:
+                continue
+            print(
+                f"{endpoint}: {values['requests']} RPC requests, {values['errors']} errors"
+                + (
+                    f", mean {values['mean'] * 1000:.1f}ms, max {values['max'] * 1000:.1f}ms"
+                    if values["mean"] is not None
+                    else ""
+                )
+                + (
+                    ""
+                    if values["circuit"] == "closed"
+                    else f", circuit {values['circuit']}"
+                )
+            )
+        for cause, n in summary["failures"].items():
+            print(f"Failed ({cause}): {n}")
+        for cause, n in summary["retries"].items():
+            print(f"Retried ({cause}): {n}")
@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from solcx import install_solc
+from web3 import Web3
+from performance_test.membership_gas import create_developers, deploy, transact
+
+GROUP_SIZES = [1, 10, 50, 100, 250, 500]
+READ_REPETITIONS = 20
+
+
+def read_latency(fun) -> float:
+    start_time = time.perf_counter()
+    for _ in range(READ_REPETITIONS):
+        fun.call()
+    return (time.perf_counter() - start_time) / READ_REPETITIONS * 1000
+
+
+def benchmark(path: str, group_size: int) -> dict:
+    from web3.providers.eth_tester import EthereumTesterProvider
+
+    provider = EthereumTesterProvider()
+    w3 = Web3(provider)
+    contract = deploy(w3, path)
+    # The voter is not a member of the group
+    admin, voter, *members = create_developers(
+        w3, contract, group_size + 1, provider.ethereum_tester
+    )
+    transact(w3, contract.functions.createGroup("group"), admin)
+    for member in members:
+        transact(w3, contract.functions.requestGroupAccess("group"), member)
+        transact(w3, contract.functions.acceptGroupRequest("group", member), admin)
+    transact(w3, contract.functions.createProject("group", "project"), admin)
+
+    results = {
+        "add_library": transact(
+            w3, contract.functions.addLibrary("project", "CID", "1.0.0", [""]), admin
+        ),
+        "record_interactions": transact(
+            w3, contract.functions.recordInteractions(["CID"]), voter
+        ),
+        "vote_developer": transact(w3, contract.functions.voteDeveloper(admin), voter),
+    }
+    read = contract.functions.getLibraryInformationWithLevel("CID")
+    results["read_gas"] = read.estimateGas()
+    results["read_ms"] = read_latency(read)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gas and latency of the reliability of a library by group size"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=GROUP_SIZES)
+    parser.add_argument("--contract", default="./SoftwareSupplyChain.sol")
+    parser.add_argument(
+        "--baseline",
+        help="an older SoftwareSupplyChain.sol to compare, e.g. from git show",
+    )
+    args = parser.parse_args()
+
+    install_solc("0.8.0")
+    contracts = {"current": args.contract}
+    if args.baseline:
+        contracts = {"baseline": args.baseline, **contracts}
+    print(
+        f"{'contract':<10} {'size':>5} {'addLibrary':>11} {'interaction':>12} {'vote':>8} {'read gas':>9} {'read ms':>8}"
+    )
+    for size in args.sizes:
+        for label, path in contracts.items():
+            results = benchmark(path, size)
+            print(
+                f"{label:<10} {size:>5} {results['add_library']:>11} {results['record_interactions']:>12} {results['vote_developer']:>8} {results['read_gas']:>9} {results['read_ms']:>8.2f}"
+            )
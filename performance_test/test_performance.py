@@ -1,64 +1,32 @@
-import os, sys
-
-import requests
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import time
-import random
-from web3 import Web3
+from web3 import Web3, exceptions
 from dotenv import load_dotenv
-from threading import Thread
-from utils.ipfs import IPFS
+from utils.async_transactions import AsyncTransactions
 from utils.check_dependencies import getDependencies
-
+from utils.ipfs import IPFS
+from utils.ipfs_backends import createBackend
+from utils.providers import createAsyncWeb3
+from utils.semver import maxSatisfying
+from performance_test.metrics import Metrics, Sample, failureCause
 
 load_dotenv()
 
-with open("abi.json", "r") as file:
-    abi = file.read()
-
-with open("token_abi.json", "r") as file:
-    token_abi = file.read()
-
-chain_id: int = int(os.getenv("CHAIN_ID"))
-
-w3_1: Web3 = Web3(Web3.HTTPProvider(os.getenv("BLOCKCHAIN_ADDRESS")))
-contract_1 = w3_1.eth.contract(address=os.getenv("CONTRACT_ADDRESS"), abi=abi)
-token_contract_1 = w3_1.eth.contract(
-    address=os.getenv("TOKEN_CONTRACT_ADDRESS"), abi=token_abi
-)
-
-w3_2: Web3 = Web3(Web3.HTTPProvider(os.getenv("BLOCKCHAIN_ADDRESS_2")))
-contract_2 = w3_2.eth.contract(address=os.getenv("CONTRACT_ADDRESS"), abi=abi)
-token_contract_2 = w3_2.eth.contract(
-    address=os.getenv("TOKEN_CONTRACT_ADDRESS"), abi=token_abi
-) 
+SCENARIOS = ("groups", "projects", "dependencies")
+DEPOSIT = 1000000
+LIBRARY = "print_hi_n_times"
 
-w3_3: Web3 = Web3(Web3.HTTPProvider(os.getenv("BLOCKCHAIN_ADDRESS_3")))
-contract_3 = w3_3.eth.contract(address=os.getenv("CONTRACT_ADDRESS"), abi=abi)
-token_contract_3 = w3_3.eth.contract(
-    address=os.getenv("TOKEN_CONTRACT_ADDRESS"), abi=token_abi
-)
 
-"""
-w3 = w3_1
-contract_ = contract_1 
-token_contract_ = token_contract_1"""
-
-ipfs_auth_token: str = os.getenv("IPFS_AUTH_TOKEN")
-execution_times = {}
-transactions_cost = {}
-failed_threads = []
-threads = []
-transaction_type = ""
-ipfs = IPFS(contract_1, ipfs_auth_token)
-
-public_keys = []
-private_keys = []
-
-
-def parse_ganache_file(n: int = -1):
-    with open("ganache.txt", "r") as file:
+def parse_ganache_file(n: int = -1, path: str = "ganache.txt") -> dict:
+    public_keys = []
+    private_keys = []
+    with open(path, "r") as file:
         lines = file.readlines()
     pk = False
     for line in lines:
@@ -67,526 +35,338 @@ def parse_ganache_file(n: int = -1):
         if line[0] == "(":
             if pk == False:
                 if n == -1 or len(public_keys) < n:
-                    tmp = line.split()
-                    public_keys.append(tmp[1])
+                    public_keys.append(line.split()[1])
             else:
                 if n == -1 or len(private_keys) < n:
-                    tmp = line.split()
-                    private_keys.append(tmp[1])
-    keys = dict(zip(public_keys, private_keys))
-    return keys
-    
-
-def thread_function_groups(id: int, addr: str, private_key: str, contract, token_contract, w3):
-    retry = 0
-    while True:
-        try:
-            nonce: int = w3.eth.getTransactionCount(addr)
-            break
-        except requests.exceptions.HTTPError as e:
-            if retry >= 20:
-                print("retry = 20")
-                return
-            sleep = (2 ** retry + 
-                 random.uniform(0, 2))
-            print(f"[{id}] HTTP retry in {fun}. Attempt number {retry + 1}")
-            time.sleep(sleep*0.1)
-            retry += 1
-    
-    nonce = register_developer(id, addr, private_key, nonce, contract, token_contract, w3)
-
-    # Create groups test
-    create_groups(id, addr, private_key, nonce, 10, contract, token_contract, w3)
-
-
-def thread_function_projects(id: int, addr: str, private_key: str, contract, token_contract, w3):
-    retry = 0
-    while True:
-        try:
-            nonce: int = w3.eth.getTransactionCount(addr)
-            break
-        except requests.exceptions.HTTPError as e:
-            if retry >= 20:
-                print("retry = 20")
-                return
-            sleep = (2 ** retry + 
-                 random.uniform(0, 2))
-            print(f"[{id}] HTTP retry in getTransactionCount. Attempt number {retry + 1}")
-            time.sleep(sleep*0.1)
-            retry += 1
-    nonce = register_developer(id, addr, private_key, nonce, contract, token_contract, w3)
-
-    # Create projects test
-    nonce = create_groups(id, addr, private_key, nonce, 1, contract, token_contract, w3)
-    nonce = create_projects(id, addr, private_key, nonce, 10, contract, token_contract, w3)
-
-
-def thread_function_dependencies(id: int, addr: str, private_key: str, contract, token_contract, w3):
-    retry = 0
-    while True:
-        try:
-            nonce: int = w3.eth.getTransactionCount(addr)
-            break
-        except requests.exceptions.HTTPError as e:
-            if retry >= 20:
-                print("retry = 20")
-                return
-            sleep = (2 ** retry + 
-                 random.uniform(0, 2))
-            print(f"[{id}] HTTP retry in getTransactionCount. Attempt number {retry + 1}")
-            time.sleep(sleep*0.1)
-            retry += 1
-    nonce = register_developer(id, addr, private_key, nonce, contract, token_contract, w3)
-
-    # Check dependencies reliability test
-    if id == 0:
-        nonce = create_groups(id, addr, private_key, nonce, 1, contract, token_contract, w3)
-        nonce = create_projects_with_names(
-            id, addr, private_key, nonce, ["print_hi", "print_hi_n_times"], contract, token_contract, w3
-        )
-        nonce = load_libraries(id, addr, private_key, nonce, contract, token_contract, w3)
-    else:
-        threads[0].join()
-    start_time = time.time()
-    for _ in range(10):
-        nonce = check_dependencies_reliability(id, addr, private_key, nonce, contract, w3)
-    end_time = time.time()
-    execution_times[id] = end_time - start_time
-
-
-def register_developer(id: int, addr: str, private_key: str, nonce: int, contract, token_contract, w3 ):
-    try:
-        n_tokens = 100000
-        print(f"Buying {n_tokens} SCT by thread {id}...")
-        createTransaction(
-            contract.functions.buyTokens,
-            value=n_tokens,
-            nonce=nonce,
-            wait=True,
-            addr=addr,
-            private_key=private_key,
-            key="buy_tokens",
-            id=id,
-            w3=w3
-        )
-        nonce += 1
-        approveTokenFee(
-            3000, 
-            nonce=nonce, 
-            addr=addr, 
-            private_key=private_key, 
-            id=id, 
-            contract=contract,
-            token_contract=token_contract,
-            w3=w3
-        )
-        email = f"test{id}@test.it"
-        nonce += 1
-        createTransaction(
-            contract.functions.addDeveloper,
-            email,
-            nonce=nonce,
-            wait=True,
-            addr=addr,
-            private_key=private_key,
-            key="add_developer",
-            id=id,
-            w3=w3
+                    private_keys.append(line.split()[1])
+    return dict(zip(public_keys, private_keys))
+
+
+def default_endpoints() -> list:
+    names = ("BLOCKCHAIN_ADDRESS", "BLOCKCHAIN_ADDRESS_2", "BLOCKCHAIN_ADDRESS_3")
+    return [os.getenv(name) for name in names if os.getenv(name)]
+
+
+class Account:
+    # One developer account driven by the load generator
+    def __init__(self, id: int, transactions: AsyncTransactions):
+        self.id = id
+        self.transactions = transactions
+        self.sequence = 0
+
+    def next(self) -> int:
+        self.sequence += 1
+        return self.sequence
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        scenario: str,
+        keys: dict,
+        endpoints: list,
+        concurrency: int,
+        duration: float,
+        ramp_up: float = 0,
+        tps: float = None,
+        interval: float = 1.0,
+    ):
+        # With a target TPS operations arrive at a fixed rate whatever the
+        # latency (open loop), otherwise each of the concurrency workers
+        # starts an operation as soon as its previous one ends (closed loop)
+        self.scenario = scenario
+        self.keys = keys
+        self.endpoints = endpoints
+        self.concurrency = concurrency
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.tps = tps
+        self.interval = interval
+        self.run_id = int(time.time())
+        self.metrics = None
+        self.w3 = None
+        self.in_flight = 0
+        self.accounts = []
+        self.dependencies = {}
+
+    def createAccounts(self):
+        with open("abi.json", "r") as file:
+            abi = file.read()
+        with open("token_abi.json", "r") as file:
+            token_abi = file.read()
+        # The contracts only encode the calls, the requests go through an
+        # async Web3 over all the endpoints, which keeps the transactions of
+        # each account on one of them
+        encoder = Web3()
+        contract = encoder.eth.contract(address=os.getenv("CONTRACT_ADDRESS"), abi=abi)
+        token_contract = encoder.eth.contract(
+            address=os.getenv("TOKEN_CONTRACT_ADDRESS"), abi=token_abi
         )
-
-        print(f"Registering a developer with email {email}")
-        return nonce
-    except Exception as error:
-        handle_error(id=id, error=error)
-
-
-def create_groups(
-        id: int, addr: str, private_key: str, nonce: int, n_groups: int, contract, token_contract, w3):
-    try:
-        start_time = time.time()
-        print(f"Creating {n_groups} groups by thread {id}...")
-
-        for i in range(n_groups):
-            nonce += 1
-            approveTokenFee(
-                2000, 
-                nonce=nonce, 
-                addr=addr, 
-                private_key=private_key, 
-                id=id, 
-                contract=contract,
-                token_contract=token_contract,
-                w3=w3
-            )
-            nonce += 1
-            createTransaction(
-                contract.functions.createGroup,
-                f"group{id}_{i}",
-                nonce=nonce,
-                wait=True,
-                addr=addr,
-                private_key=private_key,
-                key="create_group",
-                id=id,
-                w3=w3
-            )
-
-        end_time = time.time()
-        if transaction_type == "create_group":
-            execution_times[id] = end_time - start_time
-            print(f"Thread {id} time (group creation): {end_time - start_time}")
-        return nonce
-    except Exception as error:
-        handle_error(id=id, error=error)
-
-
-def create_projects(
-        id: int, addr: str, private_key: str, nonce: int, n_projects: int, contract, token_contract, w3):
-    try:
-        start_time = time.time()
-        print(f"Creating {n_projects} projects by thread {id}...")
-        for i in range(n_projects):
-            nonce += 1
-            approveTokenFee(
-                2000, 
-                nonce=nonce, 
-                addr=addr, 
-                private_key=private_key, 
-                id=id, 
-                contract=contract,
-                token_contract=token_contract,
-                w3=w3
+        chain_id = int(os.getenv("CHAIN_ID"))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.w3 = createAsyncWeb3(self.endpoints)
+        for id, (addr, private_key) in enumerate(self.keys.items()):
+            transactions = AsyncTransactions(
+                self.w3,
+                chain_id,
+                Web3.toChecksumAddress(addr),
+                private_key,
+                contract,
+                token_contract,
+                semaphore=semaphore,
             )
-            nonce += 1
-            createTransaction(
-                contract.functions.createProject,
-                f"group{id}_0",
-                f"project{id}_{i}",
-                nonce=nonce,
-                wait=True,
-                addr=addr,
-                private_key=private_key,
-                key="create_project",
-                id=id,
-                w3=w3
+            self.accounts.append(Account(id, transactions))
+
+    async def setup(self):
+        print(f"Registering {len(self.accounts)} developers...")
+        await asyncio.gather(*(self.register(account) for account in self.accounts))
+        if self.scenario == "projects":
+            await asyncio.gather(
+                *(
+                    account.transactions.createGroup(self.groupName(account))
+                    for account in self.accounts
+                )
             )
-        end_time = time.time()
-        if transaction_type == "create_project":
-            execution_times[id] = end_time - start_time
-            print(f"Thread {id} time (project creation): {end_time - start_time}")
-        return nonce
-    except Exception as error:
-        handle_error(id=id, error=error)
-
-
-def create_projects_with_names(
-    id: int, addr: str, private_key: str, nonce: int, names: list, contract, token_contract, w3
-):
-    try:
-        start_time = time.time()
-        print(f"Creating {len(names)} projects by thread {id}...")
-        for i in names:
-            nonce += 1
-            approveTokenFee(
-                2000, 
-                nonce=nonce, 
-                addr=addr, 
-                private_key=private_key, 
-                id=id, 
-                contract=contract,
-                token_contract=token_contract,
-                w3=w3
+        elif self.scenario == "dependencies":
+            await self.loadLibraries(self.accounts[0])
+            self.dependencies = getDependencies(LIBRARY)
+
+    async def register(self, account: Account):
+        transactions = account.transactions
+        await transactions.buyDeposit(DEPOSIT)
+        email, _, _ = await transactions.call(
+            transactions.contract.functions.getDeveloperInformation(transactions.addr)
+        )
+        if email == "":
+            await transactions.addDeveloper(f"test{account.id}@test.it")
+
+    async def loadLibraries(self, account: Account):
+        transactions = account.transactions
+        contract = transactions.contract
+        if await transactions.call(contract.functions.getProjectLastVersion(LIBRARY)):
+            return
+        print("Adding the libraries print_hi and print_hi_n_times...")
+        ipfs_auth_token: str = os.getenv("IPFS_AUTH_TOKEN")
+        ipfs = IPFS(contract, ipfs_auth_token, backend=createBackend(ipfs_auth_token))
+        group_name = self.groupName(account)
+        await transactions.createGroup(group_name)
+        CID = ""
+        for name in ("print_hi", LIBRARY):
+            await transactions.createProject(group_name, name)
+            with open(f"local/{name}.js", "rb") as f:
+                dependencies = [CID] if CID else [""]
+                CID = ipfs.uploadFile(f)["cid"]
+            await transactions.addLibrary(name, CID, "1.0.0", dependencies)
+
+    def groupName(self, account: Account) -> str:
+        return f"group{account.id}_{self.run_id}"
+
+    async def operation(self, account: Account) -> tuple:
+        transactions = account.transactions
+        contract = transactions.contract
+        sequence = account.next()
+        if self.scenario == "groups":
+            future = await transactions.createGroup(
+                f"group{account.id}_{self.run_id}_{sequence}", wait=False
             )
-            nonce += 1
-            createTransaction(
-                contract.functions.createProject,
-                f"group{id}_0",
-                i,
-                nonce=nonce,
-                wait=True,
-                addr=addr,
-                private_key=private_key,
-                key="create_project",
-                id=id,
-                w3=w3
+            return "create_group", future
+        if self.scenario == "projects":
+            future = await transactions.createProject(
+                self.groupName(account),
+                f"project{account.id}_{self.run_id}_{sequence}",
+                wait=False,
             )
-
-        end_time = time.time()
-        execution_times[id] = end_time - start_time
-        print(f"Thread {id} time (project creation): {end_time - start_time}")
-        return nonce
-    except Exception as error:
-        handle_error(id=id, error=error)
-
-
-def load_libraries(id: int, addr: str, private_key: str, nonce: int, contract, token_contract, w3):
-    try:
-        with open("local/print_hi.js", "r") as f:
-            file = f.read()
-        print(f"Adding a version in the project print_hi...")
-        CID1: str = ipfs.uploadFile(file)["cid"]
-        nonce += 1
-        approveTokenFee(
-            1000, 
-            nonce=nonce, 
-            addr=addr, 
-            private_key=private_key, 
-            id=id, 
-            contract=contract,
-            token_contract=token_contract,
-            w3=w3
-        )
-        nonce += 1
-        createTransaction(
-            contract.functions.addLibrary,
-            f"print_hi",
-            CID1,
-            "1.0.0",
-            [""],
-            nonce=nonce,
-            wait=True,
-            addr=addr,
-            private_key=private_key,
-            key="add_library",
-            id=id,
-            w3=w3
+            return "create_project", future
+        # The reads of the dependency check followed by the interactions
+        CID = await transactions.call(contract.functions.getProjectLastVersion(LIBRARY))
+        await transactions.call(contract.functions.getLibraryInformationWithLevel(CID))
+        names = list(self.dependencies)
+        version_names = await transactions.call(
+            contract.functions.getProjectsVersionNames(names)
         )
-
-        with open("local/print_hi_n_times.js", "r") as f:
-            file = f.read()
-        print(f"Adding a version in the project print_hi_n_times...")
-
-        CID2: str = ipfs.uploadFile(file)["cid"]
-        nonce += 1
-        approveTokenFee(
-            1000, 
-            nonce=nonce, 
-            addr=addr, 
-            private_key=private_key, 
-            id=id, contract=contract, 
-            token_contract=token_contract,
-            w3=w3
+        selected = {}
+        for name, versions in zip(names, version_names):
+            version = maxSatisfying(versions, self.dependencies[name])
+            if version is not None:
+                selected[name] = version
+        CIDs = await transactions.call(
+            contract.functions.getProjectsVersionCIDs(
+                list(selected), list(selected.values())
             )
-        nonce += 1
-        createTransaction(
-            contract.functions.addLibrary,
-            f"print_hi_n_times",
-            CID2,
-            "1.0.0",
-            [CID1],
-            nonce=nonce,
-            wait=True,
-            addr=addr,
-            private_key=private_key,
-            key="add_library",
-            id=id,
-            w3=w3
         )
-        return nonce
-    except Exception as error:
-        handle_error(id=id, error=error)
-
-
-def check_dependencies_reliability(id: int, addr: str, private_key: str, nonce: int, contract, w3):
-    try:
-        CID = contract.functions.getProjectLastVersion("print_hi_n_times").call()
-        nonce += 1
-        receipt = createTransaction(
-            contract.functions.getLibraryInformationWithLevel,
-            CID,
-            nonce=nonce,
-            wait=True,
-            addr=addr,
-            private_key=private_key,
-            key="get_library_information",
-            id=id,
-            w3=w3
+        await transactions.call(
+            contract.functions.getLibrariesInformationWithLevel(CIDs)
         )
+        future = await transactions.recordInteractions([CID] + CIDs)
+        return "record_interactions", future
 
-        info = contract.events.LibraryInfo().processReceipt(receipt)[0]["args"]
-        print(
-            f"{info.project}\nLast version: {info.version}\nReliability: {info.reliability}\nReliability level: {info.level}"
-        )
-        dependencies = getDependencies("print_hi_n_times")
-        for key in dependencies:
-            if dependencies[key][0] == "^" or dependencies[key][0] == "~":
-                dependencies[key] = dependencies[key][1:]
-            CIDs = contract.functions.getProjectVersions(key).call()
-            for CID in CIDs:
-                nonce += 1
-                receipt = createTransaction(
-                    contract.functions.getLibraryInformationWithLevel,
-                    CID,
-                    nonce=nonce,
-                    wait=True,
-                    addr=addr,
-                    private_key=private_key,
-                    key="get_library_information",
-                    id=id,
-                    w3=w3
-                )
-                info = contract.events.LibraryInfo().processReceipt(receipt)[0]["args"]
-                print(
-                    f"{info.project}\nLast version: {info.version}\nReliability: {info.reliability}\nReliability level: {info.level}"
-                )
-        return nonce
-    except Exception as error:
-        handle_error(id=id, error=error)
-
-
-def createTransaction(
-    fun,
-    *parameters,
-    value=0,
-    nonce: int,
-    addr: str,
-    private_key: str,
-    key: str,
-    id: int,
-    w3: Web3,
-    wait: bool = False,
-):  
-    retry = 0
-    while True:
+    async def measure(self, account: Account, scheduled: float):
+        self.in_flight += 1
+        operation = self.scenario
+        sample = None
         try:
-            transaction = fun(*parameters).buildTransaction(
-                {
-                    "chainId": chain_id,
-                    "from": addr,
-                    "gasPrice": w3.eth.gas_price,
-                    "nonce": nonce,
-                    "value": value,
-                }
-            )
-
-            signed_transaction = w3.eth.account.sign_transaction(
-                transaction, private_key=private_key
-            )
-            transaction_hash = w3.eth.send_raw_transaction(signed_transaction.rawTransaction)
-            break
-        except requests.exceptions.HTTPError as e:
-            if retry >= 20:
-                print("retry = 20")
-                return
-            sleep = (2 ** retry + 
-                 random.uniform(0, 2))
-            print(f"[{id}] HTTP retry in {fun}. Attempt number {retry + 1}")
-            time.sleep(sleep*0.1)
-            retry += 1
-    retry = 0
-    while True:
-        try:
-            if wait:
-                receipt = w3.eth.wait_for_transaction_receipt(transaction_hash, timeout=80, poll_latency=0.6)
-                transactions_cost[id] = transactions_cost.get(id, {key: []})
-                transactions_cost[id][key] = transactions_cost[id].get(key, []) + [
-                    (receipt["gasUsed"], receipt["effectiveGasPrice"])
-                ]
-                return receipt
+            operation, future = await self.operation(account)
+            try:
+                receipt = await account.transactions.waitForReceipt(future)
+            except exceptions.SolidityError as error:
+                # The reason of a revert is read by repeating the call
+                sample = self.failure(account, operation, scheduled, error, "reverted")
             else:
-                return 
-        except requests.exceptions.HTTPError as e:
-            if retry >= 20:
-                return
-            sleep = (2 ** retry + 
-                 random.uniform(0, 2))
-            print(f"[{id}] HTTP retry in wait_for_transaction_receipt. Attempt number {retry + 1}")
-            time.sleep(sleep*0.1)
-            retry += 1
-
-
-def approveTokenFee(fee: int, nonce: int, addr: str, private_key: str, id: int, contract, token_contract, w3):
-    createTransaction(
-        token_contract.functions.approve,
-        contract.address,
-        fee,
-        nonce=nonce,
-        addr=addr,
-        private_key=private_key,
-        wait=True,
-        key="approve",
-        id=id,
-        w3=w3
-    )
-
-
-def handle_error(id: int, error: Exception):
-    print(f"Something went wrong in thread {id}")
-    print(repr(error))
-    if id not in failed_threads:
-        failed_threads.append(id)
+                sample = Sample(
+                    account.id,
+                    self.endpointOf(account),
+                    operation,
+                    scheduled,
+                    time.monotonic(),
+                    "ok",
+                    gas_used=receipt["gasUsed"],
+                )
+            sample.submitted = getattr(future, "submitted_at", None)
+            sample.included = getattr(future, "included_at", None)
+            sample.received = getattr(future, "received_at", None)
+        except Exception as error:
+            sample = self.failure(account, operation, scheduled, error)
+        finally:
+            self.in_flight -= 1
+        self.metrics.record(sample)
+
+    def failure(
+        self,
+        account: Account,
+        operation: str,
+        scheduled: float,
+        error: Exception,
+        cause: str = None,
+    ) -> Sample:
+        return Sample(
+            account.id,
+            self.endpointOf(account),
+            operation,
+            scheduled,
+            time.monotonic(),
+            "error",
+            cause=cause or failureCause(error),
+            error=repr(error),
+        )
 
+    def endpointOf(self, account: Account) -> str:
+        return self.w3.provider.pool.endpointOf(account.transactions.addr)
+
+    def arrival(self, k: int) -> float:
+        # Time of the k-th arrival when the rate grows linearly to tps during
+        # the ramp-up and then stays constant
+        ramp_arrivals = self.tps * self.ramp_up / 2
+        if k < ramp_arrivals:
+            return math.sqrt(2 * self.ramp_up * k / self.tps)
+        return self.ramp_up + (k - ramp_arrivals) / self.tps
+
+    async def openLoop(self, start: float):
+        # Latencies are measured from the scheduled arrival, so the time an
+        # operation waits behind a saturated node is not hidden
+        tasks = []
+        k = 0
+        scheduled = start
+        while scheduled < start + self.duration:
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.in_flight >= self.concurrency:
+                self.metrics.dropped += 1
+            else:
+                account = self.accounts[k % len(self.accounts)]
+                tasks.append(asyncio.create_task(self.measure(account, scheduled)))
+            k += 1
+            scheduled = start + self.arrival(k)
+        await asyncio.gather(*tasks)
+
+    async def closedLoop(self, start: float):
+        async def worker(n: int):
+            await asyncio.sleep(self.ramp_up * n / self.concurrency)
+            accounts = self.accounts[n :: self.concurrency] or [
+                self.accounts[n % len(self.accounts)]
+            ]
+            i = 0
+            while time.monotonic() < start + self.duration:
+                await self.measure(accounts[i % len(accounts)], time.monotonic())
+                i += 1
+
+        await asyncio.gather(*(worker(n) for n in range(self.concurrency)))
+
+    async def run(self) -> float:
+        self.createAccounts()
+        await self.setup()
+        mode = "open" if self.tps else "closed"
+        print(f"Running the {self.scenario} scenario in {mode} loop...")
+        start = time.monotonic()
+        self.metrics = Metrics(start, self.interval)
+        if self.tps:
+            await self.openLoop(start)
+        else:
+            await self.closedLoop(start)
+        elapsed = time.monotonic() - start
+        self.metrics.retries["nonce"] = sum(
+            nonce_manager.retried for nonce_manager in self.nonceManagers()
+        )
+        self.metrics.rpc = self.w3.provider.pool.stats()
+        self.metrics.retries["rpc"] = sum(
+            values["retries"] for values in self.metrics.rpc.values()
+        )
+        await self.w3.provider.close()
+        return elapsed
 
-def process_transactions_cost(transaction_type):
-    gas_costs = []
-    gas_prices = []
-    for id in transactions_cost:
-        for transaction_keys in transactions_cost[id]:
-            if transaction_keys == transaction_type:
-                for transaction in transactions_cost[id][transaction_keys]:
-                    gas_costs.append(transaction[0])
-                    gas_prices.append(transaction[1])
-    print("Gas cost min: " + str(min(gas_costs)))
-    print("Gas cost max: " + str(max(gas_costs)))
-    print("Gas cost mean: " + str(sum(gas_costs) / len(gas_costs)))
-    print("Total gas cost: " + str(sum(gas_costs)))
-    print()
-    print("Gas price min: " + str(min(gas_prices)))
-    print("Gas price max: " + str(max(gas_prices)))
-    print("Gas price mean: " + str(sum(gas_prices) / len(gas_prices)))
+    def nonceManagers(self) -> set:
+        return {account.transactions.nonce_manager for account in self.accounts}
 
-"""
-def print_ex_time():
-    while True:
-        time.sleep(5)
-        print(execution_times)"""
 
 if __name__ == "__main__":
-    keys: dict = parse_ganache_file(50)
-    i: int = 0
-    cmd = input(
-        "Select one of the following:"
-        + "\n1 - Groups creation test"
-        + "\n2 - Projects creation test"
-        + "\n3 - Check dependencies reliability test\n"
+    parser = argparse.ArgumentParser(
+        description="Load generator for the SoftwareSupplyChain contract"
     )
-    if cmd == "1":
-        fun = thread_function_groups
-        transaction_type = "create_group"
-    elif cmd == "2":
-        fun = thread_function_projects
-        transaction_type = "create_project"
-    elif cmd == "3":
-        fun = thread_function_dependencies
-        transaction_type = "get_library_information"
-    else:
-        print("Insert a valid command")
-        quit()
-
-    for addr in keys:
-        if i % 3 == 0:
-            con = contract_1
-            tok_con = token_contract_1
-            w3_ = w3_1
-        elif i % 3 == 1:
-            con = contract_2
-            tok_con = token_contract_2
-            w3_ = w3_2
-        elif i % 3 == 2:
-            con = contract_3
-            tok_con = token_contract_3
-            w3_ = w3_3
-        t = Thread(target=fun, args=(i, addr, keys[addr], con, tok_con, w3_))
-        i += 1
-        threads.append(t)
-        t.start()
-
-    for t in threads:
-        t.join()
-    print(f"{len(failed_threads)} threads failed")
-    print(len(execution_times.keys()))
-    print(
-        f"Execution time mean: {sum(execution_times.values())/len(execution_times.keys())}"
+    parser.add_argument("--scenario", choices=SCENARIOS, default="groups")
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=50,
+        help="workers of the closed loop, maximum operations in flight of the open loop",
     )
-
-    process_transactions_cost(transaction_type=transaction_type)
+    parser.add_argument(
+        "--tps", type=float, help="arrival rate of the open loop, closed loop if unset"
+    )
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument(
+        "--ramp-up",
+        type=float,
+        default=0,
+        help="seconds to reach the target rate or to start all the workers",
+    )
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=default_endpoints(),
+        help="RPC endpoints, the accounts are spread over them and the reads go to the least busy",
+    )
+    parser.add_argument("--keys", default="ganache.txt", help="output of ganache")
+    parser.add_argument(
+        "--interval", type=float, default=1.0, help="seconds of each throughput bin"
+    )
+    parser.add_argument("--json", help="file for the summary of the run")
+    parser.add_argument("--csv", help="file for the timings of every operation")
+    args = parser.parse_args()
+
+    generator = LoadGenerator(
+        args.scenario,
+        parse_ganache_file(args.accounts, args.keys),
+        args.endpoints,
+        args.concurrency,
+        args.duration,
+        args.ramp_up,
+        args.tps,
+        args.interval,
+    )
+    elapsed = asyncio.run(generator.run())
+    generator.metrics.printSummary(elapsed)
+    if args.json:
+        generator.metrics.writeJSON(args.json, elapsed, vars(args))
+    if args.csv:
+        generator.metrics.writeCSV(args.csv)
@@ -0,0 +1,29 @@
+import argparse
+from dotenv import load_dotenv
+from utils.client import SupplyChainClient, createClientFromEnv
+from utils.publisher import Publisher, PublishError, UPLOAD_WORKERS, loadManifest
+
+load_dotenv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Upload and publish a release of libraries in dependency order"
+    )
+    parser.add_argument("path", help="manifest file or directory of artifacts")
+    parser.add_argument("--version", help="version of the artifacts of a directory")
+    parser.add_argument(
+        "--checkpoint",
+        default=".publish_checkpoint.json",
+        help="file recording the progress, an interrupted run resumes from it",
+    )
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS)
+    args = parser.parse_args()
+
+    client: SupplyChainClient = createClientFromEnv()
+    publisher = Publisher(client, args.checkpoint, args.workers)
+    try:
+        checkpoint = publisher.publish(loadManifest(args.path, args.version))
+        for name, entry in checkpoint.items():
+            print(f"{name}: {entry['CID']}")
+    except PublishError as error:
+        print(error)
@@ -0,0 +1,264 @@
+import asyncio
+import time
+from web3 import Web3, exceptions
+from utils.nonce_manager import AsyncNonceManager
+from utils.receipt_poller import (
+    RECEIPT_TIMEOUT,
+    REVERT_MESSAGE,
+    AsyncReceiptPoller,
+    TransactionReverted,
+    getAsyncReceiptPoller,
+)
+from utils.rpc_batch import decodeOutput
+
+MAX_CONCURRENCY = 64
+
+
+class AsyncTransactions:
+    def __init__(
+        self,
+        w3: Web3,
+        chain_id: int,
+        addr: str,
+        private_key: str,
+        contract,
+        token_contract=None,
+        nonce_manager: AsyncNonceManager = None,
+        receipt_poller: AsyncReceiptPoller = None,
+        semaphore: asyncio.Semaphore = None,
+    ):
+        # w3 uses the async provider, contract and token_contract only
+        # encode the calls so they can come from a synchronous Web3.
+        # The semaphore is shared by all the accounts driven by a process to
+        # bound the requests in flight
+        self.w3 = w3
+        self.chain_id = chain_id
+        self.addr = addr
+        self.private_key = private_key
+        self.contract = contract
+        self.token_contract = token_contract
+        self.nonce_manager = nonce_manager or AsyncNonceManager(w3)
+        self.receipt_poller = receipt_poller or getAsyncReceiptPoller(w3)
+        self.semaphore = semaphore or asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def addDeveloper(self, email: str, wait: bool = True):
+        return await self.createFeeTransaction(
+            3000, self.contract.functions.addDeveloper, email, wait=wait
+        )
+
+    async def createGroup(self, group_name: str, wait: bool = True):
+        return await self.createFeeTransaction(
+            2000, self.contract.functions.createGroup, group_name, wait=wait
+        )
+
+    async def createProject(self, group_name: str, project_name: str, wait=True):
+        return await self.createFeeTransaction(
+            2000,
+            self.contract.functions.createProject,
+            group_name,
+            project_name,
+            wait=wait,
+        )
+
+    async def requestGroupAccess(self, group_name: str, wait: bool = True):
+        return await self.createTransaction(
+            self.contract.functions.requestGroupAccess, group_name, wait=wait
+        )
+
+    async def acceptGroupRequest(self, group_name: str, addr: str, wait=True):
+        return await self.createTransaction(
+            self.contract.functions.acceptGroupRequest, group_name, addr, wait=wait
+        )
+
+    async def removeDeveloperFromGroup(self, group_name: str, addr: str, wait=True):
+        return await self.createTransaction(
+            self.contract.functions.removeDeveloperFromGroup,
+            group_name,
+            addr,
+            wait=wait,
+        )
+
+    async def acceptGroupRequests(self, group_name: str, addrs: list, wait=True):
+        return await self.createTransaction(
+            self.contract.functions.acceptGroupRequests, group_name, addrs, wait=wait
+        )
+
+    async def removeDevelopersFromGroup(self, group_name: str, addrs: list, wait=True):
+        return await self.createTransaction(
+            self.contract.functions.removeDevelopersFromGroup,
+            group_name,
+            addrs,
+            wait=wait,
+        )
+
+    async def addLibrary(
+        self,
+        project_name: str,
+        CID: str,
+        version: str,
+        dependencies: list,
+        wait: bool = True,
+    ):
+        # The file is uploaded to IPFS by the caller, the CID is published here
+        return await self.createFeeTransaction(
+            1000,
+            self.contract.functions.addLibrary,
+            project_name,
+            CID,
+            version,
+            dependencies or [""],
+            wait=wait,
+        )
+
+    async def voteDeveloper(self, developer: str, wait: bool = True):
+        return await self.createTransaction(
+            self.contract.functions.voteDeveloper, developer, wait=wait
+        )
+
+    async def reportDeveloper(self, developer: str, wait: bool = True):
+        return await self.createTransaction(
+            self.contract.functions.reportDeveloper, developer, wait=wait
+        )
+
+    async def updateReliability(self, wait: bool = True):
+        return await self.createTransaction(
+            self.contract.functions.updateReliability, wait=wait
+        )
+
+    async def claimInteractionRewards(self, wait: bool = True):
+        return await self.createTransaction(
+            self.contract.functions.claimInteractionRewards, wait=wait
+        )
+
+    async def changeAdmin(self, new_admin: str, group_name: str, wait=True):
+        return await self.createTransaction(
+            self.contract.functions.changeAdmin, new_admin, group_name, wait=wait
+        )
+
+    async def recordInteractions(self, CIDs: list, wait: bool = False):
+        return await self.createTransaction(
+            self.contract.functions.recordInteractions,
+            list(dict.fromkeys(CIDs)),
+            wait=wait,
+        )
+
+    async def buyTokens(self, tokens: int, wait: bool = True):
+        return await self.createTransaction(
+            self.contract.functions.buyTokens, value=tokens, wait=wait
+        )
+
+    async def buyDeposit(self, tokens: int, wait: bool = True):
+        return await self.createTransaction(
+            self.contract.functions.buyDeposit, value=tokens, wait=wait
+        )
+
+    async def withdrawTokens(self, tokens: int, wait: bool = True):
+        return await self.createTransaction(
+            self.contract.functions.withdrawTokens, tokens, wait=wait
+        )
+
+    async def buyReliability(self, reliability: int, wait: bool = True):
+        reliability_cost: int = await self.call(
+            self.contract.functions.reliability_cost()
+        )
+        return await self.createFeeTransaction(
+            reliability * reliability_cost,
+            self.contract.functions.buyReliability,
+            reliability,
+            wait=wait,
+        )
+
+    async def getDeposit(self, addr: str = None) -> int:
+        return await self.call(self.contract.functions.getDeposit(addr or self.addr))
+
+    async def call(self, fun, block_identifier="latest"):
+        async with self.semaphore:
+            data = await self.w3.eth.call(
+                {"to": fun.address, "data": fun._encode_transaction_data()},
+                block_identifier,
+            )
+        return decodeOutput(self.w3, fun, data)
+
+    async def createTransaction(
+        self,
+        fun,
+        *parameters,
+        value=0,
+        gas: int = None,
+        wait: bool = True,
+        simulate: bool = True,
+    ):
+        transaction_hash = await self.sendTransaction(
+            fun, *parameters, value=value, gas=gas, simulate=simulate
+        )
+        submitted_at = time.monotonic()
+        future = self.receipt_poller.watch(transaction_hash)
+        future.submitted_at = submitted_at
+        if wait:
+            return await self.waitForReceipt(future)
+        return future
+
+    async def sendTransaction(
+        self, fun, *parameters, value=0, gas: int = None, simulate: bool = True
+    ):
+        bound = fun(*parameters)
+        transaction = {
+            "chainId": self.chain_id,
+            "from": self.addr,
+            "to": bound.address,
+            "data": bound._encode_transaction_data(),
+            "value": value,
+        }
+        # The semaphore is only held by the requests, not while waiting for
+        # the nonce lock, so the sends of a busy address don't keep the slots
+        # of the other accounts
+        async with self.semaphore:
+            transaction["gasPrice"] = await self.w3.eth.gas_price
+            # The gas estimation runs the transaction, so it reports the
+            # revert reason like the simulation of Transactions
+            if gas is None:
+                transaction["gas"] = await self.w3.eth.estimate_gas(transaction)
+            else:
+                transaction["gas"] = gas
+                if simulate:
+                    await self.w3.eth.call(transaction)
+
+        async def send(nonce: int):
+            signed_transaction = self.w3.eth.account.sign_transaction(
+                {**transaction, "nonce": nonce}, private_key=self.private_key
+            )
+            async with self.semaphore:
+                return await self.w3.eth.send_raw_transaction(
+                    signed_transaction.rawTransaction
+                )
+
+        return await self.nonce_manager.sendWithNonce(self.addr, send)
+
+    async def waitForReceipt(self, future):
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), RECEIPT_TIMEOUT)
+        except TransactionReverted as error:
+            await self.raiseRevertReason(error.receipt)
+
+    async def raiseRevertReason(self, tx_receipt):
+        transaction = await self.w3.eth.get_transaction(tx_receipt["transactionHash"])
+        async with self.semaphore:
+            await self.w3.eth.call(
+                {
+                    "from": transaction["from"],
+                    "to": transaction["to"],
+                    "data": transaction["input"],
+                    "value": transaction["value"],
+                },
+                tx_receipt["blockNumber"],
+            )
+        raise TransactionReverted(tx_receipt)
+
+    async def createFeeTransaction(self, fee: int, fun, *parameters, wait=True):
+        deposit: int = await self.getDeposit()
+        if deposit < fee:
+            raise exceptions.SolidityError(
+                REVERT_MESSAGE
+                + f"You need {fee} SCT deposited to pay the fee, you have {deposit}"
+            )
+        return await self.createTransaction(fun, *parameters, wait=wait)
@@ -1,21 +1,159 @@
-import subprocess
-
-
-def getDependencies(name: str) -> dict:
-    a = subprocess.run(
-        ["npm-remote-ls", "-e", name],
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-    )
-
-    dep = str(a.stdout).strip().replace("\\n", " ").split(" ")
-    dependencies = {}
-    if "loading:" in dep:
-        for i in range(2, len(dep)):
-            if i != 2 and dep[i - 1] != "loading:" and dep[i] != "loading:":
-                break
-            if dep[i] != "loading:":
-                tmp = dep[i].split("@")
-                dependencies[tmp[0]] = tmp[1]
-    return dependencies
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+from utils.ipfs_backends import REQUEST_TIMEOUT, createSession
+from utils.retry import RetryPolicy, getRetryPolicy
+from utils.semver import maxSatisfying
+
+NPM_REGISTRY = "https://registry.npmjs.org"
+CACHE_TTL = 600
+
+
+class DependencyResolver:
+    def __init__(
+        self,
+        registry: str = None,
+        ttl: int = CACHE_TTL,
+        session=None,
+        retry_policy: RetryPolicy = None,
+    ):
+        # registry is either the URL of an npm registry or a directory of
+        # <name>.json metadata documents standing in for one
+        registry = registry or os.getenv("NPM_REGISTRY", NPM_REGISTRY)
+        self.registry = registry.rstrip("/")
+        self.ttl = ttl
+        self.session = session or createSession()
+        self.retry_policy = retry_policy or getRetryPolicy()
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.trees = {}
+
+    def cached(self, cache: dict, key):
+        with self.lock:
+            entry = cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def store(self, cache: dict, key, value):
+        with self.lock:
+            cache[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def getDocument(self, name: str) -> dict:
+        document = self.cached(self.documents, name)
+        if document is not None:
+            return document
+        if self.registry.startswith("http://") or self.registry.startswith("https://"):
+            document = self.retry_policy.call(
+                self.registry, lambda: self.fetchDocument(name)
+            )
+        else:
+            path = os.path.join(self.registry, f"{name.replace('/', '%2f')}.json")
+            if not os.path.exists(path):
+                raise KeyError(f"The package {name} doesn't exist")
+            with open(path, "r") as f:
+                document = json.load(f)
+        return self.store(self.documents, name, document)
+
+    def fetchDocument(self, name: str) -> dict:
+        response = self.session.get(
+            f"{self.registry}/{quote(name, safe='@')}",
+            headers={"Accept": "application/vnd.npm.install-v1+json"},
+            timeout=REQUEST_TIMEOUT,
+        )
+        if response.status_code == 404:
+            raise KeyError(f"The package {name} doesn't exist")
+        response.raise_for_status()
+        return response.json()
+
+    def resolveVersion(self, name: str, version_range: str = "latest") -> str:
+        document = self.getDocument(name)
+        tags = document.get("dist-tags", {})
+        if version_range in tags:
+            return tags[version_range]
+        if version_range in ("", "*") and "latest" in tags:
+            return tags["latest"]
+        version = maxSatisfying(document.get("versions", {}).keys(), version_range)
+        if version is None:
+            raise KeyError(f"No version of {name} satisfies {version_range}")
+        return version
+
+    def getDependencies(self, name: str, version_range: str = "latest") -> dict:
+        version = self.resolveVersion(name, version_range)
+        manifest = self.getDocument(name)["versions"][version]
+        return dict(manifest.get("dependencies", {}))
+
+    def resolve(self, name: str, version_range: str = "latest") -> dict:
+        return self.resolveTree(name, version_range, ())
+
+    def resolveTree(self, name: str, version_range: str, path: tuple) -> dict:
+        version = self.resolveVersion(name, version_range)
+        key = (name, version)
+        tree = self.cached(self.trees, key)
+        if tree is not None:
+            return dict(tree, range=version_range)
+        node = {"name": name, "version": version, "range": version_range}
+        if key in path:
+            # Circular dependency, the subtree is already being resolved
+            return dict(node, circular=True, dependencies={})
+        dependencies = {}
+        for dependency, dependency_range in self.getDependencies(name, version).items():
+            try:
+                dependencies[dependency] = self.resolveTree(
+                    dependency, dependency_range, path + (key,)
+                )
+            except KeyError as error:
+                # Missing from the registry or not a semver range (git, file,
+                # URL...), the rest of the tree is still resolved
+                dependencies[dependency] = {
+                    "name": dependency,
+                    "version": None,
+                    "range": dependency_range,
+                    "unresolved": error.args[0],
+                    "dependencies": {},
+                }
+        node["dependencies"] = dependencies
+        return self.store(self.trees, key, node)
+
+
+def readLockfile(path: str) -> dict:
+    if os.path.isdir(path):
+        path = os.path.join(path, "package-lock.json")
+    with open(path, "r") as f:
+        lockfile = json.load(f)
+    # lockfileVersion 2 and 3 list every installed package under "packages",
+    # keyed by its path in node_modules
+    packages = lockfile.get("packages", {})
+    graph = {}
+    for package_path, package in packages.items():
+        if package_path == "":
+            continue
+        name = package.get("name") or package_path.split("node_modules/")[-1]
+        graph[name] = {
+            "version": package.get("version"),
+            "dependencies": dict(package.get("dependencies", {})),
+        }
+    return graph
+
+
+resolver = None
+resolver_lock = threading.Lock()
+
+
+def getResolver() -> DependencyResolver:
+    global resolver
+    with resolver_lock:
+        if resolver is None:
+            resolver = DependencyResolver()
+        return resolver
+
+
+def getDependencies(name: str, version_range: str = "latest") -> dict:
+    return getResolver().getDependencies(name, version_range)
+
+
+def getDependencyTree(name: str, version_range: str = "latest") -> dict:
+    return getResolver().resolve(name, version_range)
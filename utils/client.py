@@ -0,0 +1,544 @@
+import os
+import time
+from dataclasses import dataclass, field
+from web3 import Web3, exceptions
+from utils.ipfs import IPFS
+from utils.ipfs_cache import IPFSCache, IPFS_CACHE_DIR, IPFS_CACHE_SIZE
+from utils.ipfs_backends import createBackend
+from utils.check_dependencies import getDependencyTree, readLockfile
+from utils.contract_reader import ContractReader
+from utils.indexer import Indexer
+from utils.rpc_batch import BatchCaller
+from utils.view_cache import ViewCache
+from utils.nonce_manager import NonceManager, isNonceError
+from utils.providers import createWeb3
+from utils.retry import decorrelatedJitter
+from utils.receipt_poller import (
+    RECEIPT_TIMEOUT,
+    REVERT_MESSAGE,
+    ReceiptPoller,
+    TransactionReverted,
+    getReceiptPoller,
+)
+
+# The approval sent in the same block is still pending, so the deposit
+# can't be gas-estimated against the latest state
+DEPOSIT_TRANSACTION_GAS = 200000
+NONCE_RETRIES = 3
+RELIABILITY_LEVELS = ("Very Low", "Low", "Medium", "High", "Very High")
+
+
+@dataclass
+class TransactionResult:
+    transaction_hash: str
+    block_number: int
+    gas_used: int
+    status: int
+
+    @classmethod
+    def fromReceipt(cls, receipt) -> "TransactionResult":
+        return cls(
+            transaction_hash=Web3.toHex(receipt["transactionHash"]),
+            block_number=receipt["blockNumber"],
+            gas_used=receipt["gasUsed"],
+            status=receipt["status"],
+        )
+
+
+@dataclass
+class PublishedLibrary:
+    CID: str
+    transaction: TransactionResult
+
+
+@dataclass
+class DeveloperInfo:
+    address: str
+    email: str
+    reliability: int
+    registration_date: int
+
+
+@dataclass
+class LibraryInfo:
+    CID: str
+    version: str
+    project: str
+    dependencies: list
+    reliability: int
+    level: str = None
+
+
+@dataclass
+class DependencyReport:
+    library: LibraryInfo
+    # Requested range of every dependency found on chain, with the version
+    # selected for it
+    dependencies: list = field(default_factory=list)
+    ranges: dict = field(default_factory=dict)
+    levels: dict = field(default_factory=dict)
+    # The graph resolved from the registry, see DependencyResolver.resolve
+    tree: dict = None
+
+
+class SupplyChainClient:
+    def __init__(
+        self,
+        w3: Web3,
+        chain_id: int,
+        addr: str,
+        private_key: str,
+        contract,
+        token_contract,
+        ipfs: IPFS,
+        nonce_manager: NonceManager = None,
+        receipt_poller: ReceiptPoller = None,
+        reader: ContractReader = None,
+        index: Indexer = None,
+    ):
+        self.w3 = w3
+        self.chain_id = chain_id
+        self.addr = addr
+        self.private_key = private_key
+        self.contract = contract
+        self.token_contract = token_contract
+        self.ipfs = ipfs
+        self.reader = reader or ContractReader(contract)
+        self.nonce_manager = nonce_manager or NonceManager(w3)
+        self.receipt_poller = receipt_poller or getReceiptPoller(w3)
+        # Optional local mirror of the contract events, see utils.indexer
+        self.index = index
+
+    # Transactions, they return a TransactionResult, or a Future of the
+    # receipt when wait is False
+
+    def addDeveloper(self, email: str, wait: bool = True):
+        return self.createFeeTransaction(
+            3000, self.contract.functions.addDeveloper, email, wait=wait
+        )
+
+    def createGroup(self, group_name: str, wait: bool = True):
+        return self.createFeeTransaction(
+            2000, self.contract.functions.createGroup, group_name, wait=wait
+        )
+
+    def createProject(self, group_name: str, project_name: str, wait: bool = True):
+        return self.createFeeTransaction(
+            2000,
+            self.contract.functions.createProject,
+            group_name,
+            project_name,
+            wait=wait,
+        )
+
+    def requestGroupAccess(self, group_name: str, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.requestGroupAccess, group_name, wait=wait
+        )
+
+    def acceptGroupRequest(self, group_name: str, addr: str, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.acceptGroupRequest, group_name, addr, wait=wait
+        )
+
+    def removeDeveloperFromGroup(self, group_name: str, addr: str, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.removeDeveloperFromGroup,
+            group_name,
+            addr,
+            wait=wait,
+        )
+
+    def acceptGroupRequests(self, group_name: str, addrs: list, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.acceptGroupRequests, group_name, addrs, wait=wait
+        )
+
+    def removeDevelopersFromGroup(
+        self, group_name: str, addrs: list, wait: bool = True
+    ):
+        return self.createTransaction(
+            self.contract.functions.removeDevelopersFromGroup,
+            group_name,
+            addrs,
+            wait=wait,
+        )
+
+    def uploadLibrary(self, path: str) -> str:
+        with open(path, "rb") as f:
+            return self.ipfs.uploadFile(f)["cid"]
+
+    def addLibrary(
+        self,
+        project_name: str,
+        path: str,
+        version: str,
+        dependencies: list = None,
+        wait: bool = True,
+    ) -> PublishedLibrary:
+        CID: str = self.uploadLibrary(path)
+        transaction = self.publishLibrary(
+            project_name, CID, version, dependencies, wait=wait
+        )
+        return PublishedLibrary(CID=CID, transaction=transaction)
+
+    def publishLibrary(
+        self,
+        project_name: str,
+        CID: str,
+        version: str,
+        dependencies: list = None,
+        wait: bool = True,
+    ):
+        # The contract expects [""] for a library without dependencies
+        return self.createFeeTransaction(
+            1000,
+            self.contract.functions.addLibrary,
+            project_name,
+            CID,
+            version,
+            dependencies or [""],
+            wait=wait,
+        )
+
+    def voteDeveloper(self, developer: str, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.voteDeveloper, developer, wait=wait
+        )
+
+    def reportDeveloper(self, developer: str, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.reportDeveloper, developer, wait=wait
+        )
+
+    def updateReliability(self, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.updateReliability, wait=wait
+        )
+
+    def claimInteractionRewards(self, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.claimInteractionRewards, wait=wait
+        )
+
+    def changeAdmin(self, new_admin: str, group_name: str, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.changeAdmin, new_admin, group_name, wait=wait
+        )
+
+    def recordInteractions(self, CIDs: list, wait: bool = False):
+        return self.createTransaction(
+            self.contract.functions.recordInteractions,
+            list(dict.fromkeys(CIDs)),
+            wait=wait,
+        )
+
+    def buyTokens(self, tokens: int, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.buyTokens, value=tokens, wait=wait
+        )
+
+    def buyDeposit(self, tokens: int, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.buyDeposit, value=tokens, wait=wait
+        )
+
+    def depositTokens(self, tokens: int, wait: bool = True):
+        try:
+            self.contract.functions.depositTokens(tokens).call({"from": self.addr})
+        except exceptions.SolidityError as error:
+            # Only the missing allowance is expected to fail the simulation
+            if "Check the token allowance" not in str(error):
+                raise
+        self.approveTokenFee(tokens, wait=False)
+        try:
+            return self.createTransaction(
+                self.contract.functions.depositTokens,
+                tokens,
+                gas=DEPOSIT_TRANSACTION_GAS,
+                simulate=False,
+                wait=wait,
+            )
+        except exceptions.SolidityError:
+            self.approveTokenFee(0)
+            raise
+
+    def withdrawTokens(self, tokens: int, wait: bool = True):
+        return self.createTransaction(
+            self.contract.functions.withdrawTokens, tokens, wait=wait
+        )
+
+    def buyReliability(self, reliability: int, wait: bool = True):
+        reliability_cost: int = int(
+            self.reader.call(self.contract.functions.reliability_cost())
+        )
+        return self.createFeeTransaction(
+            reliability * reliability_cost,
+            self.contract.functions.buyReliability,
+            reliability,
+            wait=wait,
+        )
+
+    def approveTokenFee(self, fee: int, wait: bool = True):
+        return self.createTransaction(
+            self.token_contract.functions.approve,
+            self.contract.address,
+            fee,
+            wait=wait,
+            simulate=False,
+        )
+
+    # Reads
+
+    def getDeveloperInformation(self, addr: str) -> DeveloperInfo:
+        email, reliability, registration_date = self.reader.call(
+            self.contract.functions.getDeveloperInformation(addr)
+        )
+        return DeveloperInfo(addr, email, reliability, registration_date)
+
+    def getDeveloperAddressFromEmail(self, email: str) -> str:
+        if self.index is not None:
+            return self.index.getDeveloperAddressFromEmail(email)
+        return self.reader.call(
+            self.contract.functions.getDeveloperAddressFromEmail(email)
+        )
+
+    def getDevelopersNumber(self) -> int:
+        return self.reader.call(self.contract.functions.devs_num())
+
+    def getGroupsNumber(self) -> int:
+        return self.reader.call(self.contract.functions.groups_num())
+
+    def getProjectsNumber(self) -> int:
+        return self.reader.call(self.contract.functions.projects_num())
+
+    def getGroups(self, addr: str) -> list:
+        if self.index is not None:
+            return self.index.getGroups(addr)
+        return self.reader.call(self.contract.functions.getGroups(addr))
+
+    def getAdminGroups(self, addr: str) -> list:
+        if self.index is not None:
+            return self.index.getAdminGroups(addr)
+        return self.reader.call(self.contract.functions.getAdminGroups(addr))
+
+    def getGroupProjects(self, group_name: str) -> list:
+        if self.index is not None:
+            return self.index.getGroupProjects(group_name)
+        return self.reader.call(self.contract.functions.getGroupProjects(group_name))
+
+    def getGroupAccessRequests(self, addr: str) -> list:
+        if self.index is not None:
+            return self.index.getGroupAccessRequests(addr)
+        return self.reader.call(self.contract.functions.getGroupAccessRequests(addr))
+
+    def getToBeApproved(self, group_name: str) -> list:
+        if self.index is not None:
+            return self.index.getToBeApproved(group_name)
+        return self.reader.call(self.contract.functions.getToBeApproved(group_name))
+
+    def getProjectVersions(self, project_name: str) -> list:
+        if self.index is not None:
+            return self.index.getProjectVersions(project_name)
+        return self.reader.call(
+            self.contract.functions.getProjectVersions(project_name)
+        )
+
+    def getProjectLastVersion(self, project_name: str) -> str:
+        if self.index is not None:
+            return self.index.getProjectLastVersion(project_name)
+        return self.reader.call(
+            self.contract.functions.getProjectLastVersion(project_name)
+        )
+
+    def getLibraryInformation(self, CID: str) -> LibraryInfo:
+        version, project, dependencies, reliability = self.reader.call(
+            self.contract.functions.getLibraryInformation(CID)
+        )
+        return LibraryInfo(CID, version, project, dependencies, reliability)
+
+    def balanceOf(self, addr: str) -> int:
+        return self.reader.call(self.contract.functions.balanceOf(addr))
+
+    def getDeposit(self, addr: str = None) -> int:
+        return self.reader.call(self.contract.functions.getDeposit(addr or self.addr))
+
+    def downloadLibrary(self, CID: str) -> dict:
+        return self.ipfs.downloadFileWithAllDependencies(CID=CID)
+
+    def checkDependencies(
+        self, name: str, record_interactions: bool = True, lockfile: str = None
+    ) -> DependencyReport:
+        tree = getDependencyTree(name)
+        dependencies = {
+            dependency: node["range"]
+            for dependency, node in tree["dependencies"].items()
+        }
+        if lockfile is not None and os.path.exists(lockfile):
+            # The versions installed by the project replace the ranges
+            locked = readLockfile(lockfile)
+            for dependency in dependencies:
+                version = locked.get(dependency, {}).get("version")
+                if version is not None:
+                    dependencies[dependency] = version
+        selected = self.reader.selectVersions(dependencies)
+        CID = self.reader.call(self.contract.functions.getProjectLastVersion(name))
+        infos = self.reader.getLibrariesInformationWithLevel(
+            [CID] + [CID for _, CID in selected.values()]
+        )
+        if CID not in infos:
+            raise ValueError(f"The library {name} doesn't exist")
+        report = DependencyReport(
+            library=LibraryInfo(CID, *infos[CID]),
+            levels=dict.fromkeys(RELIABILITY_LEVELS, 0),
+            tree=tree,
+        )
+        report.levels[report.library.level] += 1
+        for key in selected:
+            version, CID = selected[key]
+            library = LibraryInfo(CID, *infos[CID])
+            report.dependencies.append(library)
+            report.ranges[key] = dependencies[key]
+            report.levels[library.level] += 1
+        if record_interactions:
+            self.recordInteractions(
+                [report.library.CID] + [lib.CID for lib in report.dependencies]
+            )
+        return report
+
+    # Plumbing
+
+    def createTransaction(
+        self,
+        fun,
+        *parameters,
+        value=0,
+        gas: int = None,
+        wait: bool = True,
+        simulate: bool = True,
+    ):
+        if simulate:
+            fun(*parameters).call({"from": self.addr, "value": value})
+        transaction_hash = self.sendTransaction(fun, *parameters, value=value, gas=gas)
+        future = self.receipt_poller.watch(transaction_hash)
+        if wait:
+            receipt = self.waitForReceipt(future)
+            return TransactionResult.fromReceipt(receipt)
+        future.add_done_callback(self.invalidateReads)
+        return future
+
+    def invalidateReads(self, future):
+        # The cached reads don't include the changes of a mined transaction
+        if future.exception() is None:
+            self.reader.invalidate(future.result()["blockNumber"])
+
+    def sendTransaction(self, fun, *parameters, value=0, gas: int = None):
+        transaction_params = {
+            "chainId": self.chain_id,
+            "from": self.addr,
+            "gasPrice": self.w3.eth.gas_price,
+            "value": value,
+        }
+        if gas is not None:
+            transaction_params["gas"] = gas
+        delay = None
+        for attempt in range(NONCE_RETRIES):
+            nonce: int = self.nonce_manager.getNonce(self.addr)
+            try:
+                transaction = fun(*parameters).buildTransaction(
+                    {**transaction_params, "nonce": nonce}
+                )
+                signed_transaction = self.w3.eth.account.sign_transaction(
+                    transaction, private_key=self.private_key
+                )
+                return self.w3.eth.send_raw_transaction(
+                    signed_transaction.rawTransaction
+                )
+            except ValueError as error:
+                if not isNonceError(error) or attempt == NONCE_RETRIES - 1:
+                    self.nonce_manager.release(self.addr, nonce)
+                    raise
+                # Senders that collided would collide again retrying together
+                delay = decorrelatedJitter(delay)
+                time.sleep(delay)
+                self.nonce_manager.resync(self.addr)
+            except Exception:
+                self.nonce_manager.release(self.addr, nonce)
+                raise
+
+    def waitForReceipt(self, future):
+        try:
+            receipt = future.result(timeout=RECEIPT_TIMEOUT)
+        except TransactionReverted as error:
+            self.raiseRevertReason(error.receipt)
+        # The done callback may not have run yet, and the reads that follow
+        # must see the transaction
+        self.reader.invalidate(receipt["blockNumber"])
+        return receipt
+
+    def raiseRevertReason(self, tx_receipt):
+        transaction = self.w3.eth.get_transaction(tx_receipt["transactionHash"])
+        self.w3.eth.call(
+            {
+                "from": transaction["from"],
+                "to": transaction["to"],
+                "data": transaction["input"],
+                "value": transaction["value"],
+            },
+            tx_receipt["blockNumber"],
+        )
+        raise TransactionReverted(tx_receipt)
+
+    def createFeeTransaction(self, fee: int, fun, *parameters, wait: bool = True):
+        deposit: int = self.getDeposit()
+        if deposit < fee:
+            raise exceptions.SolidityError(
+                REVERT_MESSAGE
+                + f"You need {fee} SCT deposited to pay the fee, you have {deposit}"
+            )
+        return self.createTransaction(fun, *parameters, wait=wait)
+
+
+def createClientFromEnv() -> SupplyChainClient:
+    # Reads the configuration written by deploy.py
+    with open("abi.json", "r") as file:
+        abi = file.read()
+
+    with open("token_abi.json", "r") as file:
+        token_abi = file.read()
+
+    w3: Web3 = createWeb3(os.getenv("BLOCKCHAIN_ADDRESS"))
+    contract = w3.eth.contract(address=os.getenv("CONTRACT_ADDRESS"), abi=abi)
+    token_contract = w3.eth.contract(
+        address=os.getenv("TOKEN_CONTRACT_ADDRESS"), abi=token_abi
+    )
+    ipfs_auth_token: str = os.getenv("IPFS_AUTH_TOKEN")
+    reader = ContractReader(contract, BatchCaller(w3), ViewCache(w3))
+    ipfs = IPFS(
+        contract=contract,
+        ipfs_auth_token=ipfs_auth_token,
+        reader=reader,
+        cache=IPFSCache(
+            path=os.getenv("IPFS_CACHE_DIR", IPFS_CACHE_DIR),
+            max_size=int(os.getenv("IPFS_CACHE_SIZE", IPFS_CACHE_SIZE)),
+        ),
+        backend=createBackend(ipfs_auth_token),
+    )
+    # With an indexer running, the membership and version lookups are local
+    # queries on its SQLite mirror
+    index = (
+        Indexer(w3=w3, contract=contract, path=os.getenv("INDEXER_DB"))
+        if os.getenv("INDEXER_DB")
+        else None
+    )
+    return SupplyChainClient(
+        w3=w3,
+        chain_id=int(os.getenv("CHAIN_ID")),
+        addr=os.getenv("ADDRESS"),
+        private_key=os.getenv("PRIVATE_KEY"),
+        contract=contract,
+        token_contract=token_contract,
+        ipfs=ipfs,
+        reader=reader,
+        index=index,
+    )
@@ -0,0 +1,174 @@
+from utils.rpc_batch import BatchCaller
+from utils.semver import maxSatisfying
+from utils.view_cache import ViewCache, callKey
+
+# Views whose result never changes once the contract is deployed
+IMMUTABLE_VIEWS = ("reliability_cost", "contract_owner")
+
+
+class ContractReader:
+    def __init__(
+        self, contract, batch_caller: BatchCaller = None, cache: ViewCache = None
+    ):
+        self.contract = contract
+        self.batch_caller = batch_caller
+        self.cache = cache
+
+    def call(self, fun):
+        return self.callMany([fun])[0]
+
+    def callMany(self, funs: list) -> list:
+        if self.cache is None:
+            return self.callNode(funs)
+        block_number = self.cache.blockNumber()
+        results = [None] * len(funs)
+        missing = []
+        for i, fun in enumerate(funs):
+            if fun.fn_name in IMMUTABLE_VIEWS:
+                found, results[i] = self.cache.getImmutable(callKey(fun))
+            else:
+                found, results[i] = self.cache.get(callKey(fun), block_number)
+            if not found:
+                missing.append(i)
+        # The missing results are read at the cached block, so all of them
+        # come from the same state
+        values = self.callNode([funs[i] for i in missing], block_number)
+        for i, value in zip(missing, values):
+            results[i] = value
+            if funs[i].fn_name in IMMUTABLE_VIEWS:
+                self.cache.putImmutable(callKey(funs[i]), value)
+            else:
+                self.cache.put(callKey(funs[i]), block_number, value)
+        return results
+
+    def callNode(self, funs: list, block_identifier="latest") -> list:
+        if not funs:
+            return []
+        if self.batch_caller is None:
+            return [fun.call(block_identifier=block_identifier) for fun in funs]
+        return self.batch_caller.callMany(funs, block_identifier)
+
+    def invalidate(self, block_number: int = None):
+        if self.cache is not None:
+            self.cache.invalidate(block_number)
+
+    def getLibrariesMetadata(self, CIDs: list) -> dict:
+        # Version, project and dependencies of a library never change, unlike
+        # its reliability
+        metadata = {}
+        missing = []
+        for CID in dict.fromkeys(CIDs):
+            found, value = (
+                self.cache.getImmutable(("library", CID))
+                if self.cache is not None
+                else (False, None)
+            )
+            if found:
+                metadata[CID] = value
+            else:
+                missing.append(CID)
+        for CID, info in self.getLibrariesInformation(missing).items():
+            metadata[CID] = info[:3]
+            if self.cache is not None:
+                self.cache.putImmutable(("library", CID), info[:3])
+        return metadata
+
+    def getLibrariesInformation(self, CIDs: list) -> dict:
+        if not CIDs:
+            return {}
+        CIDs = list(dict.fromkeys(CIDs))
+        versions, projects, dependencies, reliabilities = self.call(
+            self.contract.functions.getLibrariesInformation(CIDs)
+        )
+        return {
+            CID: [versions[i], projects[i], dependencies[i], reliabilities[i]]
+            for i, CID in enumerate(CIDs)
+            if projects[i] != ""
+        }
+
+    def getLibrariesInformationWithLevel(self, CIDs: list) -> dict:
+        if not CIDs:
+            return {}
+        CIDs = list(dict.fromkeys(CIDs))
+        versions, projects, dependencies, reliabilities, levels = self.call(
+            self.contract.functions.getLibrariesInformationWithLevel(CIDs)
+        )
+        return {
+            CID: [
+                versions[i],
+                projects[i],
+                dependencies[i],
+                reliabilities[i],
+                levels[i],
+            ]
+            for i, CID in enumerate(CIDs)
+            if projects[i] != ""
+        }
+
+    def getProjectsVersions(self, project_names: list) -> dict:
+        if not project_names:
+            return {}
+        project_names = list(dict.fromkeys(project_names))
+        versions, last_versions = self.call(
+            self.contract.functions.getProjectsVersions(project_names)
+        )
+        return {
+            name: (versions[i], last_versions[i])
+            for i, name in enumerate(project_names)
+        }
+
+    def getProjectsVersionNames(self, project_names: list) -> dict:
+        if not project_names:
+            return {}
+        project_names = list(dict.fromkeys(project_names))
+        version_names = self.call(
+            self.contract.functions.getProjectsVersionNames(project_names)
+        )
+        return {name: version_names[i] for i, name in enumerate(project_names)}
+
+    def getProjectsVersionCIDs(self, project_versions: dict) -> dict:
+        # A published version can't be replaced, so its CID is cached for good
+        CIDs = {}
+        missing = {}
+        for name, version in project_versions.items():
+            found, CID = (
+                self.cache.getImmutable(("version", name, version))
+                if self.cache is not None
+                else (False, None)
+            )
+            if found:
+                CIDs[name] = CID
+            else:
+                missing[name] = version
+        if not missing:
+            return CIDs
+        results = self.call(
+            self.contract.functions.getProjectsVersionCIDs(
+                list(missing), list(missing.values())
+            )
+        )
+        for i, name in enumerate(missing):
+            CIDs[name] = results[i]
+            if self.cache is not None and results[i] != "":
+                self.cache.putImmutable(("version", name, missing[name]), results[i])
+        return CIDs
+
+    def selectVersions(
+        self, version_ranges: dict, include_prerelease: bool = False
+    ) -> dict:
+        # The best version of each project is picked from the version names,
+        # then its CID is looked up in the version index of the project
+        version_names = self.getProjectsVersionNames(list(version_ranges))
+        selected = {}
+        for name, version_range in version_ranges.items():
+            versions = version_names[name]
+            # Like the npm dist-tag, latest is the last version published;
+            # the chain has no other tags
+            if version_range.strip() in ("", "*", "latest") and versions:
+                version = versions[-1]
+            else:
+                version = maxSatisfying(versions, version_range, include_prerelease)
+            if version is not None:
+                selected[name] = version
+        CIDs = self.getProjectsVersionCIDs(selected)
+        return {name: (selected[name], CIDs[name]) for name in selected}
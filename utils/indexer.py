@@ -0,0 +1,405 @@
+import json
+import sqlite3
+import threading
+import time
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3, exceptions
+
+INDEXER_DB = "indexer.db"
+LOG_BATCH_SIZE = 2000
+# Number of recent block hashes kept to find the common ancestor of a reorg
+REORG_DEPTH = 128
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS blocks (number INTEGER PRIMARY KEY, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_hash TEXT NOT NULL,
+    transaction_hash TEXT NOT NULL,
+    event TEXT NOT NULL,
+    args TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE TABLE IF NOT EXISTS developers (
+    address TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    block_number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS groups (
+    name TEXT PRIMARY KEY,
+    admin TEXT NOT NULL,
+    block_number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS group_members (
+    group_name TEXT NOT NULL,
+    developer TEXT NOT NULL,
+    group_position INTEGER NOT NULL,
+    developer_position INTEGER NOT NULL,
+    PRIMARY KEY (group_name, developer)
+);
+CREATE TABLE IF NOT EXISTS group_requests (
+    group_name TEXT NOT NULL,
+    developer TEXT NOT NULL,
+    group_position INTEGER NOT NULL,
+    developer_position INTEGER NOT NULL,
+    PRIMARY KEY (group_name, developer)
+);
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    group_name TEXT NOT NULL,
+    admin TEXT NOT NULL,
+    block_number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS libraries (
+    CID TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    version TEXT NOT NULL,
+    dependencies TEXT NOT NULL,
+    block_number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS votes (
+    voter TEXT NOT NULL,
+    developer TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    PRIMARY KEY (voter, developer)
+);
+CREATE TABLE IF NOT EXISTS reports (
+    reporter TEXT NOT NULL,
+    developer TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    PRIMARY KEY (reporter, developer)
+);
+CREATE INDEX IF NOT EXISTS developers_email ON developers (email);
+CREATE INDEX IF NOT EXISTS group_members_developer ON group_members (developer);
+CREATE INDEX IF NOT EXISTS group_requests_developer ON group_requests (developer);
+CREATE INDEX IF NOT EXISTS projects_group ON projects (group_name);
+CREATE INDEX IF NOT EXISTS libraries_project ON libraries (project);
+"""
+
+# Tables derived from the events, rebuilt by replaying them after a reorg
+DERIVED_TABLES = (
+    "developers",
+    "groups",
+    "group_members",
+    "group_requests",
+    "projects",
+    "libraries",
+    "votes",
+    "reports",
+)
+
+
+class Indexer:
+    def __init__(
+        self,
+        w3: Web3,
+        contract,
+        path: str = INDEXER_DB,
+        start_block: int = 0,
+        confirmations: int = 0,
+        batch_size: int = LOG_BATCH_SIZE,
+    ):
+        self.w3 = w3
+        self.contract = contract
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets call_contract.py read while the indexer process writes
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.events = {
+            Web3.toHex(event_abi_to_log_topic(abi)): abi["name"]
+            for abi in contract.abi
+            if abi["type"] == "event"
+        }
+
+    def lastBlock(self) -> int:
+        row = self.db.execute(
+            "SELECT value FROM state WHERE key = 'last_block'"
+        ).fetchone()
+        return self.start_block - 1 if row is None else row[0]
+
+    def setLastBlock(self, block_number: int):
+        self.db.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES ('last_block', ?)",
+            (block_number,),
+        )
+
+    def blockHash(self, block_number: int) -> str:
+        try:
+            return Web3.toHex(self.w3.eth.get_block(block_number)["hash"])
+        except exceptions.BlockNotFound:
+            # The chain got shorter than the indexed blocks
+            return None
+
+    def sync(self) -> int:
+        with self.lock:
+            self.checkReorg()
+            head = self.w3.eth.block_number - self.confirmations
+            indexed = 0
+            start = self.lastBlock() + 1
+            while start <= head:
+                end = min(start + self.batch_size - 1, head)
+                end_hash = self.blockHash(end)
+                logs = self.w3.eth.get_logs(
+                    {
+                        "address": self.contract.address,
+                        "fromBlock": start,
+                        "toBlock": end,
+                    }
+                )
+                if self.blockHash(end) != end_hash:
+                    # A reorg happened while the logs were fetched, they may
+                    # come from either branch
+                    self.checkReorg()
+                    start = self.lastBlock() + 1
+                    continue
+                with self.db:
+                    blocks = {end: end_hash}
+                    for log in logs:
+                        blocks[log["blockNumber"]] = Web3.toHex(log["blockHash"])
+                        indexed += self.storeLog(log)
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)",
+                        blocks.items(),
+                    )
+                    self.db.execute(
+                        "DELETE FROM blocks WHERE number <= ?", (end - REORG_DEPTH,)
+                    )
+                    self.setLastBlock(end)
+                start = end + 1
+            return indexed
+
+    def storeLog(self, log) -> int:
+        name = self.events.get(Web3.toHex(log["topics"][0])) if log["topics"] else None
+        if name is None:
+            return 0
+        event = getattr(self.contract.events, name)().processLog(log)
+        args = dict(event["args"])
+        self.db.execute(
+            "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                event["blockNumber"],
+                event["logIndex"],
+                Web3.toHex(event["blockHash"]),
+                Web3.toHex(event["transactionHash"]),
+                name,
+                json.dumps(args),
+            ),
+        )
+        self.applyEvent(name, args, event["blockNumber"])
+        return 1
+
+    def checkReorg(self) -> bool:
+        rows = self.db.execute(
+            "SELECT number, hash FROM blocks ORDER BY number DESC"
+        ).fetchall()
+        if not rows or self.blockHash(rows[0][0]) == rows[0][1]:
+            return False
+        ancestor = None
+        for number, block_hash in rows[1:]:
+            if self.blockHash(number) == block_hash:
+                ancestor = number
+                break
+        if ancestor is None:
+            # The reorg is deeper than the stored hashes
+            ancestor = self.start_block - 1
+        print(f"Reorg detected, rolling back to block {ancestor}")
+        self.rollback(ancestor)
+        return True
+
+    def rollback(self, block_number: int):
+        with self.db:
+            self.db.execute(
+                "DELETE FROM events WHERE block_number > ?", (block_number,)
+            )
+            self.db.execute("DELETE FROM blocks WHERE number > ?", (block_number,))
+            self.setLastBlock(block_number)
+            self.replay()
+
+    def rebuild(self):
+        with self.lock, self.db:
+            self.replay()
+
+    def replay(self):
+        for table in DERIVED_TABLES:
+            self.db.execute(f"DELETE FROM {table}")
+        for name, args, block_number in self.db.execute(
+            "SELECT event, args, block_number FROM events ORDER BY block_number, log_index"
+        ).fetchall():
+            self.applyEvent(name, json.loads(args), block_number)
+
+    def applyEvent(self, name: str, args: dict, block_number: int):
+        if name == "DeveloperAdded":
+            self.db.execute(
+                "INSERT OR REPLACE INTO developers VALUES (?, ?, ?)",
+                (args["developer"], args["email"], block_number),
+            )
+        elif name == "GroupCreated":
+            self.db.execute(
+                "INSERT OR REPLACE INTO groups VALUES (?, ?, ?)",
+                (args["group_name"], args["admin"], block_number),
+            )
+            self.addPair("group_members", args["group_name"], args["admin"])
+        elif name == "ProjectCreated":
+            self.db.execute(
+                "INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?)",
+                (
+                    args["project_name"],
+                    args["group_name"],
+                    args["admin"],
+                    block_number,
+                ),
+            )
+        elif name == "GroupAccessRequested":
+            self.addPair("group_requests", args["group_name"], args["developer"])
+        elif name == "GroupMemberAdded":
+            self.removePair("group_requests", args["group_name"], args["developer"])
+            self.addPair("group_members", args["group_name"], args["developer"])
+        elif name == "GroupMemberRemoved":
+            self.removePair("group_members", args["group_name"], args["developer"])
+        elif name == "AdminChanged":
+            self.db.execute(
+                "UPDATE groups SET admin = ? WHERE name = ?",
+                (args["new_admin"], args["group_name"]),
+            )
+            self.db.execute(
+                "UPDATE projects SET admin = ? WHERE group_name = ?",
+                (args["new_admin"], args["group_name"]),
+            )
+        elif name == "LibraryAdded":
+            self.db.execute(
+                "INSERT OR REPLACE INTO libraries VALUES (?, ?, ?, ?, ?)",
+                (
+                    args["CID"],
+                    args["project_name"],
+                    args["version"],
+                    json.dumps(args["dependencies"]),
+                    block_number,
+                ),
+            )
+        elif name == "DeveloperVoted":
+            self.db.execute(
+                "INSERT OR IGNORE INTO votes VALUES (?, ?, ?)",
+                (args["voter"], args["developer"], block_number),
+            )
+        elif name == "DeveloperReported":
+            self.db.execute(
+                "INSERT OR IGNORE INTO reports VALUES (?, ?, ?)",
+                (args["reporter"], args["developer"], block_number),
+            )
+
+    def addPair(self, table: str, group_name: str, developer: str):
+        # Pushed at the end of the array of the group and of the developer
+        self.db.execute(
+            f"INSERT OR IGNORE INTO {table} VALUES (?, ?, "
+            f"(SELECT COUNT(*) FROM {table} WHERE group_name = ?), "
+            f"(SELECT COUNT(*) FROM {table} WHERE developer = ?))",
+            (group_name, developer, group_name, developer),
+        )
+
+    def removePair(self, table: str, group_name: str, developer: str):
+        # Like the contract, the last element of each array takes the place
+        # of the removed one
+        row = self.db.execute(
+            f"SELECT group_position, developer_position FROM {table} "
+            "WHERE group_name = ? AND developer = ?",
+            (group_name, developer),
+        ).fetchone()
+        if row is None:
+            return
+        self.db.execute(
+            f"DELETE FROM {table} WHERE group_name = ? AND developer = ?",
+            (group_name, developer),
+        )
+        for (key, value), column, position in zip(
+            (("group_name", group_name), ("developer", developer)),
+            ("group_position", "developer_position"),
+            row,
+        ):
+            self.db.execute(
+                f"UPDATE {table} SET {column} = ? WHERE {key} = ? AND {column} = "
+                f"(SELECT MAX({column}) FROM {table} WHERE {key} = ?) AND {column} > ?",
+                (position, value, value, position),
+            )
+
+    def follow(self, poll_interval: float = 1):
+        while True:
+            indexed = self.sync()
+            if indexed:
+                print(f"Indexed {indexed} events up to block {self.lastBlock()}")
+            time.sleep(poll_interval)
+
+    def query(self, sql: str, *params) -> list:
+        with self.lock:
+            return [row[0] for row in self.db.execute(sql, params).fetchall()]
+
+    # The positions follow the arrays of the contract, where the last
+    # element takes the place of a removed one
+
+    def getDeveloperAddressFromEmail(self, email: str) -> str:
+        addresses = self.query("SELECT address FROM developers WHERE email = ?", email)
+        return (
+            addresses[0] if addresses else "0x0000000000000000000000000000000000000000"
+        )
+
+    def getGroups(self, addr: str) -> list:
+        return self.query(
+            "SELECT group_name FROM group_members WHERE developer = ? "
+            "ORDER BY developer_position",
+            Web3.toChecksumAddress(addr),
+        )
+
+    def getAdminGroups(self, addr: str) -> list:
+        return self.query(
+            "SELECT name FROM groups WHERE admin = ? ORDER BY rowid",
+            Web3.toChecksumAddress(addr),
+        )
+
+    def getGroupDevelopers(self, group_name: str) -> list:
+        return self.query(
+            "SELECT developer FROM group_members WHERE group_name = ? "
+            "ORDER BY group_position",
+            group_name,
+        )
+
+    def getGroupProjects(self, group_name: str) -> list:
+        return self.query(
+            "SELECT name FROM projects WHERE group_name = ? ORDER BY rowid", group_name
+        )
+
+    def getGroupAccessRequests(self, addr: str) -> list:
+        return self.query(
+            "SELECT group_name FROM group_requests WHERE developer = ? "
+            "ORDER BY developer_position",
+            Web3.toChecksumAddress(addr),
+        )
+
+    def getToBeApproved(self, group_name: str) -> list:
+        return self.query(
+            "SELECT developer FROM group_requests WHERE group_name = ? "
+            "ORDER BY group_position",
+            group_name,
+        )
+
+    def getProjectVersions(self, project_name: str) -> list:
+        return self.query(
+            "SELECT CID FROM libraries WHERE project = ? ORDER BY rowid", project_name
+        )
+
+    def getProjectVersionNames(self, project_name: str) -> list:
+        return self.query(
+            "SELECT version FROM libraries WHERE project = ? ORDER BY rowid",
+            project_name,
+        )
+
+    def getProjectLastVersion(self, project_name: str) -> str:
+        versions = self.getProjectVersions(project_name)
+        return versions[-1] if versions else ""
+
+    def count(self, table: str) -> int:
+        return self.query(f"SELECT COUNT(*) FROM {table}")[0]
@@ -1,46 +1,112 @@
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.contract_reader import ContractReader
+from utils.ipfs_cache import IPFSCache
+from utils.ipfs_backends import IPFSBackend, IPFSError, Web3StorageBackend
+from utils.retry import CircuitOpenError
+
+DOWNLOAD_WORKERS = 8
 
 
 class IPFS:
-    def __init__(self, contract, ipfs_auth_token: str):
+    def __init__(
+        self,
+        contract,
+        ipfs_auth_token: str,
+        reader: ContractReader = None,
+        cache: IPFSCache = None,
+        backend: IPFSBackend = None,
+    ):
         self.contract = contract
         self.ipfs_auth_token = ipfs_auth_token
+        self.reader = reader or ContractReader(contract)
+        self.cache = cache or IPFSCache()
+        self.backend = backend or Web3StorageBackend(ipfs_auth_token)
 
-    def uploadFile(self, file: str) -> dict:
-        response = requests.post(
-            "https://api.web3.storage/upload",
-            data=file,
-            headers={"Authorization": f"Bearer {self.ipfs_auth_token}"},
-        )
-        if "cid" in response.json():
-            cid = response.json()["cid"]
-            print(f"CID: {cid}")
+    def uploadFile(self, file) -> dict:
+        # file is a binary file object or an iterable of bytes chunks, which
+        # the backend streams instead of loading it in memory
+        response = self.backend.upload(file)
+        if "cid" in response:
+            print(f"CID: {response['cid']}")
         else:
-            print(response.json())
-        return response.json()
+            print(response)
+        return response
 
     def downloadFile(self, CID: str, name: str) -> int:
-        response = requests.get(f"https://ipfs.io/ipfs/{CID}")
-        if response.status_code == 200:
-            with open(f"libraries/{name}", "w") as f:
-                f.write(response.text)
-        return response.status_code
+        if self.cache.get(CID) is None:
+            try:
+                self.cache.put(CID, self.backend.download(CID))
+            except IPFSError as error:
+                return error.status_code
+            except CircuitOpenError:
+                # The backend is left alone for a while, as if unavailable
+                return 503
+        self.cache.materialise(CID, f"libraries/{name}")
+        return 200
+
+    def downloadFileWithAllDependencies(
+        self, CID: str, downloaded: dict = None, max_workers: int = DOWNLOAD_WORKERS
+    ) -> dict:
+        if downloaded is None:
+            downloaded = {}
+        lock = threading.Lock()
+        progress = {"done": 0, "total": 0}
+        # Metadata is resolved one level at a time while the pool downloads
+        # the libraries already resolved, so the walk costs depth-many reads
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            level = [CID]
+            while level:
+                with lock:
+                    level = [
+                        CID for CID in dict.fromkeys(level) if CID not in downloaded
+                    ]
+                    for CID in level:
+                        downloaded[CID] = None
+                infos = self.reader.getLibrariesMetadata(level)
+                next_level = []
+                for CID in level:
+                    if CID not in infos:
+                        print(f"Wrong CID: {CID}")
+                        with lock:
+                            downloaded[CID] = False
+                        continue
+                    info = infos[CID]
+                    dependencies = [dep for dep in info[2] if dep != ""]
+                    if dependencies:
+                        print(
+                            f"{info[1]} has the following dependencies: {dependencies}"
+                        )
+                    with lock:
+                        progress["total"] += 1
+                    executor.submit(
+                        self.downloadLibrary, CID, info, downloaded, progress, lock
+                    )
+                    next_level += dependencies
+                level = next_level
+        return downloaded
 
-    def downloadFileWithAllDependencies(self, CID: str, downloaded :dict):
-        if(CID not in downloaded):
-            info = self.contract.functions.getLibraryInformation(CID).call()
-            dependencies = info[2]
+    def downloadLibrary(
+        self, CID: str, info: list, downloaded: dict, progress: dict, lock
+    ):
+        # Errors raised here would be lost in the executor, so every failure
+        # is reported and recorded
+        try:
             status_code = self.downloadFile(CID=CID, name=info[1])
-            downloaded[CID] = True
-            if status_code == 200:
-                print(
-                    f"The library {info[1]} (version {info[0]}) has been successfully downloaded"
-                )
-                if dependencies[0] != "":
-                    print(f"{info[1]} has the following dependencies: {dependencies}")
-            else:
-                print("Wrong CID")
-                return
-            for dep in dependencies:
-                if dep != "":
-                    self.downloadFileWithAllDependencies(CID=dep, downloaded=downloaded)
+        except Exception as error:
+            print(
+                f"The library {info[1]} (version {info[0]}) can't be downloaded: {error}"
+            )
+            status_code = None
+        with lock:
+            downloaded[CID] = status_code == 200
+            progress["done"] += 1
+            count = f"[{progress['done']}/{progress['total']}]"
+        if status_code == 200:
+            print(
+                f"{count} The library {info[1]} (version {info[0]}) has been successfully downloaded"
+            )
+        elif status_code is not None:
+            print(
+                f"{count} The library {info[1]} (version {info[0]}) can't be downloaded"
+            )
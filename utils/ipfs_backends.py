@@ -0,0 +1,232 @@
+import base64
+import hashlib
+import os
+import tempfile
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+from utils.retry import RETRYABLE_STATUS, RetryPolicy, getRetryPolicy
+
+CHUNK_SIZE = 64 * 1024
+REQUEST_TIMEOUT = (5, 60)
+POOL_SIZE = 16
+W3S_UPLOAD_URL = "https://api.web3.storage/upload"
+
+
+class IPFSError(Exception):
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(f"IPFS request failed with status {status_code} {message}")
+        self.status_code = status_code
+
+
+def createSession(pool_size: int = POOL_SIZE) -> requests.Session:
+    # The retries are made by the RetryPolicy of the caller, which knows
+    # whether a request can be repeated
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def streamResponse(response: requests.Response):
+    # The status is checked before the body is read, so a failed download
+    # is retried before anything reaches the cache
+    if response.status_code != 200:
+        response.close()
+        raise IPFSError(response.status_code, response.reason)
+    return iterContent(response)
+
+
+def iterContent(response: requests.Response):
+    with response:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            yield chunk
+
+
+def uploadResponse(response: requests.Response) -> dict:
+    if response.status_code in RETRYABLE_STATUS:
+        raise IPFSError(response.status_code, response.reason)
+    return response.json()
+
+
+def uploadWithRetries(retry_policy: RetryPolicy, key: str, file, send) -> dict:
+    # Uploads are content addressed, so sending a file again is harmless as
+    # long as it can be read again from the start
+    if isinstance(file, bytes):
+        return retry_policy.call(key, lambda: uploadResponse(send(file)))
+    if not (hasattr(file, "seek") and hasattr(file, "tell")):
+        return uploadResponse(send(file))
+    position = file.tell()
+
+    def attempt():
+        file.seek(position)
+        return uploadResponse(send(file))
+
+    return retry_policy.call(key, attempt)
+
+
+def readChunks(file):
+    if isinstance(file, bytes):
+        yield file
+    elif hasattr(file, "read"):
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            yield chunk
+    else:
+        for chunk in file:
+            yield chunk
+
+
+class IPFSBackend:
+    def upload(self, file) -> dict:
+        raise NotImplementedError
+
+    def download(self, CID: str):
+        raise NotImplementedError
+
+
+class Web3StorageBackend(IPFSBackend):
+    def __init__(
+        self,
+        ipfs_auth_token: str,
+        gateway: str = "https://ipfs.io",
+        session: requests.Session = None,
+        retry_policy: RetryPolicy = None,
+    ):
+        self.ipfs_auth_token = ipfs_auth_token
+        self.gateway = gateway.rstrip("/")
+        self.session = session or createSession()
+        self.retry_policy = retry_policy or getRetryPolicy()
+
+    def upload(self, file) -> dict:
+        return uploadWithRetries(
+            self.retry_policy,
+            W3S_UPLOAD_URL,
+            file,
+            lambda data: self.session.post(
+                W3S_UPLOAD_URL,
+                data=data,
+                headers={"Authorization": f"Bearer {self.ipfs_auth_token}"},
+                timeout=REQUEST_TIMEOUT,
+            ),
+        )
+
+    def download(self, CID: str):
+        return self.retry_policy.call(
+            self.gateway,
+            lambda: streamResponse(
+                self.session.get(
+                    f"{self.gateway}/ipfs/{CID}", stream=True, timeout=REQUEST_TIMEOUT
+                )
+            ),
+        )
+
+
+class KuboBackend(IPFSBackend):
+    def __init__(
+        self,
+        api_url: str = "http://127.0.0.1:5001",
+        session: requests.Session = None,
+        retry_policy: RetryPolicy = None,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.session = session or createSession()
+        self.retry_policy = retry_policy or getRetryPolicy()
+
+    def upload(self, file) -> dict:
+        boundary = uuid.uuid4().hex
+        result = uploadWithRetries(
+            self.retry_policy,
+            self.api_url,
+            file,
+            lambda data: self.session.post(
+                f"{self.api_url}/api/v0/add",
+                params={"cid-version": 1},
+                data=multipartChunks(data, boundary),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                timeout=REQUEST_TIMEOUT,
+            ),
+        )
+        if "Hash" in result:
+            return {"cid": result["Hash"]}
+        return result
+
+    def download(self, CID: str):
+        return self.retry_policy.call(
+            self.api_url,
+            lambda: streamResponse(
+                self.session.post(
+                    f"{self.api_url}/api/v0/cat",
+                    params={"arg": CID},
+                    stream=True,
+                    timeout=REQUEST_TIMEOUT,
+                )
+            ),
+        )
+
+
+def multipartChunks(file, boundary: str):
+    # requests would build the whole multipart body in memory
+    yield (
+        f"--{boundary}\r\n"
+        + 'Content-Disposition: form-data; name="file"; filename="file"\r\n'
+        + "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    for chunk in readChunks(file):
+        yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+class FilesystemBackend(IPFSBackend):
+    def __init__(self, root: str = ".ipfs_fake"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def upload(self, file) -> dict:
+        digest = hashlib.sha256()
+        f = tempfile.NamedTemporaryFile(
+            "wb", dir=self.root, prefix=".tmp-", delete=False
+        )
+        try:
+            with f:
+                for chunk in readChunks(file):
+                    digest.update(chunk)
+                    f.write(chunk)
+            CID = rawCID(digest.digest())
+            os.replace(f.name, os.path.join(self.root, CID))
+        except BaseException:
+            if os.path.exists(f.name):
+                os.remove(f.name)
+            raise
+        return {"cid": CID}
+
+    def download(self, CID: str):
+        path = os.path.join(self.root, os.path.basename(CID))
+        if not os.path.exists(path):
+            raise IPFSError(404, CID)
+        return readFile(path)
+
+
+def readFile(path: str):
+    with open(path, "rb") as f:
+        for chunk in readChunks(f):
+            yield chunk
+
+
+def rawCID(sha256_digest: bytes) -> str:
+    # CIDv1, raw codec, sha2-256 multihash, base32 multibase
+    cid = bytes([0x01, 0x55, 0x12, 0x20]) + sha256_digest
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+
+def createBackend(ipfs_auth_token: str = None) -> IPFSBackend:
+    backend = os.getenv("IPFS_BACKEND", "web3storage")
+    if backend == "kubo":
+        return KuboBackend(os.getenv("IPFS_API_URL", "http://127.0.0.1:5001"))
+    if backend == "filesystem":
+        return FilesystemBackend(os.getenv("IPFS_FS_ROOT", ".ipfs_fake"))
+    if backend == "web3storage":
+        return Web3StorageBackend(
+            ipfs_auth_token, os.getenv("IPFS_GATEWAY", "https://ipfs.io")
+        )
+    raise ValueError(f"Unknown IPFS backend {backend}")
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+IPFS_CACHE_DIR = ".ipfs_cache"
+IPFS_CACHE_SIZE = 1024 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class IPFSCache:
+    def __init__(self, path: str = IPFS_CACHE_DIR, max_size: int = IPFS_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # Entries already hashed since they were last modified, so repeated
+        # hits don't read the whole file again
+        self.verified = {}
+        os.makedirs(path, exist_ok=True)
+
+    def entryPath(self, CID: str) -> str:
+        return os.path.join(self.path, CID)
+
+    def digestPath(self, CID: str) -> str:
+        return os.path.join(self.path, f"{CID}.sha256")
+
+    def get(self, CID: str) -> str:
+        # The digest is the one of the content when it was cached: it finds
+        # the changes of the file since then, not a backend that sent
+        # content other than the CID's, since rebuilding the CID would mean
+        # chunking the file as IPFS does
+        path = self.entryPath(CID)
+        try:
+            stat = os.stat(path)
+            with open(self.digestPath(CID), "r") as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        version = (stat.st_size, stat.st_mtime_ns)
+        if self.verified.get(CID) != version:
+            if fileDigest(path) != digest:
+                print(f"The cached copy of {CID} is corrupted, removing it")
+                self.remove(CID)
+                return None
+            self.verified[CID] = version
+        # The access time orders the entries for the LRU eviction
+        os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        return path
+
+    def put(self, CID: str, chunks) -> str:
+        digest = hashlib.sha256()
+        f = tempfile.NamedTemporaryFile(
+            "wb", dir=self.path, prefix=".tmp-", delete=False
+        )
+        try:
+            with f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+            os.replace(f.name, self.entryPath(CID))
+        except BaseException:
+            if os.path.exists(f.name):
+                os.remove(f.name)
+            raise
+        writeAtomically(self.digestPath(CID), digest.hexdigest())
+        self.evict()
+        return self.entryPath(CID)
+
+    def materialise(self, CID: str, destination: str):
+        source = self.get(CID)
+        if source is None:
+            raise FileNotFoundError(f"{CID} is not in the cache")
+        directory = os.path.dirname(destination) or "."
+        os.makedirs(directory, exist_ok=True)
+        # A copy, since a link would let an edit of the library change the
+        # cached entry, under a temporary name of its own, since the
+        # versions of a project are downloaded at the same time
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, destination)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def remove(self, CID: str):
+        self.verified.pop(CID, None)
+        for path in (self.entryPath(CID), self.digestPath(CID)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            total_size = 0
+            for entry in os.scandir(self.path):
+                if entry.name.startswith(".tmp-") or entry.name.endswith(".sha256"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_atime_ns, stat.st_size, entry.name))
+                total_size += stat.st_size
+            # The most recent entry, the one just written, stays even when it
+            # is larger than the cache, so it can still be materialised
+            for _, size, CID in sorted(entries)[:-1]:
+                if total_size <= self.max_size:
+                    break
+                self.remove(CID)
+                total_size -= size
+
+
+def fileDigest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def writeAtomically(path: str, content: str):
+    with tempfile.NamedTemporaryFile(
+        "w", dir=os.path.dirname(path), prefix=".tmp-", delete=False
+    ) as f:
+        f.write(content)
+    os.replace(f.name, path)
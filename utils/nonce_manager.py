@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from web3 import Web3
+from utils.retry import decorrelatedJitter, isNonceError
+
+
+def endpointOf(w3: Web3, addr: str) -> str:
+    # A multi-endpoint provider moves an address to another node when its
+    # node fails, the nonces of the new node are read again
+    pool = getattr(w3.provider, "pool", None)
+    return pool.endpointOf(addr) if pool is not None else None
+
+
+class NonceManager:
+    def __init__(self, w3: Web3):
+        self.w3 = w3
+        self.lock = threading.Lock()
+        self.nonces = {}
+        self.endpoints = {}
+
+    def getNonce(self, addr: str) -> int:
+        with self.lock:
+            endpoint = endpointOf(self.w3, addr)
+            if addr not in self.nonces or self.endpoints.get(addr) != endpoint:
+                self.nonces[addr] = self.w3.eth.getTransactionCount(addr, "pending")
+                self.endpoints[addr] = endpoint
+            nonce = self.nonces[addr]
+            self.nonces[addr] += 1
+            return nonce
+
+    def release(self, addr: str, nonce: int):
+        # A nonce that never reached the node must be handed out again,
+        # otherwise every later transaction of the address stays queued
+        with self.lock:
+            if self.nonces.get(addr) == nonce + 1:
+                self.nonces[addr] = nonce
+            else:
+                self.nonces.pop(addr, None)
+
+    def resync(self, addr: str) -> int:
+        with self.lock:
+            self.endpoints[addr] = endpointOf(self.w3, addr)
+            self.nonces[addr] = self.w3.eth.getTransactionCount(addr, "pending")
+            return self.nonces[addr]
+
+
+class AsyncNonceManager:
+    def __init__(self, w3: Web3, retries: int = 3):
+        self.w3 = w3
+        self.retries = retries
+        self.retried = 0
+        self.locks = {}
+        self.nonces = {}
+        self.endpoints = {}
+
+    def lock(self, addr: str) -> asyncio.Lock:
+        if addr not in self.locks:
+            self.locks[addr] = asyncio.Lock()
+        return self.locks[addr]
+
+    async def sendWithNonce(self, addr: str, send):
+        # The sends of an address are serialised so they reach the node in
+        # nonce order, the nonce is only consumed when the node accepts it
+        async with self.lock(addr):
+            delay = None
+            for attempt in range(self.retries):
+                endpoint = endpointOf(self.w3, addr)
+                if addr not in self.nonces or self.endpoints.get(addr) != endpoint:
+                    self.nonces[addr] = await self.w3.eth.get_transaction_count(
+                        addr, "pending"
+                    )
+                    self.endpoints[addr] = endpoint
+                nonce = self.nonces[addr]
+                try:
+                    result = await send(nonce)
+                except ValueError as error:
+                    if not isNonceError(error) or attempt == self.retries - 1:
+                        raise
+                    self.nonces.pop(addr, None)
+                    self.retried += 1
+                    delay = decorrelatedJitter(delay)
+                    await asyncio.sleep(delay)
+                    continue
+                self.nonces[addr] = nonce + 1
+                return result
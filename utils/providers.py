@@ -0,0 +1,508 @@
+import asyncio
+import json
+import threading
+import time
+import aiohttp
+import requests
+from eth_account import Account
+from web3 import Web3
+from web3.eth import AsyncEth
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.base import JSONBaseProvider
+from utils.ipfs_backends import createSession
+from utils.retry import (
+    CircuitBreaker,
+    RateLimitError,
+    RetryBudget,
+    RetryPolicy,
+    UnknownBlockError,
+    UnsentError,
+    getRetryPolicy,
+    isRateLimit,
+    isUnknownBlock,
+)
+
+POOL_SIZE = 32
+# Connect and read timeouts of every request, in seconds
+REQUEST_TIMEOUT = (5, 30)
+KEEPALIVE_TIMEOUT = 30
+HEALTH_INTERVAL = 5
+# Blocks an endpoint can be behind the others before its circuit opens
+MAX_LAG = 5
+LATENCY_WEIGHT = 0.2
+HEADERS = {"Content-Type": "application/json"}
+# Filters live on the node that created them
+FILTER_METHODS = (
+    "eth_newFilter",
+    "eth_newBlockFilter",
+    "eth_newPendingTransactionFilter",
+    "eth_getFilterChanges",
+    "eth_getFilterLogs",
+    "eth_uninstallFilter",
+)
+# A node that got a transaction can't be asked to take it again
+WRITE_METHODS = ("eth_sendRawTransaction", "eth_sendTransaction")
+# Responses showing the block the node that sent them has reached
+BLOCK_METHODS = ("eth_blockNumber", "eth_getTransactionReceipt")
+# Position of the block parameter of the reads naming one
+BLOCK_PARAMS = {
+    "eth_call": 1,
+    "eth_estimateGas": 1,
+    "eth_getBalance": 1,
+    "eth_getCode": 1,
+    "eth_getStorageAt": 2,
+    "eth_getTransactionCount": 1,
+    "eth_getBlockByNumber": 0,
+}
+
+
+def splitEndpoints(endpoint_uris) -> list:
+    # BLOCKCHAIN_ADDRESS can hold several endpoints separated by commas
+    if isinstance(endpoint_uris, str):
+        endpoint_uris = endpoint_uris.split(",")
+    return [uri.strip() for uri in endpoint_uris if uri.strip()]
+
+
+def unsentError(content: bytes) -> UnsentError:
+    # Some providers answer a request over their rate limit with 200 and a
+    # JSON-RPC error, it is retried like a 429. So is a read of a block the
+    # node hasn't reached yet, on another node
+    if b"error" not in content:
+        return None
+    try:
+        responses = json.loads(content)
+    except ValueError:
+        return None
+    for response in responses if isinstance(responses, list) else [responses]:
+        error = response.get("error") if isinstance(response, dict) else None
+        if isinstance(error, dict) and isRateLimit(error):
+            return RateLimitError(error)
+        if isinstance(error, dict) and isUnknownBlock(error):
+            return UnknownBlockError(error)
+    return None
+
+
+def requestedBlock(method: str, params) -> int:
+    position = BLOCK_PARAMS.get(method)
+    if position is None or len(params) <= position:
+        return None
+    block = params[position]
+    if isinstance(block, int):
+        return block
+    if isinstance(block, str) and block.startswith("0x"):
+        return int(block, 16)
+    # latest, pending...
+    return None
+
+
+def blockNumberOf(method: str, content: bytes) -> int:
+    try:
+        result = json.loads(content).get("result")
+    except (ValueError, AttributeError):
+        return None
+    if method == "eth_getTransactionReceipt":
+        result = result.get("blockNumber") if isinstance(result, dict) else None
+    try:
+        return int(result, 16)
+    except (TypeError, ValueError):
+        return None
+
+
+class Endpoint:
+    def __init__(self, uri: str, breaker: CircuitBreaker, budget: RetryBudget):
+        self.uri = uri
+        self.breaker = breaker
+        self.budget = budget
+        self.outstanding = 0
+        self.senders = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0
+        self.max_latency = 0
+        self.latency = None
+        self.block_number = None
+
+    def toDict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "outstanding": self.outstanding,
+            "senders": self.senders,
+            "circuit": self.breaker.state,
+            "retries": self.budget.retries,
+            "block_number": self.block_number,
+            "mean": (
+                self.total_latency / (self.requests - self.errors)
+                if self.requests > self.errors
+                else None
+            ),
+            "ewma": self.latency,
+            "max": self.max_latency,
+        }
+
+
+class EndpointPool:
+    # Reads go to the endpoint with the least outstanding requests among
+    # those that reached the block of the last receipt, so they see the
+    # client's own writes, and the block they name. The transactions and nonces of a sender always go
+    # to the same endpoint so the node sees the nonces in order, and so do
+    # the filters. An endpoint whose circuit breaker opened, after failed
+    # requests or a failed health check, is left out until the breaker lets
+    # requests through again
+    def __init__(
+        self,
+        endpoint_uris: list,
+        session: requests.Session = None,
+        pool_size: int = POOL_SIZE,
+        health_interval: float = HEALTH_INTERVAL,
+        max_lag: int = MAX_LAG,
+        retry_policy: RetryPolicy = None,
+    ):
+        self.retry_policy = retry_policy or getRetryPolicy()
+        self.endpoints = [
+            Endpoint(uri, self.retry_policy.breaker(uri), self.retry_policy.budget(uri))
+            for uri in splitEndpoints(endpoint_uris)
+        ]
+        if not self.endpoints:
+            raise ValueError("No RPC endpoint")
+        self.session = session or createSession(pool_size)
+        self.pool_size = pool_size
+        self.health_interval = health_interval
+        self.max_lag = max_lag
+        self.lock = threading.Lock()
+        self.pinned = {}
+        self.min_block = 0
+        self.stopped = threading.Event()
+        self.thread = None
+        # A single endpoint has nowhere to fail over, it isn't checked
+        if health_interval and len(self.endpoints) > 1:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def select(self, endpoints: list, key) -> Endpoint:
+        # The best endpoint whose circuit lets the request through, a
+        # half-open one takes it as its probe
+        endpoints = sorted(endpoints, key=key)
+        for endpoint in endpoints:
+            if endpoint.breaker.allow():
+                return endpoint
+        # With every circuit open the requests still have to go somewhere
+        return endpoints[0]
+
+    def acquire(
+        self, sender: str = None, tried: list = (), block_number: int = None
+    ) -> Endpoint:
+        with self.lock:
+            if sender is None:
+                min_block = max(self.min_block, block_number or 0)
+                endpoints = [
+                    endpoint for endpoint in self.endpoints if endpoint not in tried
+                ] or self.endpoints
+                endpoint = self.select(
+                    [
+                        endpoint
+                        for endpoint in endpoints
+                        if (endpoint.block_number or 0) >= min_block
+                        and endpoint.breaker.state != "open"
+                    ]
+                    or endpoints,
+                    lambda endpoint: (endpoint.outstanding, endpoint.latency or 0),
+                )
+            else:
+                endpoint = self.pin(sender)
+            endpoint.outstanding += 1
+        if not tried:
+            # Only the first attempt of a request earns retries
+            endpoint.budget.deposit()
+        return endpoint
+
+    def pin(self, sender: str) -> Endpoint:
+        # A sender only moves when the circuit of its endpoint is open and
+        # another one's isn't: the new node hasn't got the pending
+        # transactions of the sender, so the nonce managers resync when
+        # endpointOf changes
+        pinned = self.pinned.get(sender)
+        if pinned is not None and pinned.breaker.state != "open":
+            return pinned
+        endpoint = self.select(
+            self.endpoints,
+            lambda endpoint: (endpoint.senders, endpoint.outstanding),
+        )
+        if pinned is not None:
+            if endpoint.breaker.state == "open":
+                return pinned
+            pinned.senders -= 1
+        endpoint.senders += 1
+        self.pinned[sender] = endpoint
+        return endpoint
+
+    def endpointOf(self, sender: str) -> str:
+        with self.lock:
+            return self.pin(sender).uri
+
+    def observe(self, endpoint: Endpoint, method: str, block_number: int):
+        with self.lock:
+            endpoint.block_number = max(endpoint.block_number or 0, block_number)
+            if method == "eth_getTransactionReceipt":
+                # The reads that follow need a node with this block
+                self.min_block = max(self.min_block, block_number)
+
+    def release(self, endpoint: Endpoint, start: float, error: Exception = None):
+        latency = time.monotonic() - start
+        if error is not None:
+            self.retry_policy.failed(endpoint.breaker, error)
+        else:
+            endpoint.breaker.success()
+        with self.lock:
+            endpoint.outstanding -= 1
+            endpoint.requests += 1
+            if error is not None:
+                endpoint.errors += 1
+                return
+            endpoint.total_latency += latency
+            endpoint.max_latency = max(endpoint.max_latency, latency)
+            endpoint.latency = (
+                latency
+                if endpoint.latency is None
+                else LATENCY_WEIGHT * latency + (1 - LATENCY_WEIGHT) * endpoint.latency
+            )
+
+    def retryDelay(
+        self,
+        error: Exception,
+        endpoint: Endpoint,
+        sender: str,
+        idempotent: bool,
+        tried: list,
+        previous: float,
+    ) -> float:
+        # None when the error is raised. Reads move at once to an endpoint
+        # not tried yet, the pinned requests wait and go to the same one
+        delay = self.retry_policy.nextDelay(
+            error, len(tried) - 1, previous, endpoint.budget, idempotent
+        )
+        if delay is not None and sender is None and len(tried) < len(self.endpoints):
+            return 0
+        return delay
+
+    @staticmethod
+    def sender(method: str, params) -> str:
+        # The key of the requests pinned to an endpoint, None for reads
+        if method in FILTER_METHODS:
+            return "filters"
+        if method == "eth_sendRawTransaction":
+            return Account.recover_transaction(params[0])
+        if method == "eth_sendTransaction":
+            return Web3.toChecksumAddress(params[0]["from"])
+        if method == "eth_getTransactionCount":
+            return Web3.toChecksumAddress(params[0])
+        return None
+
+    def checkHealth(self):
+        block_numbers = {}
+        for endpoint in self.endpoints:
+            try:
+                response = self.session.post(
+                    endpoint.uri,
+                    json={
+                        "jsonrpc": "2.0",
+                        "id": 0,
+                        "method": "eth_blockNumber",
+                        "params": [],
+                    },
+                    timeout=REQUEST_TIMEOUT,
+                )
+                response.raise_for_status()
+                block_numbers[endpoint] = int(response.json()["result"], 16)
+            except (requests.RequestException, ValueError, KeyError, TypeError):
+                endpoint.breaker.trip()
+        if not block_numbers:
+            return
+        head = max(block_numbers.values())
+        with self.lock:
+            for endpoint, block_number in block_numbers.items():
+                endpoint.block_number = block_number
+                if head - block_number > self.max_lag:
+                    endpoint.breaker.trip()
+                else:
+                    endpoint.breaker.success()
+
+    def run(self):
+        while not self.stopped.wait(self.health_interval):
+            self.checkHealth()
+
+    def stop(self):
+        self.stopped.set()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {endpoint.uri: endpoint.toDict() for endpoint in self.endpoints}
+
+
+class MultiEndpointProvider(JSONBaseProvider):
+    # The requests share one pooled session: web3's HTTPProvider keeps a
+    # session per thread, so the receipt poller and the publisher workers
+    # would each open their own connections
+    def __init__(self, endpoint_uris, timeout=REQUEST_TIMEOUT, **kwargs):
+        super().__init__()
+        self.pool = EndpointPool(endpoint_uris, **kwargs)
+        self.timeout = timeout
+
+    @property
+    def endpoint_uri(self) -> str:
+        return self.pool.endpoints[0].uri
+
+    def __str__(self) -> str:
+        return "RPC connection " + ", ".join(
+            endpoint.uri for endpoint in self.pool.endpoints
+        )
+
+    def post(
+        self,
+        data,
+        sender: str = None,
+        idempotent: bool = True,
+        method: str = None,
+        block_number: int = None,
+    ) -> bytes:
+        tried = []
+        delay = None
+        while True:
+            endpoint = self.pool.acquire(sender, tried, block_number)
+            start = time.monotonic()
+            try:
+                response = self.pool.session.post(
+                    endpoint.uri,
+                    data=data,
+                    headers=HEADERS,
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                error = unsentError(response.content)
+                if error is not None:
+                    raise error
+            except (requests.RequestException, UnsentError) as error:
+                self.pool.release(endpoint, start, error)
+                tried.append(endpoint)
+                delay = self.pool.retryDelay(
+                    error, endpoint, sender, idempotent, tried, delay
+                )
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.pool.release(endpoint, start)
+            if method in BLOCK_METHODS:
+                block_number = blockNumberOf(method, response.content)
+                if block_number is not None:
+                    self.pool.observe(endpoint, method, block_number)
+            return response.content
+
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        return self.decode_rpc_response(
+            self.post(
+                request_data,
+                self.pool.sender(method, params),
+                method not in WRITE_METHODS,
+                method,
+                requestedBlock(method, params),
+            )
+        )
+
+
+class AsyncMultiEndpointProvider(AsyncJSONBaseProvider):
+    def __init__(self, endpoint_uris, timeout=REQUEST_TIMEOUT, **kwargs):
+        super().__init__()
+        self.pool = EndpointPool(endpoint_uris, **kwargs)
+        connect, read = timeout
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        self.session = None
+        self.loop = None
+
+    @property
+    def endpoint_uri(self) -> str:
+        return self.pool.endpoints[0].uri
+
+    def getSession(self) -> aiohttp.ClientSession:
+        # An aiohttp session belongs to the event loop it was created in
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.loop is not loop:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool.pool_size, keepalive_timeout=KEEPALIVE_TIMEOUT
+                ),
+                timeout=self.timeout,
+                raise_for_status=True,
+            )
+            self.loop = loop
+        return self.session
+
+    async def post(
+        self,
+        data,
+        sender: str = None,
+        idempotent: bool = True,
+        method: str = None,
+        block_number: int = None,
+    ) -> bytes:
+        session = self.getSession()
+        tried = []
+        delay = None
+        while True:
+            endpoint = self.pool.acquire(sender, tried, block_number)
+            start = time.monotonic()
+            try:
+                async with session.post(
+                    endpoint.uri, data=data, headers=HEADERS
+                ) as response:
+                    content = await response.read()
+                error = unsentError(content)
+                if error is not None:
+                    raise error
+            except (aiohttp.ClientError, asyncio.TimeoutError, UnsentError) as error:
+                self.pool.release(endpoint, start, error)
+                tried.append(endpoint)
+                delay = self.pool.retryDelay(
+                    error, endpoint, sender, idempotent, tried, delay
+                )
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.pool.release(endpoint, start)
+            if method in BLOCK_METHODS:
+                block_number = blockNumberOf(method, content)
+                if block_number is not None:
+                    self.pool.observe(endpoint, method, block_number)
+            return content
+
+    async def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        return self.decode_rpc_response(
+            await self.post(
+                request_data,
+                self.pool.sender(method, params),
+                method not in WRITE_METHODS,
+                method,
+                requestedBlock(method, params),
+            )
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self.pool.stop()
+
+
+def createWeb3(endpoint_uris, **kwargs) -> Web3:
+    return Web3(MultiEndpointProvider(endpoint_uris, **kwargs))
+
+
+def createAsyncWeb3(endpoint_uris, **kwargs) -> Web3:
+    return Web3(
+        AsyncMultiEndpointProvider(endpoint_uris, **kwargs),
+        modules={"eth": (AsyncEth,)},
+        middlewares=[],
+    )
@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from web3 import Web3
+from utils.client import SupplyChainClient, TransactionResult
+from utils.ipfs_cache import fileDigest, writeAtomically
+from utils.receipt_poller import REVERT_MESSAGE
+
+UPLOAD_WORKERS = 8
+# addLibrary of a dependent can't be estimated while its dependencies are
+# pending, so it is estimated without them plus this much for each one
+DEPENDENCY_GAS = 150000
+GAS_MARGIN = 1.2
+PUBLISH_FEE = 1000
+
+
+class PublishError(Exception):
+    pass
+
+
+def loadManifest(path: str, version: str = None) -> list:
+    # A manifest is a JSON list of artifacts:
+    # {"name", "project", "path", "version", "dependencies"}, where each
+    # dependency is the name of another artifact or the CID of a library
+    # already published. A directory without manifest.json publishes each
+    # file as the given version of the project named after it
+    if os.path.isdir(path):
+        manifest_path = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            if version is None:
+                raise PublishError("A version is needed to publish a directory")
+            return [
+                {
+                    "name": entry.name,
+                    "project": os.path.splitext(entry.name)[0],
+                    "path": entry.path,
+                    "version": version,
+                    "dependencies": [],
+                }
+                for entry in sorted(os.scandir(path), key=lambda entry: entry.name)
+                if entry.is_file() and not entry.name.startswith(".")
+            ]
+        base = path
+        path = manifest_path
+    else:
+        base = os.path.dirname(path)
+    with open(path, "r") as f:
+        artifacts = json.load(f)
+    for artifact in artifacts:
+        artifact.setdefault("name", artifact["project"])
+        artifact.setdefault("version", version)
+        artifact.setdefault("dependencies", [])
+        artifact["path"] = os.path.join(base, artifact["path"])
+    return artifacts
+
+
+def topologicalOrder(artifacts: list) -> list:
+    by_name = {artifact["name"]: artifact for artifact in artifacts}
+    if len(by_name) != len(artifacts):
+        raise PublishError("The artifact names must be unique")
+    dependents = {name: [] for name in by_name}
+    missing = {}
+    for artifact in artifacts:
+        internal = [dep for dep in artifact["dependencies"] if dep in by_name]
+        missing[artifact["name"]] = len(internal)
+        for dep in internal:
+            dependents[dep].append(artifact["name"])
+    ready = [
+        artifact["name"] for artifact in artifacts if not missing[artifact["name"]]
+    ]
+    order = []
+    while ready:
+        name = ready.pop(0)
+        order.append(by_name[name])
+        for dependent in dependents[name]:
+            missing[dependent] -= 1
+            if missing[dependent] == 0:
+                ready.append(dependent)
+    if len(order) != len(artifacts):
+        cycle = [name for name in by_name if missing[name]]
+        raise PublishError(f"Circular dependencies between {cycle}")
+    return order
+
+
+class Publisher:
+    def __init__(
+        self,
+        client: SupplyChainClient,
+        checkpoint_path: str = None,
+        upload_workers: int = UPLOAD_WORKERS,
+    ):
+        self.client = client
+        self.checkpoint_path = checkpoint_path
+        self.upload_workers = upload_workers
+        self.lock = threading.Lock()
+        self.checkpoint = {}
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r") as f:
+                self.checkpoint = json.load(f)
+
+    def saveCheckpoint(self):
+        if self.checkpoint_path is None:
+            return
+        with self.lock:
+            content = json.dumps(self.checkpoint, indent=2)
+        writeAtomically(self.checkpoint_path, content)
+
+    def entry(self, artifact: dict) -> dict:
+        # An entry left by a run of another version, or of different
+        # content, is started again
+        with self.lock:
+            entry = self.checkpoint.get(artifact["name"])
+            if (
+                entry is None
+                or entry.get("version") != artifact["version"]
+                or entry.get("digest") != artifact["digest"]
+            ):
+                entry = {"version": artifact["version"], "digest": artifact["digest"]}
+                self.checkpoint[artifact["name"]] = entry
+            return entry
+
+    def removeCheckpoint(self):
+        if self.checkpoint_path is not None and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def publish(self, artifacts: list) -> dict:
+        order = topologicalOrder(artifacts)
+        for artifact in order:
+            artifact["digest"] = fileDigest(artifact["path"])
+        self.uploadAll(order)
+        self.checkPublished(order)
+        pending = [
+            artifact for artifact in order if not self.entry(artifact).get("published")
+        ]
+        if pending:
+            self.checkDeposit(len(pending) * PUBLISH_FEE)
+            futures = self.sendAll(pending)
+            self.waitAll(futures)
+        # Everything is published, the next release starts from scratch
+        self.removeCheckpoint()
+        return self.checkpoint
+
+    def uploadAll(self, artifacts: list):
+        missing = [
+            artifact for artifact in artifacts if not self.entry(artifact).get("CID")
+        ]
+        if not missing:
+            return
+        print(f"Uploading {len(missing)} artifacts to IPFS...")
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as executor:
+            for artifact, CID in zip(
+                missing,
+                executor.map(
+                    lambda artifact: self.client.uploadLibrary(artifact["path"]),
+                    missing,
+                ),
+            ):
+                self.entry(artifact)["CID"] = CID
+                self.saveCheckpoint()
+
+    def checkPublished(self, artifacts: list):
+        # Versions published by an interrupted run are found on chain, so
+        # nothing is sent twice
+        CIDs = self.client.reader.callNode(
+            [
+                self.client.contract.functions.getProjectVersionCID(
+                    artifact["project"], artifact["version"]
+                )
+                for artifact in artifacts
+            ]
+        )
+        for artifact, CID in zip(artifacts, CIDs):
+            entry = self.entry(artifact)
+            if CID == "":
+                entry.pop("published", None)
+            elif CID == entry["CID"]:
+                entry["published"] = True
+            else:
+                raise PublishError(
+                    f"Version {artifact['version']} of {artifact['project']} is already published with CID {CID}"
+                )
+        self.saveCheckpoint()
+
+    def checkDeposit(self, fee: int):
+        deposit: int = self.client.getDeposit()
+        if deposit < fee:
+            raise PublishError(
+                f"You need {fee} SCT deposited to publish the artifacts, you have {deposit}"
+            )
+
+    def dependencyCIDs(self, artifact: dict) -> list:
+        CIDs = []
+        for dep in artifact["dependencies"]:
+            if dep in self.checkpoint:
+                CIDs.append(self.checkpoint[dep]["CID"])
+            else:
+                CIDs.append(dep)
+        return CIDs
+
+    def sendAll(self, artifacts: list) -> list:
+        # The transactions are sent in topological order with consecutive
+        # nonces, so each dependency is mined before its dependents without
+        # waiting for any receipt in between
+        unpublished = {artifact["name"] for artifact in artifacts}
+        fun = self.client.contract.functions.addLibrary
+        futures = []
+        print(f"Publishing {len(artifacts)} artifacts...")
+        for artifact in artifacts:
+            entry = self.entry(artifact)
+            dependencies = self.dependencyCIDs(artifact)
+            parameters = (
+                artifact["project"],
+                entry["CID"],
+                artifact["version"],
+                dependencies or [""],
+            )
+            if any(dep in unpublished for dep in artifact["dependencies"]):
+                gas = int(
+                    (
+                        fun(*parameters[:3], [""]).estimateGas(
+                            {"from": self.client.addr}
+                        )
+                        + DEPENDENCY_GAS * len(dependencies)
+                    )
+                    * GAS_MARGIN
+                )
+                future = self.client.createTransaction(
+                    fun, *parameters, gas=gas, simulate=False, wait=False
+                )
+            else:
+                future = self.client.createTransaction(fun, *parameters, wait=False)
+            entry["transaction"] = Web3.toHex(future.transaction_hash)
+            futures.append((artifact, future))
+        self.saveCheckpoint()
+        return futures
+
+    def waitAll(self, futures: list):
+        blocks = set()
+        failed = []
+        for artifact, future in futures:
+            entry = self.entry(artifact)
+            try:
+                receipt = self.client.waitForReceipt(future)
+            except Exception as error:
+                message = str(error)
+                if message.startswith(REVERT_MESSAGE):
+                    message = message[70:]
+                print(f"{artifact['name']} can't be published: {message}")
+                failed.append(artifact["name"])
+                continue
+            entry["published"] = True
+            entry["block_number"] = TransactionResult.fromReceipt(receipt).block_number
+            blocks.add(entry["block_number"])
+        self.saveCheckpoint()
+        print(
+            f"{len(futures) - len(failed)} artifacts published in {len(blocks)} blocks"
+        )
+        if failed:
+            raise PublishError(f"{len(failed)} artifacts can't be published: {failed}")
@@ -0,0 +1,317 @@
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from web3 import Web3, exceptions
+
+REVERT_MESSAGE = (
+    "execution reverted: VM Exception while processing transaction: revert "
+)
+RECEIPT_TIMEOUT = 120
+
+# The pollers refer to their Web3 object, so they are kept by the clients
+# using them rather than by the registries
+pollers = weakref.WeakValueDictionary()
+pollers_lock = threading.Lock()
+async_pollers = weakref.WeakValueDictionary()
+
+
+class TransactionReverted(exceptions.SolidityError):
+    def __init__(self, receipt):
+        super().__init__(
+            REVERT_MESSAGE + f"transaction {receipt['transactionHash'].hex()} reverted"
+        )
+        self.receipt = receipt
+
+
+class ReceiptPoller:
+    def __init__(
+        self,
+        w3: Web3,
+        poll_interval: float = 0.5,
+        receipt_timeout: float = RECEIPT_TIMEOUT,
+    ):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.receipt_timeout = receipt_timeout
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.unchecked = set()
+        self.block_filter = None
+        self.use_filter = True
+        self.last_block = None
+        self.last_error = None
+        self.thread = None
+
+    def watch(self, transaction_hash) -> Future:
+        transaction_hash = Web3.toHex(transaction_hash)
+        with self.lock:
+            future = self.pending.get(transaction_hash)
+            if future is None:
+                future = Future()
+                future.transaction_hash = transaction_hash
+                future.watched_at = time.monotonic()
+                self.pending[transaction_hash] = future
+                self.unchecked.add(transaction_hash)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        return future
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.thread = None
+                    return
+            try:
+                for block in self.newBlocks():
+                    try:
+                        self.processBlock(block)
+                    except Exception:
+                        self.recheck()
+                        raise
+                self.checkUnchecked()
+                self.last_error = None
+            except Exception as error:
+                reportError(self, error)
+            self.expire()
+            time.sleep(self.poll_interval)
+
+    def recheck(self):
+        # The blocks already reported aren't reported again, so after a
+        # failed block every pending transaction asks for its receipt
+        with self.lock:
+            self.unchecked.update(self.pending)
+
+    def expire(self):
+        # Transactions dropped by the node are never mined, their futures
+        # fail after receipt_timeout so the poller can stop
+        now = time.monotonic()
+        with self.lock:
+            expired = [
+                future
+                for future in self.pending.values()
+                if now - future.watched_at > self.receipt_timeout
+            ]
+            for future in expired:
+                del self.pending[future.transaction_hash]
+                self.unchecked.discard(future.transaction_hash)
+        for future in expired:
+            future.set_exception(timeExhausted(future, self.receipt_timeout))
+
+    def newBlocks(self) -> list:
+        if self.use_filter:
+            try:
+                if self.block_filter is None:
+                    self.block_filter = self.w3.eth.filter("latest")
+                    return []
+                return self.block_filter.get_new_entries()
+            except ValueError:
+                # The node doesn't support (or dropped) the filter, fall back
+                # to watching the block number
+                self.use_filter = False
+                self.block_filter = None
+        block_number = self.w3.eth.block_number
+        if self.last_block is None:
+            self.last_block = block_number
+            return []
+        blocks = list(range(self.last_block + 1, block_number + 1))
+        self.last_block = block_number
+        return blocks
+
+    def processBlock(self, block):
+        transactions = self.w3.eth.get_block(block)["transactions"]
+        with self.lock:
+            mined = [
+                Web3.toHex(tx) for tx in transactions if Web3.toHex(tx) in self.pending
+            ]
+        for transaction_hash in mined:
+            self.resolve(
+                transaction_hash, self.w3.eth.get_transaction_receipt(transaction_hash)
+            )
+
+    def checkUnchecked(self):
+        # Transactions registered after their block was reported are only
+        # found by asking for the receipt once
+        with self.lock:
+            unchecked = list(self.unchecked)
+        for transaction_hash in unchecked:
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(transaction_hash)
+            except exceptions.TransactionNotFound:
+                with self.lock:
+                    self.unchecked.discard(transaction_hash)
+                continue
+            self.resolve(transaction_hash, receipt)
+
+    def resolve(self, transaction_hash: str, receipt):
+        with self.lock:
+            future = self.pending.pop(transaction_hash, None)
+            self.unchecked.discard(transaction_hash)
+        if future is None:
+            return
+        if receipt["status"] == 0:
+            future.set_exception(TransactionReverted(receipt))
+        else:
+            future.set_result(receipt)
+
+
+def timeExhausted(future, timeout: float) -> exceptions.TimeExhausted:
+    return exceptions.TimeExhausted(
+        f"Transaction {future.transaction_hash} is not in the chain after {timeout} seconds"
+    )
+
+
+def reportError(poller, error: Exception):
+    # A node that keeps failing reports the same error at every poll, it is
+    # only printed when it changes and kept on the poller otherwise
+    if repr(error) != repr(poller.last_error):
+        print(f"Receipt poller error: {error!r}")
+    poller.last_error = error
+
+
+def getReceiptPoller(w3: Web3) -> ReceiptPoller:
+    # Keyed by the id of the Web3 object, which can't be reused while a
+    # poller still refers to it
+    with pollers_lock:
+        poller = pollers.get(id(w3))
+        if poller is None:
+            poller = ReceiptPoller(w3)
+            pollers[id(w3)] = poller
+        return poller
+
+
+class AsyncReceiptPoller:
+    def __init__(
+        self,
+        w3: Web3,
+        poll_interval: float = 0.5,
+        receipt_timeout: float = RECEIPT_TIMEOUT,
+    ):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.receipt_timeout = receipt_timeout
+        self.pending = {}
+        self.unchecked = set()
+        self.last_block = None
+        self.last_error = None
+        self.task = None
+
+    def watch(self, transaction_hash) -> asyncio.Future:
+        transaction_hash = Web3.toHex(transaction_hash)
+        future = self.pending.get(transaction_hash)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            future.transaction_hash = transaction_hash
+            future.watched_at = time.monotonic()
+            self.pending[transaction_hash] = future
+            self.unchecked.add(transaction_hash)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+        return future
+
+    async def run(self):
+        # A single task follows the blocks for all the pending transactions
+        while self.pending:
+            try:
+                for block in await self.newBlocks():
+                    try:
+                        await self.processBlock(block)
+                    except Exception:
+                        # The block isn't reported again
+                        self.unchecked.update(self.pending)
+                        raise
+                await self.checkUnchecked()
+                self.last_error = None
+            except Exception as error:
+                reportError(self, error)
+            self.expire()
+            await asyncio.sleep(self.poll_interval)
+        self.task = None
+
+    def expire(self):
+        now = time.monotonic()
+        expired = [
+            future
+            for future in self.pending.values()
+            if now - future.watched_at > self.receipt_timeout
+        ]
+        for future in expired:
+            del self.pending[future.transaction_hash]
+            self.unchecked.discard(future.transaction_hash)
+            if not future.done():
+                future.set_exception(timeExhausted(future, self.receipt_timeout))
+
+    async def newBlocks(self) -> list:
+        block_number = await self.w3.eth.block_number
+        if self.last_block is None:
+            self.last_block = block_number
+            return []
+        blocks = list(range(self.last_block + 1, block_number + 1))
+        self.last_block = block_number
+        return blocks
+
+    async def processBlock(self, block):
+        transactions = (await self.w3.eth.get_block(block))["transactions"]
+        mined = [
+            Web3.toHex(tx) for tx in transactions if Web3.toHex(tx) in self.pending
+        ]
+        self.markIncluded(mined)
+        receipts = await asyncio.gather(
+            *[
+                self.w3.eth.get_transaction_receipt(transaction_hash)
+                for transaction_hash in mined
+            ]
+        )
+        for transaction_hash, receipt in zip(mined, receipts):
+            self.resolve(transaction_hash, receipt)
+
+    async def checkUnchecked(self):
+        unchecked = list(self.unchecked)
+        self.unchecked.clear()
+        requested_at = time.monotonic()
+        receipts = await asyncio.gather(
+            *[
+                self.w3.eth.get_transaction_receipt(transaction_hash)
+                for transaction_hash in unchecked
+            ],
+            return_exceptions=True,
+        )
+        for transaction_hash, receipt in zip(unchecked, receipts):
+            if isinstance(receipt, exceptions.TransactionNotFound):
+                continue
+            if isinstance(receipt, Exception):
+                self.unchecked.add(transaction_hash)
+                continue
+            self.markIncluded([transaction_hash], requested_at)
+            self.resolve(transaction_hash, receipt)
+
+    def markIncluded(self, transaction_hashes: list, now: float = None):
+        # When the inclusion of a transaction is first noticed, it is kept on
+        # its future with the time of the receipt to measure the latencies
+        now = now or time.monotonic()
+        for transaction_hash in transaction_hashes:
+            future = self.pending.get(transaction_hash)
+            if future is not None and not hasattr(future, "included_at"):
+                future.included_at = now
+
+    def resolve(self, transaction_hash: str, receipt):
+        future = self.pending.pop(transaction_hash, None)
+        self.unchecked.discard(transaction_hash)
+        if future is None or future.done():
+            return
+        future.received_at = time.monotonic()
+        if receipt["status"] == 0:
+            future.set_exception(TransactionReverted(receipt))
+        else:
+            future.set_result(receipt)
+
+
+def getAsyncReceiptPoller(w3: Web3) -> AsyncReceiptPoller:
+    poller = async_pollers.get(id(w3))
+    if poller is None:
+        poller = AsyncReceiptPoller(w3)
+        async_pollers[id(w3)] = poller
+    return poller
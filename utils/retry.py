@@ -0,0 +1,310 @@
+import asyncio
+import random
+import threading
+import time
+import aiohttp
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from web3 import exceptions
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.1
+MAX_DELAY = 10
+# Every request earns BUDGET_RATIO retries, up to BUDGET_TOKENS saved
+BUDGET_RATIO = 0.2
+BUDGET_TOKENS = 10
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 30
+# The server turned the request away before doing anything with it
+UNSENT_STATUS = (429, 503)
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+RATE_LIMIT_CODES = (-32005,)
+# Errors of a node behind the block the request names
+UNKNOWN_BLOCK_ERRORS = ("header not found", "unknown block")
+NONCE_ERRORS = (
+    "nonce too low",
+    "replacement transaction underpriced",
+    "doesn't have the correct nonce",
+)
+
+# Error classes: UNSENT can always be retried, TRANSIENT only when the
+# request is idempotent, NONCE is retried by the nonce managers after a
+# resync and FATAL never
+UNSENT = "unsent"
+TRANSIENT = "transient"
+NONCE = "nonce"
+FATAL = "fatal"
+
+retry_policy = None
+retry_policy_lock = threading.Lock()
+
+
+def isNonceError(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(nonce_error in message for nonce_error in NONCE_ERRORS)
+
+
+def statusCode(error: Exception) -> int:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code
+    # IPFSError
+    return getattr(error, "status_code", None)
+
+
+def connectionRefused(error: Exception) -> bool:
+    if isinstance(error, (requests.ConnectTimeout, aiohttp.ClientConnectorError)):
+        return True
+    reason = error.args[0] if error.args else None
+    return isinstance(reason, MaxRetryError) and isinstance(
+        reason.reason, NewConnectionError
+    )
+
+
+def classify(error: Exception) -> str:
+    if isinstance(error, exceptions.SolidityError):
+        # Reverts, repeating them gives the same result
+        return FATAL
+    status = statusCode(error)
+    if status is not None:
+        if status in UNSENT_STATUS:
+            return UNSENT
+        return TRANSIENT if status in RETRYABLE_STATUS else FATAL
+    if isinstance(error, (requests.ConnectionError, aiohttp.ClientConnectionError)):
+        return UNSENT if connectionRefused(error) else TRANSIENT
+    if isinstance(
+        error,
+        (requests.Timeout, asyncio.TimeoutError, ConnectionError, TimeoutError),
+    ):
+        return TRANSIENT
+    if isinstance(error, ValueError) and error.args:
+        if isNonceError(error):
+            return NONCE
+        # JSON-RPC errors of the node
+        if isinstance(error.args[0], dict) and (
+            isRateLimit(error.args[0]) or isUnknownBlock(error.args[0])
+        ):
+            return UNSENT
+    return FATAL
+
+
+def isRateLimit(error: dict) -> bool:
+    message = str(error.get("message", "")).lower()
+    return error.get("code") in RATE_LIMIT_CODES or "rate limit" in message
+
+
+def isUnknownBlock(error: dict) -> bool:
+    message = str(error.get("message", "")).lower()
+    return any(unknown in message for unknown in UNKNOWN_BLOCK_ERRORS)
+
+
+def decorrelatedJitter(
+    previous: float = None, base: float = BASE_DELAY, cap: float = MAX_DELAY
+) -> float:
+    # Each delay is drawn between the base and three times the previous
+    # one, so clients failing together spread out instead of retrying in
+    # lock-step
+    return min(cap, random.uniform(base, (previous or base) * 3))
+
+
+class CircuitBreaker:
+    # Opens after threshold failures in a row and lets a single request
+    # through again reset_timeout later (half-open), the probe: its success
+    # closes the circuit and its failure reopens it
+    def __init__(
+        self, threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT
+    ):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() < self.opened_at + self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or state == "half-open" and not self.probing
+
+    def allow(self) -> bool:
+        # Like available, but a half-open circuit takes the request as its
+        # probe and turns the others away until the probe is over
+        with self.lock:
+            state = self.state
+            if state == "half-open":
+                if self.probing:
+                    return False
+                self.probing = True
+            return state != "open"
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def failure(self):
+        with self.lock:
+            self.probing = False
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def trip(self):
+        with self.lock:
+            self.probing = False
+            self.failures = max(self.failures, self.threshold)
+            self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    # A token bucket: every request adds ratio tokens and every retry
+    # spends one, so while a server is failing the retries stay a fraction
+    # of the requests instead of multiplying them
+    def __init__(self, ratio: float = BUDGET_RATIO, max_tokens: float = BUDGET_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.lock = threading.Lock()
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self.lock:
+            if self.tokens < 1:
+                self.exhausted += 1
+                return False
+            self.tokens -= 1
+            self.retries += 1
+            return True
+
+
+class UnsentError(ValueError):
+    # A JSON-RPC error in a response the server sent with 200, telling the
+    # request wasn't run
+    pass
+
+
+class RateLimitError(UnsentError):
+    pass
+
+
+class UnknownBlockError(UnsentError):
+    pass
+
+
+class CircuitOpenError(ConnectionError):
+    def __init__(self, key: str):
+        super().__init__(f"Too many failures of {key}, not sending requests to it")
+        self.key = key
+
+
+class RetryPolicy:
+    # One circuit breaker and one retry budget per endpoint (RPC node, IPFS
+    # API or gateway, npm registry), shared by all the clients of a process
+    def __init__(
+        self,
+        max_attempts: int = MAX_ATTEMPTS,
+        base_delay: float = BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+        budget_ratio: float = BUDGET_RATIO,
+        budget_tokens: float = BUDGET_TOKENS,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_tokens = budget_tokens
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.breakers = {}
+        self.budgets = {}
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        with self.lock:
+            if key not in self.breakers:
+                self.breakers[key] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout
+                )
+            return self.breakers[key]
+
+    def budget(self, key: str) -> RetryBudget:
+        with self.lock:
+            if key not in self.budgets:
+                self.budgets[key] = RetryBudget(self.budget_ratio, self.budget_tokens)
+            return self.budgets[key]
+
+    def nextDelay(
+        self,
+        error: Exception,
+        attempt: int,
+        previous: float,
+        budget: RetryBudget,
+        idempotent: bool = True,
+    ) -> float:
+        # The delay before the next attempt, None when the error is raised
+        kind = classify(error)
+        if kind == FATAL or kind == NONCE:
+            return None
+        if kind == TRANSIENT and not idempotent:
+            return None
+        if attempt + 1 >= self.max_attempts or not budget.withdraw():
+            return None
+        return decorrelatedJitter(previous, self.base_delay, self.max_delay)
+
+    def failed(self, breaker: CircuitBreaker, error: Exception):
+        # Only the failures of the server count against its circuit, any
+        # other error is an answer, so the server is up
+        if classify(error) in (UNSENT, TRANSIENT):
+            breaker.failure()
+        else:
+            breaker.success()
+
+    def call(self, key: str, fun, idempotent: bool = True):
+        breaker = self.breaker(key)
+        budget = self.budget(key)
+        budget.deposit()
+        if not breaker.allow():
+            raise CircuitOpenError(key)
+        attempt = 0
+        delay = None
+        while True:
+            try:
+                result = fun()
+            except Exception as error:
+                # A request counts once against the circuit, so its own
+                # retries can't open it, and once the circuit opened the
+                # retries stop with the error of the server
+                delay = self.nextDelay(error, attempt, delay, budget, idempotent)
+                if delay is None or not breaker.available():
+                    self.failed(breaker, error)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            breaker.success()
+            return result
+
+
+def getRetryPolicy() -> RetryPolicy:
+    global retry_policy
+    with retry_policy_lock:
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        return retry_policy
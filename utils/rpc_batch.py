@@ -0,0 +1,120 @@
+import itertools
+import json
+import threading
+import requests
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.method_formatters import raise_solidity_error_on_revert
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from utils.providers import requestedBlock
+
+REQUEST_TIMEOUT = 10
+
+
+def decodeOutput(w3: Web3, fun, data):
+    # Same decoding as ContractFunction.call
+    output_types = get_abi_output_types(fun.abi)
+    output_data = w3.codec.decode_abi(output_types, HexBytes(data))
+    normalized_data = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, output_data)
+    if len(normalized_data) == 1:
+        return normalized_data[0]
+    return normalized_data
+
+
+class BatchCaller:
+    def __init__(self, w3: Web3, endpoint_uri: str = None, session=None):
+        self.w3 = w3
+        self.endpoint_uri = endpoint_uri or w3.provider.endpoint_uri
+        self.session = session or requests.Session()
+        # Through a MultiEndpointProvider the batches are balanced and fail
+        # over like the other reads
+        self.provider = (
+            w3.provider
+            if endpoint_uri is None and hasattr(w3.provider, "pool")
+            else None
+        )
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.rpc_calls = 0
+        self.http_requests = 0
+
+    def request(self, calls: list) -> list:
+        payload = [
+            {"jsonrpc": "2.0", "id": next(self.ids), "method": method, "params": params}
+            for method, params in calls
+        ]
+        if self.provider is not None:
+            # Only the endpoints that reached the blocks named are asked
+            blocks = [
+                block
+                for block in (
+                    requestedBlock(method, params) for method, params in calls
+                )
+                if block is not None
+            ]
+            content = self.provider.post(
+                json.dumps(payload), block_number=max(blocks, default=None)
+            )
+        else:
+            response = self.session.post(
+                self.endpoint_uri, json=payload, timeout=REQUEST_TIMEOUT
+            )
+            response.raise_for_status()
+            content = response.content
+        with self.lock:
+            self.rpc_calls += len(payload)
+            self.http_requests += 1
+        responses = {result["id"]: result for result in json.loads(content)}
+        return [responses[call["id"]] for call in payload]
+
+    def call(self, fun, block_identifier="latest"):
+        return self.callMany([fun], block_identifier)[0]
+
+    def callMany(self, funs: list, block_identifier="latest") -> list:
+        if not funs:
+            return []
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        responses = self.request(
+            [
+                (
+                    "eth_call",
+                    [
+                        {"to": fun.address, "data": fun._encode_transaction_data()},
+                        block_identifier,
+                    ],
+                )
+                for fun in funs
+            ]
+        )
+        results = []
+        for fun, response in zip(funs, responses):
+            if "error" in response:
+                # Same checks as ContractFunction.call: reverts raise
+                # ContractLogicError, the errors of the node a ValueError
+                raise_solidity_error_on_revert(response)
+                raise ValueError(response["error"])
+            results.append(decodeOutput(self.w3, fun, response["result"]))
+        return results
+
+    def getBalances(self, addresses: list, block_identifier="latest") -> list:
+        if not addresses:
+            return []
+        responses = self.request(
+            [("eth_getBalance", [addr, block_identifier]) for addr in addresses]
+        )
+        balances = []
+        for response in responses:
+            if "error" in response:
+                raise ValueError(response["error"])
+            balances.append(int(response["result"], 16))
+        return balances
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "rpc_calls": self.rpc_calls,
+                "http_requests": self.http_requests,
+                "saved_requests": self.rpc_calls - self.http_requests,
+            }
@@ -0,0 +1,164 @@
+import re
+
+PARTIAL_PATTERN = re.compile(
+    r"^v?(\d+|[xX*])(?:\.(\d+|[xX*]))?(?:\.(\d+|[xX*]))?"
+    r"(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$"
+)
+COMPARATOR_PATTERN = re.compile(r"^(\^|~|>=|<=|>|<|=)?\s*(.*)$")
+HYPHEN_PATTERN = re.compile(r"^\s*(\S+)\s+-\s+(\S+)\s*$")
+
+
+def parseVersion(version: str) -> tuple:
+    match = PARTIAL_PATTERN.match(version.strip())
+    if match is None or None in match.groups()[:3]:
+        return None
+    if any(not part.isdigit() for part in match.groups()[:3]):
+        return None
+    major, minor, patch, prerelease = match.groups()
+    return (
+        int(major),
+        int(minor),
+        int(patch),
+        tuple(prerelease.split(".")) if prerelease else (),
+    )
+
+
+def versionKey(version: tuple) -> tuple:
+    major, minor, patch, prerelease = version
+    # A release sorts after all of its prereleases, numeric identifiers sort
+    # before alphanumeric ones
+    return (
+        major,
+        minor,
+        patch,
+        not prerelease,
+        tuple((0, int(id), "") if id.isdigit() else (1, 0, id) for id in prerelease),
+    )
+
+
+def parsePartial(version: str) -> tuple:
+    match = PARTIAL_PATTERN.match(version.strip())
+    if match is None:
+        raise ValueError(f"Invalid version {version}")
+    parts = []
+    for part in match.groups()[:3]:
+        if part is None or not part.isdigit():
+            break
+        parts.append(int(part))
+    prerelease = match.group(4)
+    return parts, tuple(prerelease.split(".")) if prerelease else ()
+
+
+def lowerBound(parts: list, prerelease: tuple) -> tuple:
+    return (*(parts + [0, 0, 0])[:3], prerelease if len(parts) == 3 else ())
+
+
+def bump(parts: list, index: int) -> tuple:
+    bumped = parts[: index + 1]
+    bumped[index] += 1
+    return (*(bumped + [0, 0, 0])[:3], ("0",))
+
+
+def desugar(operator: str, version: str) -> list:
+    parts, prerelease = parsePartial(version)
+    if not parts:
+        return (
+            []
+            if operator in ("", "=", "^", "~", ">=", "<=")
+            else [("<", (0, 0, 0, ("0",)))]
+        )
+    low = lowerBound(parts, prerelease)
+    if operator == "^":
+        index = next((i for i, part in enumerate(parts) if part != 0), len(parts) - 1)
+        return [(">=", low), ("<", bump(parts, index))]
+    if operator == "~":
+        return [(">=", low), ("<", bump(parts, min(1, len(parts) - 1)))]
+    if operator in ("", "="):
+        if len(parts) == 3:
+            return [("=", low)]
+        return [(">=", low), ("<", bump(parts, len(parts) - 1))]
+    if operator == ">" and len(parts) < 3:
+        return [(">=", bump(parts, len(parts) - 1))]
+    if operator == "<=" and len(parts) < 3:
+        return [("<", bump(parts, len(parts) - 1))]
+    return [(operator, low)]
+
+
+def hyphenRange(low: str, high: str) -> list:
+    # "1.2 - 2.3" is ">=1.2.0 <2.4.0-0", a partial upper bound includes every
+    # version it names
+    parts, prerelease = parsePartial(low)
+    comparators = [(">=", lowerBound(parts, prerelease))] if parts else []
+    parts, prerelease = parsePartial(high)
+    if len(parts) == 3:
+        comparators.append(("<=", lowerBound(parts, prerelease)))
+    elif parts:
+        comparators.append(("<", bump(parts, len(parts) - 1)))
+    return comparators
+
+
+def parseRange(version_range: str) -> list:
+    version_range = version_range.strip()
+    if version_range in ("", "latest"):
+        version_range = "*"
+    comparator_sets = []
+    for alternative in version_range.split("||"):
+        hyphen = HYPHEN_PATTERN.match(alternative)
+        if hyphen is not None:
+            comparator_sets.append(hyphenRange(*hyphen.groups()))
+            continue
+        comparators = []
+        tokens = re.sub(r"(\^|~|>=|<=|>|<|=)\s+", r"\1", alternative).split()
+        for token in tokens:
+            operator, version = COMPARATOR_PATTERN.match(token).groups()
+            comparators += desugar(operator or "", version)
+        comparator_sets.append(comparators)
+    return comparator_sets
+
+
+def testComparator(version: tuple, operator: str, bound: tuple) -> bool:
+    key, bound_key = versionKey(version), versionKey(bound)
+    return {
+        "=": key == bound_key,
+        ">": key > bound_key,
+        ">=": key >= bound_key,
+        "<": key < bound_key,
+        "<=": key <= bound_key,
+    }[operator]
+
+
+def satisfies(
+    version: str, version_range: str, include_prerelease: bool = False
+) -> bool:
+    parsed = parseVersion(version)
+    if parsed is None:
+        return False
+    try:
+        comparator_sets = parseRange(version_range)
+    except ValueError:
+        # Dist-tags, aliases, git, file and URL specs aren't semver ranges
+        # and match no version
+        return False
+    for comparators in comparator_sets:
+        if parsed[3] and not include_prerelease:
+            # Prereleases are only picked when asked for explicitly
+            if not any(
+                bound[3] and bound[:3] == parsed[:3] for _, bound in comparators
+            ):
+                continue
+        if all(testComparator(parsed, *comparator) for comparator in comparators):
+            return True
+    return False
+
+
+def maxSatisfying(
+    versions, version_range: str, include_prerelease: bool = False
+) -> str:
+    matching = [
+        version
+        for version in versions
+        if satisfies(version, version_range, include_prerelease)
+    ]
+    if not matching:
+        return None
+    return max(matching, key=lambda version: versionKey(parseVersion(version)))
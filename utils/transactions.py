@@ -1,9 +1,17 @@
 from web3 import Web3, exceptions
 from utils.ipfs import IPFS
-from utils.check_dependencies import getDependencies
+from utils.client import SupplyChainClient
+from utils.contract_reader import ContractReader
+from utils.nonce_manager import NonceManager
+from utils.receipt_poller import ReceiptPoller
+
+# Used to check the dependencies when the current directory has one
+LOCKFILE = "package-lock.json"
 
 
 class Transactions:
+    # Interactive front end of SupplyChainClient: it prompts for the
+    # arguments and prints the outcome of each operation
     def __init__(
         self,
         w3: Web3,
@@ -13,35 +21,42 @@ class Transactions:
         contract,
         token_contract,
         ipfs: IPFS,
+        nonce_manager: NonceManager = None,
+        receipt_poller: ReceiptPoller = None,
+        reader: ContractReader = None,
+        index=None,
+        client: SupplyChainClient = None,
     ):
-        self.w3 = w3
-        self.chain_id = chain_id
-        self.addr = addr
-        self.private_key = private_key
-        self.contract = contract
-        self.token_contract = token_contract
-        self.ipfs = ipfs
+        self.client = client or SupplyChainClient(
+            w3=w3,
+            chain_id=chain_id,
+            addr=addr,
+            private_key=private_key,
+            contract=contract,
+            token_contract=token_contract,
+            ipfs=ipfs,
+            nonce_manager=nonce_manager,
+            receipt_poller=receipt_poller,
+            reader=reader,
+            index=index,
+        )
 
     def addDeveloper(self):
         email: str = input("Insert your email: ")
         print("Registering as a developer...")
         try:
-            self.approveTokenFee(3000)
-            self.createTransaction(self.contract.functions.addDeveloper, email)
+            self.client.addDeveloper(email)
             print(f"Registered as a developer with email {email}\n")
         except exceptions.SolidityError as error:
-            self.approveTokenFee(0)
             print(str(error)[70:], end="\n\n")
 
     def createGroup(self):
         group_name: str = input("Insert the group name: ")
         print("Creating a group...")
         try:
-            self.approveTokenFee(2000)
-            self.createTransaction(self.contract.functions.createGroup, group_name)
+            self.client.createGroup(group_name)
             print(f"Group {group_name} created\n")
         except exceptions.SolidityError as error:
-            self.approveTokenFee(0)
             print(str(error)[70:], end="\n\n")
 
     def createProject(self):
@@ -51,22 +66,16 @@ class Transactions:
         project_name: str = input("Insert the project name: ")
         print("Creating a project...")
         try:
-            self.approveTokenFee(2000)
-            self.createTransaction(
-                self.contract.functions.createProject, group_name, project_name
-            )
+            self.client.createProject(group_name, project_name)
             print(f"Project {project_name} created\n")
         except exceptions.SolidityError as error:
-            self.approveTokenFee(0)
             print(str(error)[70:], end="\n\n")
 
     def requestGroupAccess(self):
         group_name: str = input("Insert the name of the group that you want to join: ")
         print("Processing the request...")
         try:
-            self.createTransaction(
-                self.contract.functions.requestGroupAccess, group_name
-            )
+            self.client.requestGroupAccess(group_name)
             print(f"The request to join the {group_name} group has been registered\n")
         except exceptions.SolidityError as error:
             print(str(error)[70:], end="\n\n")
@@ -76,9 +85,7 @@ class Transactions:
         addr: str = input("Insert the address of the developer: ")
         print("Accepting the request...")
         try:
-            self.createTransaction(
-                self.contract.functions.acceptGroupRequest, group_name, addr
-            )
+            self.client.acceptGroupRequest(group_name, addr)
             print(f"{addr} has been accepted in the {group_name} group\n")
         except exceptions.SolidityError as error:
             print(str(error)[70:], end="\n\n")
@@ -90,13 +97,47 @@ class Transactions:
         addr: str = input("Insert the address of the developer: ")
         print(f"Removing {addr} from the group...")
         try:
-            self.createTransaction(
-                self.contract.functions.removeDeveloperFromGroup, group_name, addr
-            )
+            self.client.removeDeveloperFromGroup(group_name, addr)
             print(f"{addr} has been removed from the {group_name} group\n")
         except exceptions.SolidityError as error:
             print(str(error)[70:], end="\n\n")
 
+    def acceptGroupRequests(self):
+        group_name: str = input("Insert the name of the group: ")
+        addrs: list = (
+            input("Insert the addresses of the developers (comma separated): ")
+            .replace(" ", "")
+            .split(",")
+        )
+        print(f"Accepting {len(addrs)} requests...")
+        try:
+            self.client.acceptGroupRequests(group_name, addrs)
+            print(
+                f"{len(addrs)} developers have been accepted in the {group_name} group\n"
+            )
+        except exceptions.SolidityError as error:
+            print(str(error)[70:], end="\n\n")
+        except exceptions.InvalidAddress as error:
+            print("Insert valid addresses")
+
+    def removeDevelopersFromGroup(self):
+        group_name: str = input("Insert the name of the group: ")
+        addrs: list = (
+            input("Insert the addresses of the developers (comma separated): ")
+            .replace(" ", "")
+            .split(",")
+        )
+        print(f"Removing {len(addrs)} developers from the group...")
+        try:
+            self.client.removeDevelopersFromGroup(group_name, addrs)
+            print(
+                f"{len(addrs)} developers have been removed from the {group_name} group\n"
+            )
+        except exceptions.SolidityError as error:
+            print(str(error)[70:], end="\n\n")
+        except exceptions.InvalidAddress as error:
+            print("Insert valid addresses")
+
     def addLibrary(self):
         project_name: str = input("Insert the name of the project: ")
         path = input("Insert the path of the file: ")
@@ -108,34 +149,21 @@ class Transactions:
         )
         print("Adding the library...")
         try:
-            with open(path, "r") as f:
-                file = f.read()
+            CID: str = self.client.uploadLibrary(path)
         except FileNotFoundError:
             print("Wrong path\n")
-
-        CID: str = self.ipfs.uploadFile(file)["cid"]
+            return
         try:
-            self.approveTokenFee(1000)
-            self.createTransaction(
-                self.contract.functions.addLibrary,
-                project_name,
-                CID,
-                version,
-                dependencies,
-            )
+            self.client.publishLibrary(project_name, CID, version, dependencies)
             print(f"The library has been added\n")
         except exceptions.SolidityError as error:
-            self.approveTokenFee(0)
             print(str(error)[70:], end="\n\n")
 
     def voteDeveloper(self):
         developer: str = input("Insert the address of the developer: ")
         print("Voting the developer...")
         try:
-            self.createTransaction(
-                self.contract.functions.voteDeveloper,
-                (developer),
-            )
+            self.client.voteDeveloper(developer)
             print(f"The developer has been voted\n")
         except exceptions.SolidityError as error:
             print(str(error)[70:], end="\n\n")
@@ -144,10 +172,7 @@ class Transactions:
         developer: str = input("Insert the address of the developer: ")
         print("Reporting the developer...")
         try:
-            self.createTransaction(
-                self.contract.functions.reportDeveloper,
-                developer,
-            )
+            self.client.reportDeveloper(developer)
             print(f"The developer has been reported\n")
         except exceptions.SolidityError as error:
             print(str(error)[70:], end="\n\n")
@@ -155,117 +180,91 @@ class Transactions:
     def updateReliability(self):
         print("Updating the reliability...")
         try:
-            self.createTransaction(self.contract.functions.updateReliability)
+            self.client.updateReliability()
             print(f"The reliability has been updated\n")
         except exceptions.SolidityError as error:
             print(str(error)[70:], end="\n\n")
 
+    def claimInteractionRewards(self):
+        print("Claiming the rewards of the interactions...")
+        try:
+            self.client.claimInteractionRewards()
+            print(f"The rewards have been claimed\n")
+        except exceptions.SolidityError as error:
+            print(str(error)[70:], end="\n\n")
+
     def changeAdmin(self):
         new_admin: str = input("Insert the address of the new admin: ")
         group_name: str = input("Insert the name of the group: ")
         print("Changing the admin...")
         try:
-            self.createTransaction(
-                self.contract.functions.reportDeveloper, new_admin, group_name
-            )
+            self.client.changeAdmin(new_admin, group_name)
             print(f"The admin has been changed\n")
         except exceptions.SolidityError as error:
             print(str(error)[70:], end="\n\n")
 
     def getDependenciesInformation(self):
         name: str = input("Insert the name of the library: ")
-        rel_levels = {"Very Low": 0, "Low": 0, "Medium": 0, "High": 0, "Very High": 0}
         try:
-            CID = self.contract.functions.getProjectLastVersion(name).call()
-
-            receipt = self.createTransaction(
-                self.contract.functions.getLibraryInformationWithLevel,
-                CID,
-            )
-            info = self.contract.events.LibraryInfo().processReceipt(receipt)[0]["args"]
-            print(
-                f"{info.project}\nLast version: {info.version}\nReliability: {info.reliability}\nReliability level: {info.level}"
-            )
-            rel_levels[info.level] += 1
-            dependencies = getDependencies(name)
-            print(f"{name} dependencies:\n")
-            for key in dependencies:
-                if dependencies[key][0] == "^" or dependencies[key][0] == "~":
-                    dependencies[key] = dependencies[key][1:]
-                CIDs = self.contract.functions.getProjectVersions(key).call()
-                for CID in CIDs:
-                    receipt = self.createTransaction(
-                        self.contract.functions.getLibraryInformationWithLevel,
-                        CID,
-                    )
-                    info = self.contract.events.LibraryInfo().processReceipt(receipt)[
-                        0
-                    ]["args"]
-                    if info.version == dependencies[key]:
-                        print(
-                            f"{info.project}\nLast version: {info.version}\nReliability: {info.reliability}\nReliability level: {info.level}\n"
-                        )
-                        rel_levels[info.level] += 1
-                        break
-            print(
-                f"Among all the dependencies, for each reliability level, there are the following numbers of libraries:\n"
-                + f"Very Low: {rel_levels['Very Low']}\n"
-                + f"Low: {rel_levels['Low']}\n"
-                + f"Medium: {rel_levels['Medium']}\n"
-                + f"High: {rel_levels['High']}\n"
-                + f"Very High: {rel_levels['Very High']}"
-            )
+            report = self.client.checkDependencies(name, lockfile=LOCKFILE)
         except:
             print("Insert a valid name")
+            return
+        library = report.library
+        print(
+            f"{library.project}\nLast version: {library.version}\nReliability: {library.reliability}\nReliability level: {library.level}"
+        )
+        print(f"{name} dependencies:\n")
+        for dependency in report.dependencies:
+            print(
+                f"{dependency.project}\nVersion: {dependency.version} ({report.ranges[dependency.project]})\nReliability: {dependency.reliability}\nReliability level: {dependency.level}\n"
+            )
+        print(
+            f"Among all the dependencies, for each reliability level, there are the following numbers of libraries:\n"
+            + "\n".join(f"{level}: {n}" for level, n in report.levels.items())
+        )
 
     def buyTokens(self):
         tokens: str = input("Insert the number of tokens to buy: ")
         print("Buying tokens...")
         try:
-            receipt = self.createTransaction(
-                self.contract.functions.buyTokens, value=int(tokens)
-            )
+            self.client.buyTokens(int(tokens))
             print(f"{tokens} tokens have been bought\n")
         except exceptions.SolidityError as error:
             print(str(error)[70:], end="\n\n")
 
+    def buyDeposit(self):
+        tokens: str = input("Insert the number of tokens to buy: ")
+        print("Buying tokens...")
+        try:
+            self.client.buyDeposit(int(tokens))
+            print(f"{tokens} tokens have been bought and deposited to pay the fees\n")
+        except exceptions.SolidityError as error:
+            print(str(error)[70:], end="\n\n")
+
+    def depositTokens(self):
+        tokens: int = int(input("Insert the number of tokens to deposit: "))
+        print("Depositing tokens...")
+        try:
+            self.client.depositTokens(tokens)
+            print(f"{tokens} tokens have been deposited to pay the fees\n")
+        except exceptions.SolidityError as error:
+            print(str(error)[70:], end="\n\n")
+
+    def withdrawTokens(self):
+        tokens: int = int(input("Insert the number of tokens to withdraw: "))
+        print("Withdrawing tokens...")
+        try:
+            self.client.withdrawTokens(tokens)
+            print(f"{tokens} tokens have been withdrawn\n")
+        except exceptions.SolidityError as error:
+            print(str(error)[70:], end="\n\n")
+
     def buyReliability(self):
         reliability: int = int(input("Insert the amount of reliability to buy: "))
         print("Buying reliability...")
         try:
-            reliability_cost: int = int(
-                self.contract.functions.reliability_cost().call()
-            )
-            self.approveTokenFee(reliability * reliability_cost)
-            receipt = self.createTransaction(
-                self.contract.functions.buyReliability, reliability
-            )
+            self.client.buyReliability(reliability)
             print(f"{reliability} reliability has been bought\n")
         except exceptions.SolidityError as error:
-            self.approveTokenFee(0)
             print(str(error)[70:], end="\n\n")
-
-    def createTransaction(self, fun, *parameters, value=0):
-        nonce: int = self.w3.eth.getTransactionCount(self.addr)
-        transaction = fun(*parameters).buildTransaction(
-            {
-                "chainId": self.chain_id,
-                "from": self.addr,
-                "gasPrice": self.w3.eth.gas_price,
-                "nonce": nonce,
-                "value": value,
-            }
-        )
-        signed_transaction = self.w3.eth.account.sign_transaction(
-            transaction, private_key=self.private_key
-        )
-        transaction_hash = self.w3.eth.send_raw_transaction(
-            signed_transaction.rawTransaction
-        )
-        tx_receipt = self.w3.eth.wait_for_transaction_receipt(transaction_hash)
-        return tx_receipt
-
-    def approveTokenFee(self, fee: int):
-        receipt = self.createTransaction(
-            self.token_contract.functions.approve, self.contract.address, fee
-        )
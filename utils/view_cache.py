@@ -0,0 +1,118 @@
+import threading
+import time
+from web3 import Web3
+
+BLOCK_INTERVAL = 1
+IMMUTABLE_TTL = 3600
+MAX_IMMUTABLE_ENTRIES = 100000
+
+
+def freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
+
+def callKey(fun) -> tuple:
+    return (fun.address, fun.fn_name, freeze(fun.args), freeze(fun.kwargs))
+
+
+class ViewCache:
+    def __init__(
+        self,
+        w3: Web3,
+        block_interval: float = BLOCK_INTERVAL,
+        immutable_ttl: float = IMMUTABLE_TTL,
+        max_immutable_entries: int = MAX_IMMUTABLE_ENTRIES,
+    ):
+        self.w3 = w3
+        # The block number is asked to the node at most once per interval,
+        # the results in between are served from the same block
+        self.block_interval = block_interval
+        self.immutable_ttl = immutable_ttl
+        self.max_immutable_entries = max_immutable_entries
+        self.lock = threading.Lock()
+        self.block_number = None
+        self.block_checked = 0
+        self.entries = {}
+        self.immutable = {}
+        self.hits = 0
+        self.misses = 0
+        self.immutable_hits = 0
+        self.immutable_misses = 0
+        self.invalidations = 0
+
+    def blockNumber(self) -> int:
+        now = time.monotonic()
+        with self.lock:
+            if self.block_number is not None and now < self.block_checked:
+                return self.block_number
+        block_number = self.w3.eth.block_number
+        with self.lock:
+            self.block_checked = now + self.block_interval
+            self.setBlock(block_number)
+            return self.block_number
+
+    def setBlock(self, block_number: int):
+        if self.block_number is None or block_number > self.block_number:
+            self.block_number = block_number
+            self.entries.clear()
+
+    def get(self, key, block_number: int):
+        with self.lock:
+            if block_number == self.block_number and key in self.entries:
+                self.hits += 1
+                return True, self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, block_number: int, value):
+        with self.lock:
+            if block_number == self.block_number:
+                self.entries[key] = value
+
+    def getImmutable(self, key):
+        with self.lock:
+            entry = self.immutable.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.immutable_hits += 1
+                return True, entry[1]
+            self.immutable_misses += 1
+            return False, None
+
+    def putImmutable(self, key, value):
+        with self.lock:
+            self.immutable.pop(key, None)
+            self.immutable[key] = (time.monotonic() + self.immutable_ttl, value)
+            while len(self.immutable) > self.max_immutable_entries:
+                # Dicts keep the insertion order, the first entry is the oldest
+                del self.immutable[next(iter(self.immutable))]
+
+    def invalidate(self, block_number: int = None):
+        # Called when one of our transactions is mined, the results read
+        # before it may not include its changes
+        with self.lock:
+            self.invalidations += 1
+            self.entries.clear()
+            if block_number is not None:
+                self.setBlock(block_number)
+            else:
+                self.block_checked = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            immutable_lookups = self.immutable_hits + self.immutable_misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "immutable_hits": self.immutable_hits,
+                "immutable_misses": self.immutable_misses,
+                "immutable_hit_rate": (
+                    self.immutable_hits / immutable_lookups if immutable_lookups else 0
+                ),
+                "invalidations": self.invalidations,
+            }